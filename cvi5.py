@@ -1,18 +1,16 @@
 import PySimpleGUI as sg
 import os
+import sys
+import importlib
 import traceback
 
 from pycvi.Config import Config
 from pycvi.CviPr import CviPr
 from pycvi.Actions import Actions
-import pycvi.conv
-import pycvi.pancho
-import pycvi.audit
+from pycvi.CviJobs import CviJobs
 
 config = Config()
 cviPr = CviPr(config)
-actions = Actions(config, cviPr)
-osf_list, osf_selecionada = actions.get_osfs()
 
 sg.theme('SystemDefaultForReal')
 # ------ Menu Definition ------ #
@@ -40,7 +38,33 @@ menu_def = [['&Arquivo', ['&Open     Ctrl-O', 'Jupyter Notebook ou cmd',
             ['&Ajuda', '&Sobre...'], ]
 # ------ Buttons ------ #
 buttons = [sg.Button('DFe'), sg.Button('Resultados'), sg.Button('Abre Excel'),
-           sg.Button('Abre Html'), sg.Button('Propriedades')]
+           sg.Button('Abre Html'), sg.Button('Propriedades'), sg.Button('Cancelar')]
+# ------ Ações dos subsistemas ------ #
+# evento do menu -> 'módulo:função(window, values['-COMBO-'])'. Os módulos (conversão,
+#   pancho com requests/bs4/win32com, auditorias) só são importados no primeiro uso,
+#   para a janela abrir logo; ver menu_action e pycvi.CviImportBench.
+#   Cada ação roda numa thread (ver CviJobs), com a janela livre e o botão Cancelar
+ACOES = {
+    '01 Converter': 'pycvi.conv:conv_action',
+    'Cadesp': 'pycvi.pancho:cadesp_action',
+    'PGSF': 'pycvi.pancho:pgsf_action',
+    'Sem Papel': 'pycvi.pancho:sempapel_action',
+    '00 Pesquisa Livre': 'pycvi.audit:_00_action',
+    '02 Audit Conciliação': 'pycvi.audit:_02_action',
+    '03 Audit DocAtribs': 'pycvi.audit:_03_action',
+    '21 Dados das EFDs': 'pycvi.audit:_21_action',
+    '35 Scanc': 'pycvi.audit:_35_action',
+    '95 Específico': 'pycvi.audit:_95_action',
+    'DFe': 'pycvi.audit:_90_action',
+}
+
+
+def menu_action(window, jobs, event, values):
+    modulo, funcao = ACOES[event].split(':')
+    if modulo not in sys.modules:
+        print(f"Carregando {modulo}...")
+        window.refresh()
+    jobs.inicia(event, getattr(importlib.import_module(modulo), funcao), values['-COMBO-'])
 
 
 def main_window(menu_def, buttons, osf_list, osf_selecionada):
@@ -50,18 +74,32 @@ def main_window(menu_def, buttons, osf_list, osf_selecionada):
         [sg.Combo(osf_list, osf_selecionada,
                   s=(100, 22), key='-COMBO-', enable_events=True)],
         [sg.Output(size=(100, 28))],
+        [sg.Text('', key='-JOB-', size=(100, 1))],
         buttons,
     ]
     window = sg.Window(f"{config.PROJECT_NAME} {config.PROJECT_VERSION}",
                        layout, icon='.\\core\\pn_i32.ico',
                        default_element_size=(12, 1),
                        default_button_element_size=(12, 1), finalize=True)
+    # osfs novas ou alteradas desde a última abertura: lidas em segundo plano
+    jobs = CviJobs(window)
+    actions.atualiza_osfs(window)
     # Event loop
     try:
         while True:
-            event, values = window.read()
+            # com uma ação em execução, acorda a cada CviJobs.INTERVALO para mostrar a saída
+            event, values = window.read(timeout=jobs.timeout())
+            jobs.poll()
             if event in (sg.WIN_CLOSED, 'Exit'):
                 break
+            if event == sg.TIMEOUT_EVENT:
+                continue
+            if event == 'Cancelar':
+                jobs.cancela()
+                continue
+            if event == '-OSFS-':
+                actions.osfs_event(window, values['-OSFS-'])
+                continue
             print(event, values)
             # ------ Process menu choices ------ #
             if event == '-COMBO-':
@@ -84,28 +122,8 @@ def main_window(menu_def, buttons, osf_list, osf_selecionada):
                 actions.open_excel_html_action(window, 'html')
             elif event == 'Propriedades':
                 actions.properties_action()
-            elif event == '01 Converter':
-                pycvi.conv.conv_action(window, values['-COMBO-'])
-            elif event == 'Cadesp':
-                pycvi.pancho.cadesp_action(window, values['-COMBO-'])
-            elif event == 'PGSF':
-                pycvi.pancho.pgsf_action(window, values['-COMBO-'])
-            elif event == 'Sem Papel':
-                pycvi.pancho.sempapel_action(window, values['-COMBO-'])
-            elif event == '00 Pesquisa Livre':
-                pycvi.audit._00_action(window, values['-COMBO-'])
-            elif event == '02 Audit Conciliação':
-                pycvi.audit._02_action(window, values['-COMBO-'])
-            elif event == '03 Audit DocAtribs':
-                pycvi.audit._03_action(window, values['-COMBO-'])
-            elif event == '21 Dados das EFDs':
-                pycvi.audit._21_action(window, values['-COMBO-'])
-            elif event == '35 Scanc':
-                pycvi.audit._35_action(window, values['-COMBO-'])
-            elif event == '95 Específico':
-                pycvi.audit._95_action(window, values['-COMBO-'])
-            elif event == 'DFe':
-                pycvi.audit._90_action(window, values['-COMBO-'])
+            elif event in ACOES:
+                menu_action(window, jobs, event, values)
             elif event == 'SqliteMan':
                 actions.startfile_action(r'Sqliteman-1.2.2\sqliteman.exe')
             elif event == 'SqliteBro':
@@ -122,10 +140,17 @@ def main_window(menu_def, buttons, osf_list, osf_selecionada):
                 actions.sqlToData_generic_action(window)
             elif event == 'Sobre...':
                 actions.about_action(window)
+        jobs.fecha()
         window.close()
     except Exception as e:
         traceback.print_exc()
         sg.popup_error_with_traceback(f'Erro no menu...', e)
 
 
-main_window(menu_def, buttons, osf_list, osf_selecionada)
+# a conversão usa um pool de processos (pycvi.conv.conv_action), que no Windows reimporta
+#   este módulo em cada processo: a janela só pode ser aberta no processo principal
+if __name__ == '__main__':
+    config.setup()
+    actions = Actions(config, cviPr)
+    osf_list, osf_selecionada = actions.get_osfs()
+    main_window(menu_def, buttons, osf_list, osf_selecionada)
@@ -3,6 +3,7 @@ import os
 import subprocess
 import traceback
 import time
+import threading
 
 # import pycvi
 from pycvi.CviSqlToData import CviSqlToData
@@ -21,17 +22,59 @@ class Actions:
         self.cviPr = cviPr
 
     def get_osfs(self):
+        """Lista do combo a partir do cache de CviPr, sem abrir nenhum osf*.db3
+
+        Os bancos novos ou alterados ficam para atualiza_osfs, depois de a janela abrir
+        """
+        self.osfs, self.osfs_faltam, self.osfs_removidos = self.cviPr.osfCache()
+        return self.osf_combo()
+
+    def osf_combo(self):
         osf_list = []
         osf_selecionada = ''
-        for osf in self.cviPr.getOsfList():
-            item_value = f"{osf['osf']} CNPJ: {osf['cnpj']} "\
-                         + f"IE: {osf['ie']}  {osf['razao']}"
+        for osf in self.cviPr.ordenaOsfs(self.osfs):
+            item_value = self.cviPr.osfCombo(osf)
             if (self.cvi_sys_data['osf_atual'] == osf['osf']
                     and self.cvi_sys_data['cnpj_atual'] == osf['cnpj']):
                 osf_selecionada = item_value
             osf_list.append(item_value)
         return osf_list, osf_selecionada
 
+    def atualiza_osfs(self, window):
+        """Lê numa thread os osf*.db3 novos ou alterados desde o último cache
+
+        Cada banco lido chega ao loop de eventos de cvi5 como '-OSFS-', com
+        (osfs, erro), e (None, None) no final; ver osfs_event
+        """
+        faltam, removidos = self.osfs_faltam, self.osfs_removidos
+        self.osfs_faltam, self.osfs_removidos = [], []
+        if not faltam and not removidos:
+            return
+
+        def le():
+            self.cviPr.limpaOsfCache(removidos)
+            for db in faltam:
+                window.write_event_value('-OSFS-', self.cviPr.atualizaOsfCache(db))
+            window.write_event_value('-OSFS-', (None, None))
+
+        if faltam:
+            print(f"Lendo {len(faltam)} banco(s) de osf novo(s) ou alterado(s)...")
+        threading.Thread(target=le, daemon=True).start()
+
+    def osfs_event(self, window, value):
+        osfs, erro = value
+        if erro is not None:
+            print(erro)
+        if osfs is None:
+            print("Lista de osfs atualizada")
+            return
+        if not osfs:
+            return
+        self.osfs += osfs
+        osf_list, osf_selecionada = self.osf_combo()
+        window['-COMBO-'].update(value=window['-COMBO-'].get() or osf_selecionada,
+                                 values=osf_list)
+
     def combo_action(self, combo_value):
         self.cvi_sys_data = self.config.load_cvi_sys_data()
         self.cvi_sys_data['osf_atual'] = combo_value[:11]
@@ -75,18 +118,17 @@ class Actions:
         if fileType not in ('txt', 'html'):
             print("#ERRO#... fileType deve ser 'txt' ou 'html'")
             return
-        file_dict = {}
-        self.cviPr.recursiveFilemtime(self.config.CVI_VAR, file_dict, fileType)
-        # Ordenar o dicionário pela valor em ordem decrescente
-        file_sort = dict(sorted(file_dict.items(),
-                                key=lambda item: item[1], reverse=True))
-        # Pegar apenas os primeiros 20 itens do dicionário
-        file_top = dict(list(file_sort.items())[:20])
-        file_selection = self.combo_popup(window, list(file_top.keys()))
+        # no Excel abrem também os relatórios gerados em xlsx
+        fileTypes = ['txt', 'xlsx'] if fileType == 'txt' else [fileType]
+        file_top = self.cviPr.recentFiles(self.config.CVI_VAR, fileTypes, 20)
+        if not file_top:
+            print(f"Nenhum arquivo {' ou '.join(fileTypes)} encontrado em {self.config.CVI_VAR}")
+            return
+        file_selection = self.combo_popup(window, file_top)
         if file_selection is None:
             print("Seleção cancelada pelo usuário")
         else:
-            if fileType == 'html':
+            if fileType == 'html' or file_selection.lower().endswith('.xlsx'):
                 os.startfile(os.path.realpath(file_selection))
                 print(f"Aberto {file_selection} - "
                       + "verifique se está em segundo plano")
@@ -109,11 +151,18 @@ class Actions:
             if self.cvi_sys_data['toDataType'] == 'html' else False
         default_txt = True \
             if self.cvi_sys_data['toDataType'] == 'txt' else False
+        default_xlsx = True \
+            if self.cvi_sys_data['toDataType'] == 'xlsx' else False
+        default_htmlpag = True \
+            if self.cvi_sys_data['toDataType'] == 'htmlpag' else False
 
         layout = [
             [sg.Text('Saída de Relatório: '),
              sg.Radio('html', "RADIO1", default=default_html),
-             sg.Radio('txt', "RADIO1", default=default_txt)],
+             sg.Radio('txt', "RADIO1", default=default_txt),
+             sg.Radio('xlsx', "RADIO1", default=default_xlsx),
+             sg.Radio('html paginado (sem limite de células)', "RADIO1",
+                      default=default_htmlpag)],
             [sg.Text('Número máximo de células: '),
              sg.Input(default_text=self.cvi_sys_data['maxCells'],
                       key='-MAXCELLS-', size=(5, 1),
@@ -121,6 +170,14 @@ class Actions:
             [sg.Checkbox('Mostrar SQL ao gerar arquivo html:',
                          default=self.cvi_sys_data['showSql'],
                          key='-SHOWSQL-')],
+            [sg.Text('Processos na conversão (0 = um por CPU): '),
+             sg.Input(default_text=self.cvi_sys_data.get('convWorkers', 0),
+                      key='-CONVWORKERS-', size=(5, 1),
+                      enable_events=True, tooltip='Digite um número inteiro')],
+            [sg.Checkbox('Auditorias: analisar o plano (EXPLAIN QUERY PLAN) de cada relatório',
+                         default=self.cvi_sys_data.get('indexAdvisor', False),
+                         key='-INDEXADVISOR-',
+                         tooltip='Aponta as varreduras completas de tabela que restam')],
             [sg.OK()]
         ]
         window = sg.Window('Propriedades', layout, modal=True)
@@ -137,10 +194,17 @@ class Actions:
                     sg.popup('Erro', 'Por favor, digite um número '
                              + 'inteiro para maxCells')
                     continue
+                if not values['-CONVWORKERS-'].isdigit():
+                    sg.popup('Erro', 'Por favor, digite um número '
+                             + 'inteiro para processos na conversão')
+                    continue
                 self.cvi_sys_data['toDataType'] = \
-                    'html' if values[0] is True else 'txt'
+                    'html' if values[0] is True else 'xlsx' if values[2] is True \
+                    else 'htmlpag' if values[3] is True else 'txt'
                 self.cvi_sys_data['maxCells'] = int(values['-MAXCELLS-'])
                 self.cvi_sys_data['showSql'] = values['-SHOWSQL-']
+                self.cvi_sys_data['convWorkers'] = int(values['-CONVWORKERS-'])
+                self.cvi_sys_data['indexAdvisor'] = values['-INDEXADVISOR-']
                 self.config.save_cvi_sys_data(self.cvi_sys_data)
                 print(self.cvi_sys_data)
                 window.close()
@@ -196,15 +260,11 @@ class Actions:
                     values['-TITLE-'], values['-SQL-']
 
     def sqlToData_generic_action(self, window):
-        file_dict = {}
-        self.cviPr.recursiveFilemtime(self.config.CVI_VAR, file_dict, 'db')
-        self.cviPr.recursiveFilemtime(self.config.CVI_VAR, file_dict, 'db3')
-        # Ordenar o dicionário pela valor em ordem decrescente
-        file_sort = dict(sorted(file_dict.items(),
-                                key=lambda item: item[1], reverse=True))
-        # Pegar apenas os primeiros 20 itens do dicionário
-        file_top = dict(list(file_sort.items())[:20])
-        file_selection = self.combo_popup(window, list(file_top.keys()))
+        file_top = self.cviPr.recentFiles(self.config.CVI_VAR, ['db', 'db3'], 20)
+        if not file_top:
+            print(f"Nenhum banco de dados encontrado em {self.config.CVI_VAR}")
+            return False
+        file_selection = self.combo_popup(window, file_top)
         if file_selection is None:
             print("Seleção cancelada pelo usuário")
             return False
@@ -233,8 +293,7 @@ class Actions:
                                  self.cvi_sys_data['showSql'])
         try:
             sqlToData.run(cvidb, sql, fileName, queryTitle)
-            print(f"Do sql acima, o arquivo "
-                  + f"{fileName}.{self.cvi_sys_data['toDataType']} "
+            print(f"Do sql acima, o arquivo {sqlToData.FileName} "
                   + "foi gerado com sucesso\n")
             return True
         except Exception as e:
@@ -1,9 +1,8 @@
 import os
 import sys
-import json
-from win32 import win32api
 
 from pycvi.CviDb import CviDb
+from pycvi.CviSysData import CviSysData
 
 
 class Config:
@@ -12,38 +11,74 @@ class Config:
     Esta é a primeira classe carregada.
     Define especialmente os diretórios de trabalho e cria se não existir.
     Carrega  e salva também cvi_sys_data, que são basicamente as opções gravadas do sistema
+
+    Há uma única instância por processo: Config() devolve sempre o mesmo objeto, então os
+    vários config = Config() dos módulos não refazem nada. Criar a instância só calcula os
+    diretórios, sem tocar no disco; as pastas, o cvi_sys.json e o cvi_sys.db são criados
+    por setup(), chamado em cvi5 e, se ainda não foi, ao ler ou gravar cvi_sys_data.
+    Os diretórios usr, res e var podem vir das variáveis de ambiente CVI_USR, CVI_RES e
+    CVI_VAR (testes, execução sem janela) ou de override()
+    cvi_sys_data é lido e gravado por CviSysData (cache por mtime, gravação atômica), no
+    cvi_sys.json ou, com a variável de ambiente CVI_SYS_DATA=db, no cvi_sys.db
     """
+    _instancia = None
+
+    def __new__(cls):
+        if cls._instancia is None:
+            cls._instancia = super().__new__(cls)
+            cls._instancia.iniciada = False
+        return cls._instancia
 
     def __init__(self):
+        if self.iniciada:
+            return
+        self.iniciada = True
         self.PROJECT_NAME: str = "CVI"       # padrão do docs(Swagger UI) e ReDoc
         self.PROJECT_VERSION: str = "5.1.2306"    # padrão do docs(Swagger UI) e ReDoc
-        self.CVI_USR = os.path.join(os.path.abspath(os.path.dirname(os.path.dirname(
-            os.path.dirname(__file__)))), 'usr')
-        self.CVI_RES = os.path.join(os.path.abspath(os.path.dirname(os.path.dirname(
-            os.path.dirname(__file__)))), 'res')
-        self.CVI_VAR = os.path.join(os.path.abspath(os.path.dirname(os.path.dirname(
-            os.path.dirname(__file__)))), 'var')
+        raiz = os.path.abspath(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+        self.CURRENT_PID = os.getpid()
+        self.sys_data_override = dict()  # ver override_sys_data
+        self.diretorios(os.getenv('CVI_USR') or os.path.join(raiz, 'usr'),
+                        os.getenv('CVI_RES') or os.path.join(raiz, 'res'),
+                        os.getenv('CVI_VAR') or os.path.join(raiz, 'var'))
+
+    def diretorios(self, usr, res, var):
+        self.CVI_USR = usr
+        self.CVI_RES = res
+        self.CVI_VAR = var
+        self.CVI_SOURCE = os.path.join(self.CVI_VAR, 'source')
+        self.CVI_RESULT = os.path.join(self.CVI_VAR, 'result')
+        self.CVI_SYS_DATA_FILENAME = os.path.join(self.CVI_VAR, 'cvi_sys.json')
+        self.sys_data = CviSysData(self.CVI_SYS_DATA_FILENAME,
+                                   os.path.join(self.CVI_VAR, 'cvi_sys.db'),
+                                   'db' if os.getenv('CVI_SYS_DATA') == 'db' else 'json')
+        self.pronta = False  # setup() ainda não rodou para estes diretórios
+
+    def override(self, CVI_USR=None, CVI_RES=None, CVI_VAR=None):
+        """Troca os diretórios da instância única (os módulos que já guardaram config
+        enxergam a troca); setup() volta a valer para os novos diretórios
+        """
+        self.diretorios(CVI_USR or self.CVI_USR, CVI_RES or self.CVI_RES,
+                        CVI_VAR or self.CVI_VAR)
+
+    def override_sys_data(self, **opcoes):
+        """Opções de cvi_sys_data só para este processo (linha de comando, ver CviCli):
+        valem em load_cvi_sys_data, mas não são gravadas no cvi_sys.json
+        """
+        self.sys_data_override.update(opcoes)
+
+    def setup(self):
+        """Cria, se não existirem, as pastas de var, o cvi_sys.json e o cvi_sys.db.
+        Só roda uma vez por processo (e por override)
+        """
+        if self.pronta:
+            return True
+        self.pronta = True
         Config.create_dir_if_not_exists(self.CVI_VAR)
         Config.create_dir_if_not_exists(os.path.join(self.CVI_VAR, 'log'))
         Config.create_dir_if_not_exists(os.path.join(self.CVI_VAR, 'tmp'))
-        self.CVI_SOURCE = os.path.join(self.CVI_VAR, 'source')
         Config.create_dir_if_not_exists(self.CVI_SOURCE)
-        self.CVI_RESULT = os.path.join(self.CVI_VAR, 'result')
         Config.create_dir_if_not_exists(self.CVI_RESULT)
-        self.CURRENT_PID = os.getpid()
-        self.CVI_SYS_DATA_FILENAME = os.path.join(self.CVI_VAR, 'cvi_sys.json')
-        # if not exists cvi_sys_data_filename, instantiate an empty dict and create it
-        if (not os.path.isfile(self.CVI_SYS_DATA_FILENAME)):
-            print(f"Arquivo {self.CVI_SYS_DATA_FILENAME} inexistente... "
-                  + "Criando arquivo json inicial")
-            cvi_sys_data = {}
-            # add members/options
-            cvi_sys_data['osf_atual'] = ''
-            cvi_sys_data['cnpj_atual'] = ''
-            cvi_sys_data['toDataType'] = 'html'
-            cvi_sys_data['maxCells'] = 1000
-            cvi_sys_data['showSql'] = True
-            self.save_cvi_sys_data(cvi_sys_data)
         # if not exists cvi_sys.db, instantiate it
         if not os.path.isfile(os.path.join(self.CVI_VAR, 'cvi_sys.db')):
             print(f"Banco de dados {os.path.join(self.CVI_VAR), 'cvi_sys.db'} inexistente..."
@@ -81,10 +116,28 @@ CREATE TABLE sempapel_list
         (origem, codigo, linha);
     ''')
             print("Banco de Dados criado com sucesso")
+        # if not exists cvi_sys_data, instantiate a dict with the defaults and create it
+        #   (depois do cvi_sys.db, onde cvi_sys_data fica com CVI_SYS_DATA=db)
+        if not self.sys_data.existe():
+            print(f"Arquivo {self.CVI_SYS_DATA_FILENAME} inexistente... "
+                  + "Criando arquivo json inicial")
+            cvi_sys_data = {}
+            # add members/options
+            cvi_sys_data['osf_atual'] = ''
+            cvi_sys_data['cnpj_atual'] = ''
+            cvi_sys_data['toDataType'] = 'html'
+            cvi_sys_data['maxCells'] = 1000
+            cvi_sys_data['showSql'] = True
+            cvi_sys_data['convWorkers'] = 0  # 0 = um processo por CPU
+            cvi_sys_data['indexAdvisor'] = False  # EXPLAIN QUERY PLAN nos relatórios
+            cvi_sys_data['auditWorkers'] = 0  # 0 = até 4 conexões (ver sqlToData_batch)
+            self.save_cvi_sys_data(cvi_sys_data)
+        return True
 
     def printSettings(self, full=True):
         drive_letter = self.CVI_RES[0:2]
         if full is True:
+            from win32 import win32api  # só no Windows
             print(f'vol_info: {drive_letter} =',
                   win32api.GetVolumeInformation(f'{drive_letter}\\')[0])
             print('sys.version: ', sys.version)
@@ -105,17 +158,19 @@ CREATE TABLE sempapel_list
                 print(f'{setting} = {getattr(self, setting)}')
 
     def load_cvi_sys_data(self):
+        self.setup()
         try:
-            with open(self.CVI_SYS_DATA_FILENAME, 'r') as file:
-                return json.load(file)
+            cvi_sys_data = self.sys_data.load()
         except Exception as e:
             print(f"Erro ao abrir ou ler o arquivo {self.CVI_SYS_DATA_FILENAME}.", e)
             return False
+        cvi_sys_data.update(self.sys_data_override)
+        return cvi_sys_data
 
     def save_cvi_sys_data(self, cvi_sys_data):
+        self.setup()
         try:
-            with open(self.CVI_SYS_DATA_FILENAME, 'w') as file:
-                json.dump(cvi_sys_data, file)
+            self.sys_data.save(cvi_sys_data)
         except Exception as e:
             print(f"Erro ao salvar o arquivo {self.CVI_SYS_DATA_FILENAME}.", e)
             return False
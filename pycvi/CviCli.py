@@ -0,0 +1,186 @@
+"""Linha de comando do CVI, sem janela: conversão, auditorias, DFes e SQL genérico
+
+    python -m pycvi.CviCli conv ARQUIVO.zip [--osf OSF [--cnpj CNPJ]] [--workers N]
+    python -m pycvi.CviCli audit 02 21 95 ... (--osf OSF ... | --todas) [--workers N]
+    python -m pycvi.CviCli dfe --osf OSF --chaves CHAVE ... [--pasta PASTA]
+    python -m pycvi.CviCli sql BANCO (--sql SQL | --arquivo ARQ.sql) --saida NOME [--titulo T]
+
+Opções de todos os comandos: --var PASTA (no lugar de CVI_VAR), --tipo html|txt|xlsx|htmlpag
+e --max-cells N. Elas e --workers valem só para esta execução: o cvi_sys.json não muda.
+Roda as mesmas funções do menu de cvi5 (ver cvi5.ACOES), recebendo uma JanelaCli no lugar da
+janela: sem os diálogos, com os SQLs padrão de cada auditoria. Termina com código 1 se
+alguma ação falhou, para as execuções agendadas (cron, Agendador de Tarefas)
+"""
+import os
+import sys
+import time
+import argparse
+import importlib
+import traceback
+
+from pycvi.Config import Config
+from pycvi.CviPr import CviPr
+from pycvi.CviJobs import JanelaCli
+
+config = Config()
+
+# auditoria -> função de pycvi.audit. 00 Pesquisa Livre fica de fora: abre o Sqliteman
+AUDITORIAS = {
+    '02': '_02_action',
+    '03': '_03_action',
+    '21': '_21_action',
+    '35': '_35_action',
+    '95': '_95_action',
+}
+TIPOS = ('html', 'txt', 'xlsx', 'htmlpag')
+
+
+def executa(nome, funcao, *args):
+    """Roda uma ação; False se ela falhou (exceção ou retorno False)"""
+    print(f"\n===== {nome} =====\n")
+    start_time = time.time()
+    try:
+        resultado = funcao(JanelaCli(), *args)
+    except Exception:
+        traceback.print_exc()
+        resultado = False
+    elapsed = time.time() - start_time
+    if resultado is False:
+        print(f"##ERRO## {nome} falhou ({elapsed:.1f} segundos)")
+        return False
+    print(f"{nome} concluído em {elapsed:.1f} segundos")
+    return True
+
+
+def osfs(osf_args, cnpj=None, todas=False):
+    """values (ver CviPr.osfCombo) de cada osf pedida; as não encontradas são avisadas"""
+    if cnpj is not None:
+        valores = []
+        for osf in osf_args:
+            if len(osf) != 11 or len(cnpj) != 14:
+                print(f"##ERRO## osf {osf} ou cnpj {cnpj} inválido (11 e 14 caracteres)")
+                valores.append(None)
+                continue
+            valores.append(CviPr.osfCombo({'osf': osf, 'cnpj': cnpj, 'ie': '', 'razao': ''}))
+        return valores
+    osfList = CviPr(config).getOsfList()
+    if todas:
+        return [CviPr.osfCombo(osf) for osf in osfList]
+    valores = []
+    for osf in osf_args:
+        achadas = [item for item in osfList if item['osf'].strip() == osf.strip()]
+        if not achadas:
+            print(f"##ERRO## osf {osf} não encontrada em {config.CVI_RESULT}")
+            valores.append(None)
+        valores += [CviPr.osfCombo(item) for item in achadas]
+    return valores
+
+
+def conv(args):
+    from pycvi.conv import conv_action
+    values = osfs(args.osf, args.cnpj)[0] if args.osf else ''
+    if values is None:
+        return 1
+    return 0 if executa(f"Conversão de {args.zip}", conv_action, values,
+                        os.path.abspath(args.zip)) else 1
+
+
+def audit(args):
+    modulo = importlib.import_module('pycvi.audit')
+    falhas = 0
+    for values in osfs(args.osf or [], args.cnpj, args.todas):
+        if values is None:
+            falhas += 1
+            continue
+        for numero in args.auditorias:
+            if not executa(f"Auditoria {numero} da osf {values[:11]} do cnpj {values[18:32]}",
+                           getattr(modulo, AUDITORIAS[numero]), values):
+                falhas += 1
+    return 1 if falhas else 0
+
+
+def dfe(args):
+    from pycvi.audit import _90_action
+    values = osfs([args.osf], args.cnpj)[0]
+    if values is None:
+        return 1
+    return 0 if executa(f"DFes da osf {args.osf}", _90_action, values,
+                        '\n'.join(args.chaves), args.pasta) else 1
+
+
+def sql(args):
+    from pycvi.CviDb import CviDb
+    from pycvi.audit.AuditHelpers import AuditHelpers
+    if args.arquivo is not None:
+        with open(args.arquivo, 'r', encoding='utf-8') as file:
+            args.sql = file.read()
+    banco = os.path.abspath(args.banco)
+    cvidb = CviDb(os.path.dirname(banco), os.path.basename(banco))
+    try:
+        cvidb.opendb()
+    except Exception as e:
+        print(f"##ERRO## Erro ao abrir o banco de dados {banco}", e)
+        return 1
+    try:
+        ah = AuditHelpers(config)
+        return 0 if executa(f"Sql em {banco}", ah.sqlToData_run_aux, cvidb, args.sql,
+                            os.path.abspath(args.saida), args.titulo) else 1
+    finally:
+        cvidb.close()
+
+
+def main(argv=None):
+    comum = argparse.ArgumentParser(add_help=False)
+    comum.add_argument('--var', help='pasta var (padrão: CVI_VAR ou var)')
+    comum.add_argument('--tipo', choices=TIPOS, help='formato dos relatórios')
+    comum.add_argument('--max-cells', type=int, help='células no html (-1 = todas)')
+    parser = argparse.ArgumentParser(prog='python -m pycvi.CviCli',
+                                     description='CVI sem janela')
+    comandos = parser.add_subparsers(dest='comando', required=True)
+    p = comandos.add_parser('conv', parents=[comum], help='converte um .zip')
+    p.add_argument('zip')
+    p.add_argument('--osf', nargs=1, help='sem osf, converte numa pasta temporária')
+    p.add_argument('--cnpj')
+    p.add_argument('--workers', type=int, help='processos (0 = um por CPU)')
+    p = comandos.add_parser('audit', parents=[comum], help='gera auditorias')
+    p.add_argument('auditorias', nargs='+', choices=sorted(AUDITORIAS))
+    osf = p.add_mutually_exclusive_group(required=True)
+    osf.add_argument('--osf', nargs='+')
+    osf.add_argument('--todas', action='store_true', help='todas as osfs de CVI_RESULT')
+    p.add_argument('--cnpj', help='cnpj das osfs (senão, procura na lista de osfs)')
+    p.add_argument('--workers', type=int, help='conexões em paralelo por auditoria')
+    p = comandos.add_parser('dfe', parents=[comum], help='gera DFes pela chave')
+    p.add_argument('--osf', required=True)
+    p.add_argument('--cnpj')
+    p.add_argument('--chaves', nargs='+', required=True)
+    p.add_argument('--pasta', help='padrão: result/<cnpj>/<osf>/DFes')
+    p = comandos.add_parser('sql', parents=[comum], help='roda um SQL num banco')
+    p.add_argument('banco')
+    fonte = p.add_mutually_exclusive_group(required=True)
+    fonte.add_argument('--sql')
+    fonte.add_argument('--arquivo', help='arquivo com o SQL')
+    p.add_argument('--saida', required=True, help='arquivo gerado, sem a extensão')
+    p.add_argument('--titulo', default='')
+    args = parser.parse_args(argv)
+    if args.comando == 'audit' and args.todas and args.cnpj is not None:
+        # --cnpj é o cnpj das osfs de --osf; com --todas cada osf já tem o seu
+        parser.error('--todas não pode ser usado com --cnpj')
+
+    if args.var is not None:
+        config.override(CVI_VAR=os.path.abspath(args.var))
+    if not config.setup():
+        sys.exit(1)
+    opcoes = dict()
+    if args.tipo is not None:
+        opcoes['toDataType'] = args.tipo
+    if args.max_cells is not None:
+        opcoes['maxCells'] = args.max_cells
+    if getattr(args, 'workers', None) is not None:
+        opcoes['convWorkers' if args.comando == 'conv' else 'auditWorkers'] = args.workers
+    config.override_sys_data(**opcoes)
+    comando = {'conv': conv, 'audit': audit, 'dfe': dfe, 'sql': sql}[args.comando]
+    sys.exit(comando(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -2,6 +2,7 @@
 
 import os
 import sqlite3
+from pathlib import Path
 
 
 class CviDb:
@@ -15,12 +16,18 @@ class CviDb:
         self.conn = None  # para guardar a conexão com o banco de dados
         self.cursor = None  # para guardar o cursor
 
-    def opendb(self):
+    def opendb(self, readonly=False):
+        # readonly = True: conexão só de leitura (mode=ro), usada pelas threads de
+        #     AuditHelpers.sqlToData_batch. Pode ser fechada por outra thread
         db_path = os.path.join(self.db_dir, self.db_name)
         if not os.path.exists(db_path):
             raise Exception(f'O arquivo do banco de dados não foi encontrado: {db_path}')
         try:
-            self.conn = sqlite3.connect(db_path)
+            if readonly:
+                self.conn = sqlite3.connect(self.uri_readonly(db_path), uri=True,
+                                            check_same_thread=False)
+            else:
+                self.conn = sqlite3.connect(db_path)
             self.cursor = self.conn.cursor()
         except Exception as e:
             raise Exception(f'Erro ao abrir o banco de dados {db_path}: {e}')
@@ -39,10 +46,18 @@ class CviDb:
     def close(self):
         self.conn.close()
 
-    def attachdb(self, db_dir, db_name):
+    @staticmethod
+    def uri_readonly(db_path):
+        # pathlib em vez de urllib.request.pathname2url, que pesa na importação
+        return Path(os.path.abspath(db_path)).as_uri() + '?mode=ro'
+
+    def attachdb(self, db_dir, db_name, readonly=False):
         db_at_name = os.path.join(db_dir, db_name)
         if not os.path.exists(db_at_name):
             raise Exception(f'O arquivo do banco de dados não foi encontrado: {db_at_name}')
+        if readonly:
+            # numa conexão aberta com uri=True o ATTACH também aceita uri
+            db_at_name = self.uri_readonly(db_at_name)
         sql = f"ATTACH '{db_at_name}' AS " + db_name[:-4]
         # print(sql)
         try:
@@ -67,6 +82,12 @@ class CviDb:
         self.conn.commit()
 
     def createIndex(self, database, table, field, field2=''):
+        sql = self.indexSql(database, table, field, field2)
+        print(sql)
+        self.exec_commit(sql)
+
+    def indexSql(self, database, table, field, field2=''):
+        # database: '' (banco principal), 'temp' ou a osf (índice no osf<osf>.db3 anexado)
         if (database == ''):
             sqldb = ''
         else:
@@ -79,8 +100,7 @@ class CviDb:
         else:
             sql = f"CREATE INDEX IF NOT EXISTS {sqldb}{table}_{field}_{field2} "\
                   f"ON {table} ({field} ASC, {field2} ASC);"
-        print(sql)
-        self.exec_commit(sql)
+        return sql
 
     def dtaSPED_AAAA_MM_DD(self, data):
         # Transforma data do formato SPED ( DDMMAAAA ) para AAAA-MM-DD
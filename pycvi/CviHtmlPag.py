@@ -0,0 +1,313 @@
+import json
+import html
+from string import Template
+from typing import List
+
+
+class CviHtmlPag:
+    """Html paginado de CviSqlToData (toDataType = 'htmlpag')
+
+    O resultado inteiro vai para a pasta <arquivo>_dados, em blocos .js de até
+    BLOCO_LINHAS linhas: cada bloco é uma chamada cviBloco(n, [[...], ...]), carregada
+    com uma tag <script> só quando aparece na tela. Assim a página abre direto do disco
+    (file://), sem servidor, o que não seria possível com fetch de arquivos .json.
+    A página rola só as linhas visíveis; ordenação e filtro valem sobre os blocos
+    já carregados (o botão 'Carregar tudo' traz os que faltam)
+    """
+    LIMITE_INT = 999999999999999  # como em CviSqlToData: acima disso o Excel corta dígitos
+
+    @staticmethod
+    def valor(campo):
+        # mesma interpretação de tipo_campo em CviSqlToData:
+        #     texto que parece int vira int, int acima de 15 dígitos vira '#' + texto
+        #     (o javascript também perderia os dígitos)
+        if isinstance(campo, str):
+            if not (campo.isdigit() or (campo[:1] == '-' and campo.lstrip('-').isdigit())):
+                return campo
+            campo = int(campo)
+        if isinstance(campo, bool):
+            return int(campo)
+        if isinstance(campo, int):
+            if campo > CviHtmlPag.LIMITE_INT:
+                return '#' + str(campo)
+            if campo < -CviHtmlPag.LIMITE_INT:
+                return str(campo)
+            return campo
+        if isinstance(campo, bytes):
+            return '#Bytes#'
+        return campo
+
+    @staticmethod
+    def bloco(indice: int, rows: List) -> str:
+        """Conteúdo do arquivo .js do bloco indice"""
+        valor = CviHtmlPag.valor
+        linhas = []
+        for row in rows:
+            linhas.append([campo if type(campo) is float or campo is None else valor(campo)
+                           for campo in row])
+        # inf e nan saem como Infinity e NaN, que são válidos em javascript
+        dados = json.dumps(linhas, ensure_ascii=False, separators=(',', ':'),
+                           default=str)
+        return f"cviBloco({indice},{dados});\n"
+
+    @staticmethod
+    def nomeBloco(indice: int) -> str:
+        return f"{indice:05d}.js"
+
+    @staticmethod
+    def pagina(fileName: str, title: str, sql: str, fields: List, tipos: List,
+               total: int, blocos: int, tamanho: int, pasta: str) -> str:
+        cvi = json.dumps({'campos': fields, 'tipos': tipos, 'total': total,
+                          'blocos': blocos, 'tamanho': tamanho, 'pasta': pasta + '/'},
+                         ensure_ascii=False).replace('</', '<\\/')
+        return PAGINA.substitute(fileName=html.escape(fileName), title=html.escape(title),
+                                 sql=f"<h6>{html.escape(sql)}</h6>" if sql else '',
+                                 cvi=cvi)
+
+
+PAGINA = Template("""<!DOCTYPE HTML>
+<html>
+<head>
+  <meta charset="UTF-8">
+  <meta name="viewport" content="width=device-width, initial-scale=1">
+
+  <title>Exportação html de $fileName</title>
+  <meta name="author" content="pmarote">
+  <style>
+    html{ font-family: sans-serif; color:#333; background-color:#fff; padding:1em; }
+    body{ padding:0; margin:0; line-height:1 }
+    table { font-size: 0.9em; margin: 0 auto; width:100%; border-collapse: collapse;}
+    th{ font-weight:bold; background-color:#ddd; cursor: pointer;
+        position: sticky; top: 0; z-index: 1; }
+    td, th { padding:0.3em 0.5em; border:1px solid #ccc; white-space: nowrap; }
+    tbody tr { height: 24px; }
+    h1, h2, h3, h4, h5, h6 { padding:0.5em; margin: 0.2em; }
+    button:hover {background-color:lightgray;}
+    #area { height: 75vh; overflow: auto; border: 1px solid #ccc; }
+    #barra { padding: 0.5em; }
+    #situacao { padding: 0 1em; color: #666; }
+    .num { text-align: right; }
+    .neg { text-align: right; color: red; }
+    .hl2 { font-weight: bold; color: white; background-color: red; font-size: larger; }
+    .hl1 { font-weight: bold; background-color: yellow; }
+  </style>
+</head>
+<body>
+  <h2>$title</h2>
+  $sql
+  <div id="barra">
+    Filtro: <input id="filtro" size="40" placeholder="texto em qualquer coluna">
+    <button id="tudo">Carregar tudo</button>
+    <span id="situacao"></span>
+  </div>
+  <div id="area">
+    <table>
+      <thead><tr id="cabecalho"></tr></thead>
+      <tbody id="corpo"></tbody>
+    </table>
+  </div>
+<script>
+var CVI = $cvi;
+var ALTURA = 24;   // altura de cada linha, em px (ver tbody tr)
+var blocos = {}, pedidos = {}, carregadas = 0;
+var visao = null;  // null = ordem original; senão, índices das linhas já carregadas
+var ordem = {coluna: -1, sentido: 1};
+var agendado = false, sujo = false;
+var collator = new Intl.Collator('pt-BR', {numeric: true});
+
+function nomeBloco(k) { return CVI.pasta + ('0000' + k).slice(-5) + '.js'; }
+
+function pede(k) {
+  if (k < 0 || k >= CVI.blocos || blocos[k] || pedidos[k]) return;
+  pedidos[k] = true;
+  var s = document.createElement('script');
+  s.src = nomeBloco(k);
+  s.onerror = function () {
+    situacao('Não consegui carregar ' + nomeBloco(k));
+  };
+  document.head.appendChild(s);
+}
+
+function cviBloco(k, linhas) {
+  blocos[k] = linhas;
+  delete pedidos[k];
+  carregadas += linhas.length;
+  if (visao !== null) sujo = true;  // a ordenação/filtro é refeita uma vez em desenha
+  agenda();
+}
+
+function linha(i) {
+  var b = blocos[Math.floor(i / CVI.tamanho)];
+  return b ? b[i % CVI.tamanho] : undefined;
+}
+
+function escapa(s) {
+  return s.replace(/&/g, '&amp;').replace(/</g, '&lt;').replace(/>/g, '&gt;')
+          .replace(/"/g, '&quot;').replace(/'/g, '&#x27;');
+}
+
+function destaca(s) {  // como htmlHighlight em CviSqlToData
+  var p1 = s.indexOf('##'), p2;
+  if (p1 !== -1) {
+    p2 = s.indexOf('##', p1 + 3);
+    if (p2 !== -1) return s.slice(0, p1) + '<span class="hl2">' + s.slice(p1, p2 + 2)
+                          + '</span>' + s.slice(p2 + 2);
+    return s;
+  }
+  p1 = s.indexOf('#');
+  if (p1 !== -1) {
+    p2 = s.indexOf('#', p1 + 2);
+    if (p2 !== -1) return s.slice(0, p1) + '<span class="hl1">' + s.slice(p1, p2 + 1)
+                          + '</span>' + s.slice(p2 + 1);
+  }
+  return s;
+}
+
+function milhar(v) {  // como htmlMilhar: pontos de milhar e no mínimo duas casas
+  var partes = String(Math.abs(v)).split('.');
+  var inteiro = partes[0].replace(/\\B(?=(\\d{3})+(?!\\d))/g, '.');
+  var decimais = partes.length > 1 ? partes[1] : '0';
+  if (decimais.length < 2) decimais += '0';
+  return (v < 0 ? '-' : '') + inteiro + ',' + decimais;
+}
+
+function texto(v, c) {
+  if (v === null) return '#NaN#';
+  if (typeof v === 'number') {
+    if (!isFinite(v)) return String(v);
+    return (CVI.tipos[c] === 'float' || !Number.isInteger(v)) ? milhar(v) : String(v);
+  }
+  return String(v);
+}
+
+function celula(v, c) {
+  if (typeof v === 'number') {
+    return '<td class="' + (v < 0 ? 'neg' : 'num') + '">' + texto(v, c) + '</td>';
+  }
+  return '<td>' + destaca(escapa(texto(v, c))) + '</td>';
+}
+
+function agenda() {
+  if (agendado) return;
+  agendado = true;
+  window.requestAnimationFrame(desenha);
+}
+
+function desenha() {
+  agendado = false;
+  if (sujo) {
+    sujo = false;
+    refazVisao();
+  }
+  var area = document.getElementById('area');
+  var n = visao === null ? CVI.total : visao.length;
+  var primeira = Math.max(0, Math.floor(area.scrollTop / ALTURA) - 10);
+  var ultima = Math.min(n, primeira + Math.ceil(area.clientHeight / ALTURA) + 20);
+  var html = ['<tr style="height:' + primeira * ALTURA + 'px"></tr>'];
+  var colunas = CVI.campos.length;
+  for (var i = primeira; i < ultima; i++) {
+    var indice = visao === null ? i : visao[i];
+    var l = linha(indice);
+    if (l === undefined) {
+      pede(Math.floor(indice / CVI.tamanho));
+      html.push('<tr><td colspan="' + colunas + '">carregando...</td></tr>');
+      continue;
+    }
+    var tr = '<tr>';
+    for (var c = 0; c < colunas; c++) tr += celula(l[c], c);
+    html.push(tr + '</tr>');
+  }
+  html.push('<tr style="height:' + (n - ultima) * ALTURA + 'px"></tr>');
+  document.getElementById('corpo').innerHTML = html.join('');
+  var msg = CVI.total + ' linhas, ' + carregadas + ' carregadas';
+  if (visao !== null) {
+    msg += ' - ' + visao.length + ' na ordenação/filtro (só sobre as linhas carregadas)';
+  }
+  situacao(msg);
+}
+
+function situacao(msg) { document.getElementById('situacao').textContent = msg; }
+
+function compara(a, b) {
+  if (a === b) return 0;
+  if (a === null || a === undefined) return 1;
+  if (b === null || b === undefined) return -1;
+  if (typeof a === 'number' && typeof b === 'number') return a < b ? -1 : 1;
+  return collator.compare(String(a), String(b));
+}
+
+function refazVisao() {
+  var filtro = document.getElementById('filtro').value.toLowerCase();
+  if (filtro === '' && ordem.coluna < 0) {
+    visao = null;
+    return;
+  }
+  var indices = [];
+  for (var k in blocos) {
+    var b = blocos[k], inicio = Number(k) * CVI.tamanho;
+    for (var j = 0; j < b.length; j++) {
+      if (filtro !== '' && !passa(b[j], filtro)) continue;
+      indices.push(inicio + j);
+    }
+  }
+  if (ordem.coluna >= 0) {
+    var c = ordem.coluna, s = ordem.sentido;
+    indices.sort(function (x, y) { return s * compara(linha(x)[c], linha(y)[c]) || x - y; });
+  } else {
+    indices.sort(function (x, y) { return x - y; });
+  }
+  visao = indices;
+}
+
+function passa(l, filtro) {
+  for (var c = 0; c < l.length; c++) {
+    if (texto(l[c], c).toLowerCase().indexOf(filtro) !== -1) return true;
+  }
+  return false;
+}
+
+function ordena(c) {
+  if (ordem.coluna === c) {
+    if (ordem.sentido === 1) ordem.sentido = -1; else ordem.coluna = -1;
+  } else {
+    ordem = {coluna: c, sentido: 1};
+  }
+  var ths = document.querySelectorAll('#cabecalho th');
+  for (var i = 0; i < ths.length; i++) {
+    ths[i].textContent = CVI.campos[i]
+      + (i === ordem.coluna ? (ordem.sentido === 1 ? ' \\u25B2' : ' \\u25BC') : '');
+  }
+  refazVisao();
+  document.getElementById('area').scrollTop = 0;
+  agenda();
+}
+
+(function () {
+  var cab = document.getElementById('cabecalho');
+  CVI.campos.forEach(function (campo, c) {
+    var th = document.createElement('th');
+    th.textContent = campo;
+    th.title = 'Clique para ordenar as linhas carregadas';
+    th.onclick = function () { ordena(c); };
+    cab.appendChild(th);
+  });
+  var espera;
+  document.getElementById('filtro').oninput = function () {
+    clearTimeout(espera);
+    espera = setTimeout(function () {
+      refazVisao();
+      document.getElementById('area').scrollTop = 0;
+      agenda();
+    }, 300);
+  };
+  document.getElementById('tudo').onclick = function () {
+    for (var k = 0; k < CVI.blocos; k++) pede(k);
+  };
+  document.getElementById('area').onscroll = agenda;
+  window.onresize = agenda;
+  agenda();
+})();
+</script>
+</body>
+</html>
+""")
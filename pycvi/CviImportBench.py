@@ -0,0 +1,74 @@
+"""Tempo de importação do cvi5 (tudo o que roda antes de a janela abrir)
+
+    python -m pycvi.CviImportBench [--orcamento MS] [--mostra N]
+
+Importa cvi5 num processo novo com python -X importtime, mostra os módulos que mais pesam
+e termina com erro (código 1) se o total passar do orçamento ou se algum dos subsistemas
+carregados só no primeiro uso (ver ACOES em cvi5) tiver sido importado antes da janela.
+Serve de teste de regressão: rode depois de mexer em imports de cvi5, Actions, CviPr ou
+Config
+"""
+import os
+import sys
+import argparse
+import subprocess
+
+ORCAMENTO_MS = 1000
+# não podem ser importados antes da janela: são carregados por cvi5.menu_action
+ADIADOS = ('pycvi.conv', 'pycvi.pancho', 'pycvi.audit', 'requests', 'bs4', 'selectorlib',
+           'win32com', 'xlsxwriter')
+
+
+def importtime(modulo='cvi5'):
+    """{módulo: (próprio em us, acumulado em us)} da importação de modulo num processo novo"""
+    raiz = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    processo = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {modulo}'],
+                              cwd=raiz, capture_output=True, text=True)
+    if processo.returncode != 0:
+        raise RuntimeError(f"Erro ao importar {modulo}:\n{processo.stderr}")
+    tempos = dict()
+    for linha in processo.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not linha.startswith('import time:') or 'self [us]' in linha:
+            continue
+        proprio, acumulado, nome = linha[len('import time:'):].split('|')
+        tempos[nome.strip()] = (int(proprio), int(acumulado))
+    return tempos
+
+
+def mede(orcamento=ORCAMENTO_MS, mostra=15):
+    tempos = importtime()
+    total = tempos['cvi5'][1] / 1000
+    print(f"Importação de cvi5: {total:.0f} ms (orçamento {orcamento} ms)\n")
+    print("Módulos mais pesados (acumulado, próprio):")
+    pesados = sorted(tempos.items(), key=lambda item: item[1][0], reverse=True)
+    for nome, (proprio, acumulado) in pesados[:mostra]:
+        print(f"  {acumulado / 1000:8.1f} ms {proprio / 1000:8.1f} ms  {nome}")
+    adiantados = sorted(nome for nome in tempos
+                        if any(nome == adiado or nome.startswith(adiado + '.')
+                               for adiado in ADIADOS))
+    ok = True
+    if adiantados:
+        ok = False
+        print("\n##ERRO## Importados antes da janela (deveriam ficar para o primeiro uso):")
+        for nome in adiantados:
+            print(f"  {nome}")
+    if total > orcamento:
+        ok = False
+        print(f"\n##ERRO## A importação de cvi5 passou do orçamento de {orcamento} ms")
+    return ok
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m pycvi.CviImportBench',
+                                     description='Tempo de importação do cvi5')
+    parser.add_argument('--orcamento', type=int, default=ORCAMENTO_MS,
+                        help='tempo máximo de importação, em ms')
+    parser.add_argument('--mostra', type=int, default=15,
+                        help='quantos módulos mostrar')
+    args = parser.parse_args(argv)
+    sys.exit(0 if mede(args.orcamento, args.mostra) else 1)
+
+
+if __name__ == '__main__':
+    main()
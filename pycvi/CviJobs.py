@@ -0,0 +1,235 @@
+import sys
+import time
+import queue
+import threading
+import traceback
+from concurrent.futures import Future
+
+
+class CviCancelado(Exception):
+    """Levantada no job cancelado, no próximo ponto de verificação (ver CviJobs.progresso)"""
+
+
+class CviJob:
+    """Um job em execução: nome, tempo decorrido, linhas processadas e pedido de cancelamento
+    """
+
+    def __init__(self, nome):
+        self.nome = nome
+        self.inicio = time.time()
+        self.fim = None
+        self.linhas = 0
+        self.cancelar = threading.Event()
+        self.lock = threading.Lock()
+
+    def conta(self, linhas):
+        with self.lock:
+            self.linhas += linhas
+
+    def status(self):
+        elapsed = max((self.fim or time.time()) - self.inicio, 1e-6)
+        texto = f"{self.nome}: {elapsed:.0f} segundos"
+        if self.linhas:
+            texto += f", {self.linhas} linhas ({self.linhas / elapsed:.0f} linhas/s)"
+        if self.cancelar.is_set() and self.fim is None:
+            texto += " - cancelando..."
+        return texto
+
+
+class CviJobs:
+    """Executa as ações demoradas do menu (ver cvi5.ACOES) numa thread, com a janela livre
+
+    Um job por vez. A função do job recebe, no lugar da janela, uma JanelaJob, e roda numa
+    thread; tudo o que ela (e as threads que ela criar) imprimir vai para uma fila, que o
+    loop de eventos de cvi5 esvazia em poll(), lendo a janela com window.read(timeout()).
+    O tkinter só pode ser usado na thread principal: os diálogos chamados no job (marcados
+    com na_janela, como AuditHelpers.get_sql_input) são executados por poll(), que devolve o
+    resultado ao job.
+    poll() mostra também, no elemento '-JOB-', o tempo decorrido e as linhas por segundo
+    informadas por progresso() (CviSqlToData.run, ConvSped).
+    cancela() só pede o cancelamento: o job termina com CviCancelado no próximo
+    window.refresh() ou progresso(); processos já iniciados de um pool terminam o seu arquivo
+    """
+    INTERVALO = 200  # ms entre os poll() enquanto há job
+    _instancia = None  # o CviJobs da janela, usado por na_janela
+    _atual = None  # o CviJob em execução, usado por progresso
+
+    def __init__(self, window):
+        self.window = window
+        self.fila = queue.Queue()
+        self.job = None
+        # depois de criada a janela, que com sg.Output já redirecionou a saída para ela
+        self.saida, self.erros = sys.stdout, sys.stderr
+        sys.stdout = SaidaJobs(self.saida, self.fila)
+        sys.stderr = SaidaJobs(self.erros, self.fila)
+        CviJobs._instancia = self
+
+    def ativo(self):
+        return self.job is not None
+
+    def timeout(self):
+        """timeout de window.read: None (espera o próximo evento) se não há job"""
+        return self.INTERVALO if self.ativo() else None
+
+    def inicia(self, nome, funcao, *args):
+        """Roda funcao(JanelaJob, *args) numa thread; False se já há um job"""
+        if self.ativo():
+            print(f"##ERRO## Aguarde o término de {self.job.nome} ou cancele antes")
+            return False
+        self.job = CviJobs._atual = CviJob(nome)
+        threading.Thread(target=self.executa, daemon=True,
+                         args=(self.job, funcao, JanelaJob(self.window), args)).start()
+        self.mostraStatus()
+        return True
+
+    def executa(self, job, funcao, janela, args):
+        try:
+            import pythoncom  # win32com na thread do job (pancho), só no Windows
+            pythoncom.CoInitialize()
+        except ImportError:
+            pass
+        try:
+            funcao(janela, *args)
+        except CviCancelado:
+            pass  # poll() avisa
+        except Exception:
+            traceback.print_exc()
+        finally:
+            self.fila.put(('fim', job))
+
+    def cancela(self):
+        if not self.ativo():
+            print("Nenhuma ação em execução")
+            return
+        self.job.cancelar.set()
+        print(f"Cancelando {self.job.nome}...")
+        self.mostraStatus()
+
+    def poll(self):
+        """Na thread principal: mostra a saída dos jobs, executa os diálogos e o status"""
+        while True:
+            try:
+                item = self.fila.get_nowait()
+            except queue.Empty:
+                break
+            if item[0] == 'texto':
+                item[1].write(item[2])
+            elif item[0] == 'chama':
+                _, funcao, args, kwargs, futuro = item
+                try:
+                    futuro.set_result(funcao(*args, **kwargs))
+                except Exception as e:
+                    futuro.set_exception(e)
+            elif item[0] == 'fim':
+                job = item[1]
+                job.fim = time.time()
+                situacao = 'Cancelado' if job.cancelar.is_set() else 'Concluído'
+                print(f"{situacao} - {job.status()}\n")
+                self.job = CviJobs._atual = None
+        self.mostraStatus()
+
+    def mostraStatus(self):
+        self.window['-JOB-'].update(self.job.status() if self.job else '')
+
+    def fecha(self):
+        """Antes de window.close(): cancela o job e devolve a saída ao sg.Output"""
+        if self.ativo():
+            self.job.cancelar.set()
+        sys.stdout, sys.stderr = self.saida, self.erros
+        CviJobs._instancia = None
+
+    @staticmethod
+    def progresso(linhas=0):
+        """Ponto de verificação do job: conta linhas processadas e, se o job foi cancelado,
+        levanta CviCancelado. Fora de um job (thread principal, processos do pool, Jupyter)
+        não faz nada"""
+        job = CviJobs._atual
+        if job is None or threading.current_thread() is threading.main_thread():
+            return
+        if job.cancelar.is_set():
+            raise CviCancelado(job.nome)
+        if linhas:
+            job.conta(linhas)
+
+
+def na_janela(funcao):
+    """Decorador dos diálogos: chamado num job, executa funcao na thread principal
+    (em CviJobs.poll) e espera o resultado"""
+    def chama(*args, **kwargs):
+        jobs = CviJobs._instancia
+        if jobs is None or threading.current_thread() is threading.main_thread():
+            return funcao(*args, **kwargs)
+        futuro = Future()
+        jobs.fila.put(('chama', funcao, args, kwargs, futuro))
+        return futuro.result()
+    return chama
+
+
+class SaidaJobs:
+    """sys.stdout/sys.stderr durante a janela: a thread principal escreve direto, as outras
+    mandam o texto para a fila de CviJobs"""
+
+    def __init__(self, saida, fila):
+        self.saida = saida
+        self.fila = fila
+
+    def write(self, texto):
+        if threading.current_thread() is threading.main_thread():
+            return self.saida.write(texto)
+        self.fila.put(('texto', self.saida, texto))
+        return len(texto)
+
+    def flush(self):
+        if threading.current_thread() is threading.main_thread():
+            self.saida.flush()
+
+    def __getattr__(self, nome):
+        return getattr(self.saida, nome)
+
+
+def interativa(window):
+    """Pode abrir diálogos? Não com window=False nem na linha de comando (JanelaCli)"""
+    return window is not False and getattr(window, 'interativa', True)
+
+
+class JanelaCli:
+    """No lugar da janela, na linha de comando (ver CviCli): nada a atualizar e nenhum
+    diálogo, as ações usam os valores recebidos ou os padrões"""
+    interativa = False
+
+    def refresh(self):
+        return self
+
+    def disappear(self):
+        pass
+
+    def reappear(self):
+        pass
+
+    def write_event_value(self, key, value):
+        pass
+
+
+class JanelaJob:
+    """A janela vista de dentro de um job
+
+    refresh() não mexe no tkinter: é um ponto de verificação do cancelamento (as ações já
+    chamam window.refresh() entre as etapas). write_event_value é seguro entre threads;
+    os outros métodos (disappear, reappear...) rodam na thread principal via na_janela
+    """
+
+    interativa = True
+
+    def __init__(self, window):
+        self.window = window
+
+    def refresh(self):
+        CviJobs.progresso()
+        return self
+
+    def write_event_value(self, key, value):
+        self.window.write_event_value(key, value)
+
+    def __getattr__(self, nome):
+        atributo = getattr(self.window, nome)
+        return na_janela(atributo) if callable(atributo) else atributo
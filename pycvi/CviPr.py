@@ -1,9 +1,18 @@
 import os
 import sqlite3
 import fnmatch
-import win32com.client as win32
 
 from pycpfcnpj import cnpj
+from pycvi.CviDb import CviDb
+from pycvi.CviRecentes import CviRecentes
+
+# cache da lista de osfs (ver getOsfList): uma linha por osf de cada osf*.db3, com o tamanho
+#   e o mtime do arquivo na leitura; achou = 0 se o arquivo não tinha a osf em _dbo_auditoria
+OSF_CACHE = """
+CREATE TABLE IF NOT EXISTS osf_cache
+    (db_path TEXT, tamanho INT, mtime REAL, achou INT, osf TEXT, cnpj TEXT, ie TEXT,
+        razao TEXT);
+"""
 
 
 class CviPr:
@@ -11,29 +20,116 @@ class CviPr:
         self.config = config
 
     def getOsfList(self):
-        # print("Lista de Auditorias:")
+        """Lista das osfs (dicts com osf, cnpj, ie e razao) de todas as pastas de CNPJ
+
+        Usa o cache osf_cache do cvi_sys.db: só os osf*.db3 novos ou alterados são abertos
+        """
+        osfList, faltam, removidos = self.osfCache()
+        for db in faltam:
+            osfs, erro = self.atualizaOsfCache(db)
+            if erro is not None:
+                print(erro)
+            osfList += osfs
+        self.limpaOsfCache(removidos)
+        return self.ordenaOsfs(osfList)
+
+    @staticmethod
+    def osfCombo(osf):
+        """Texto de uma osf no combo de cvi5, que as ações recebem como values
+        (osf em [:11], cnpj em [18:32])"""
+        return f"{osf['osf']} CNPJ: {osf['cnpj']} IE: {osf['ie']}  {osf['razao']}"
+
+    @staticmethod
+    def ordenaOsfs(osfList):
+        return sorted(osfList, key=lambda item: (item['cnpj'], item['osf']))
+
+    def osfDbs(self):
+        """(db_path, osf, cnpj, tamanho, mtime) de cada osf*.db3 nas pastas de CNPJ"""
+        # scandir: no Windows o tamanho e o mtime já vêm da listagem da pasta
+        with os.scandir(self.config.CVI_RESULT) as pastas:
+            for pasta in pastas:
+                if not pasta.is_dir() or not cnpj.validate(pasta.name):
+                    continue
+                # encontrou uma pasta com CNPJ... procura agora um sqlite3 de osf
+                with os.scandir(pasta.path) as arquivos:
+                    for arquivo in arquivos:
+                        filename = arquivo.name
+                        if filename[0:3].lower() == 'osf' and filename[-4:].lower() == '.db3' \
+                                and arquivo.is_file():
+                            stat = arquivo.stat()
+                            yield (arquivo.path, filename[3:-4], pasta.name,
+                                   stat.st_size, stat.st_mtime)
+
+    def sysConnect(self):
+        # conexão própria a cada chamada: o cache também é atualizado numa thread
+        #   (ver Actions.atualiza_osfs)
+        con = sqlite3.connect(os.path.join(self.config.CVI_VAR, 'cvi_sys.db'))
+        con.execute(OSF_CACHE)
+        return con
+
+    def osfCache(self):
+        """Separa os bancos de osf em (osfs já no cache, bancos novos ou alterados,
+        caminhos que estão no cache mas não existem mais)
+        """
+        con = self.sysConnect()
+        cache = dict()
+        for row in con.execute("SELECT db_path, tamanho, mtime, achou, osf, cnpj, ie, razao "
+                               + "FROM osf_cache"):
+            cache.setdefault(row[0], []).append(row)
+        con.close()
         osfList = []
-        for dirname in os.listdir(self.config.CVI_RESULT):
-            if os.path.isdir(os.path.join(self.config.CVI_RESULT, dirname))\
-               and cnpj.validate(dirname):
-                # encontrou uma pasta com CNPJ... procura agora um sqlite3 de osg
-                for filename in os.listdir(os.path.join(self.config.CVI_RESULT, dirname)):
-                    if filename[0:3].lower() == 'osf' and filename[-4:].lower() == '.db3':
-                        osf = filename[:-4]
-                        osf = osf[3:]
-                        con = sqlite3.connect(os.path.join(
-                            self.config.CVI_RESULT, dirname, filename))
-                        cur = con.cursor()
-                        sql = f"SELECT razao, cnpj, ie FROM _dbo_auditoria WHERE numOsf = '{osf}';"
-                        for row in cur.execute(sql):
-                            # print(f"CNPJ: {dirname} OSF: {osf} IE: {row[2]}  {row[0]}")
-                            # prever erro (não abri nenhuma linha)
-                            # h_wecho("OSF: {$osf} -> Não consegui abrir o arquivo {$key}...\
-                            #           Erro: " . $db->lastErrorMsg() . "\n");
-                            osfList.append({'osf': osf, 'cnpj': dirname,
-                                            'ie': row[2], 'razao': row[0]})
-                        con.close
-        return osfList
+        faltam = []
+        for db in self.osfDbs():
+            linhas = cache.pop(db[0], None)
+            if linhas is not None and (linhas[0][1], linhas[0][2]) == (db[3], db[4]):
+                osfList += [{'osf': linha[4], 'cnpj': linha[5], 'ie': linha[6],
+                             'razao': linha[7]} for linha in linhas if linha[3]]
+            else:
+                faltam.append(db)
+        return osfList, faltam, list(cache)
+
+    def atualizaOsfCache(self, db):
+        """Lê _dbo_auditoria do banco db (ver osfDbs) e grava no cache
+
+        Retorna (osfs, mensagem de erro ou None). Não imprime nada, porque também roda
+        fora da thread da janela
+        """
+        db_path, osf, dirname, tamanho, mtime = db
+        osfList = []
+        erro = None
+        try:
+            con = sqlite3.connect(CviDb.uri_readonly(db_path), uri=True)
+            try:
+                sql = "SELECT razao, cnpj, ie FROM _dbo_auditoria WHERE numOsf = ?;"
+                for row in con.execute(sql, [osf]):
+                    osfList.append({'osf': osf, 'cnpj': dirname,
+                                    'ie': row[2], 'razao': row[0]})
+            finally:
+                con.close()
+        except Exception as e:
+            # fica no cache sem osf: só é lido de novo quando o arquivo mudar
+            erro = f"OSF: {osf} -> Não consegui ler o arquivo {db_path}. Erro: {e}"
+        con = self.sysConnect()
+        with con:
+            con.execute("DELETE FROM osf_cache WHERE db_path = ?", [db_path])
+            if osfList:
+                con.executemany("INSERT INTO osf_cache VALUES (?, ?, ?, 1, ?, ?, ?, ?)",
+                                [(db_path, tamanho, mtime, item['osf'], item['cnpj'],
+                                  item['ie'], item['razao']) for item in osfList])
+            else:
+                con.execute("INSERT INTO osf_cache VALUES (?, ?, ?, 0, ?, ?, NULL, NULL)",
+                            [db_path, tamanho, mtime, osf, dirname])
+        con.close()
+        return osfList, erro
+
+    def limpaOsfCache(self, removidos):
+        if not removidos:
+            return
+        con = self.sysConnect()
+        with con:
+            con.executemany("DELETE FROM osf_cache WHERE db_path = ?",
+                            [(db_path,) for db_path in removidos])
+        con.close()
 
     def getDatabasesOsfSqlite(self, osf, cnpj):
         print("OSF:", osf, "CNPJ:", cnpj)
@@ -56,6 +152,14 @@ class CviPr:
         # ##TODO## Detectar se seu pau no Attach
         return cur
 
+    def recentFiles(self, path, fileTypes, n=20):
+        """Os n arquivos mais novos com as extensões fileTypes em path e subpastas,
+        do mais novo para o mais antigo (ver CviRecentes, com índice em cvi_sys.db)
+        """
+        recentes = CviRecentes(os.path.join(self.config.CVI_VAR, 'cvi_sys.db'))
+        return [arquivo.replace("/", "\\")
+                for mtime, arquivo in recentes.recentes(path, fileTypes, n)]
+
     def recursiveFilemtime(self, path, file_dict, file_type='txt'):
         '''
         # Criando um dicionário vazio para armazenar os tempos de modificação dos arquivos
@@ -83,6 +187,7 @@ class CviPr:
     def abreExcelCom(self, fileName):
         # Open up Excel and make it visible
         try:
+            import win32com.client as win32  # só no Windows, e só quando for usar
             excel = win32.gencache.EnsureDispatch('Excel.Application')
         except Exception as e:
             print(f"Não consegui abrir o excel. O erro foi:", e)
@@ -0,0 +1,143 @@
+import os
+import heapq
+import sqlite3
+
+
+class CviRecentes:
+    """Arquivos mais recentes de uma árvore de pastas (ver CviPr.recentFiles)
+
+    Cada pasta é listada com os.scandir, que já traz o tipo e, no Windows, o mtime de cada
+    entrada, e guarda só os N arquivos mais novos de cada extensão (heap limitado).
+    O resultado de cada pasta fica no índice do cvi_sys.db (tabelas recent_dirs e
+    recent_files), junto com o mtime da pasta: na próxima consulta, pasta com o mesmo mtime
+    não é listada de novo, só as suas subpastas são visitadas.
+    O mtime da pasta muda quando um arquivo é criado, apagado ou renomeado nela, mas não
+    quando um arquivo existente é regravado no lugar. Os relatórios não têm esse problema:
+    CviSqlToData.run apaga o arquivo anterior antes de gravar
+    """
+    EXTENSOES = ('txt', 'xlsx', 'html', 'db', 'db3')  # extensões guardadas no índice
+    N = 20
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+
+    @staticmethod
+    def extensao(name):
+        return name.rpartition('.')[2].lower() if '.' in name else ''
+
+    @staticmethod
+    def listaPasta(path, extensoes, n):
+        """(mtime_ns da pasta, subpastas, [(mtime, arquivo, extensão)] dos n mais novos
+        de cada extensão)"""
+        # o mtime antes da listagem: um arquivo criado durante a listagem faz a pasta ser
+        #   relistada na próxima consulta
+        mtime_ns = os.stat(path).st_mtime_ns
+        heaps = {extensao: [] for extensao in extensoes}
+        subpastas = []
+        with os.scandir(path) as entradas:
+            for entrada in entradas:
+                try:
+                    if entrada.is_dir(follow_symlinks=False):
+                        subpastas.append(entrada.path)
+                        continue
+                    heap = heaps.get(CviRecentes.extensao(entrada.name))
+                    if heap is None or not entrada.is_file():
+                        continue
+                    item = (entrada.stat().st_mtime, entrada.path)
+                except OSError:
+                    continue  # apagado durante a listagem, sem permissão...
+                if len(heap) < n:
+                    heapq.heappush(heap, item)
+                elif item > heap[0]:
+                    heapq.heapreplace(heap, item)
+        arquivos = [(mtime, arquivo, extensao)
+                    for extensao, heap in heaps.items() for mtime, arquivo in heap]
+        return mtime_ns, subpastas, arquivos
+
+    def recentes(self, path, extensoes, n=20):
+        """Os n arquivos mais novos com as extensões (sem o ponto) em path e subpastas,
+        como [(mtime, arquivo)] do mais novo para o mais antigo"""
+        extensoes = [extensao.lower() for extensao in extensoes]
+        if n > self.N or not set(extensoes) <= set(self.EXTENSOES):
+            return self.varre(path, extensoes, n)
+        try:
+            arquivos = self.indexado(os.path.abspath(path))
+        except sqlite3.Error as e:
+            print("Índice de arquivos recentes indisponível, listando tudo.", e)
+            return self.varre(path, extensoes, n)
+        return heapq.nlargest(n, ((mtime, arquivo) for mtime, arquivo, extensao in arquivos
+                                  if extensao in extensoes))
+
+    def varre(self, path, extensoes, n):
+        """Sem o índice: lista a árvore toda"""
+        todos = []
+        pendentes = [path]
+        while pendentes:
+            try:
+                _, subpastas, arquivos = self.listaPasta(pendentes.pop(), extensoes, n)
+            except OSError:
+                continue
+            pendentes += subpastas
+            todos += [(mtime, arquivo) for mtime, arquivo, _ in arquivos]
+        return heapq.nlargest(n, todos)
+
+    def indexado(self, path):
+        """Arquivos do índice sob path, relistando só as pastas alteradas"""
+        con = sqlite3.connect(self.db_path)
+        try:
+            con.execute("CREATE TABLE IF NOT EXISTS recent_dirs "
+                        + "(dir TEXT PRIMARY KEY, parent TEXT, mtime_ns INT)")
+            con.execute("CREATE TABLE IF NOT EXISTS recent_files "
+                        + "(dir TEXT, path TEXT, ext TEXT, mtime REAL)")
+            con.execute("CREATE INDEX IF NOT EXISTS recent_files_dir ON recent_files (dir)")
+            pastas = dict()
+            filhas = dict()
+            for pasta, parent, mtime_ns in con.execute(
+                    "SELECT dir, parent, mtime_ns FROM recent_dirs"):
+                pastas[pasta] = mtime_ns
+                filhas.setdefault(parent, []).append(pasta)
+            guardados = dict()
+            for pasta, arquivo, extensao, mtime in con.execute(
+                    "SELECT dir, path, ext, mtime FROM recent_files"):
+                guardados.setdefault(pasta, []).append((mtime, arquivo, extensao))
+
+            todos = []
+            pendentes = [(path, os.path.dirname(path))]
+            with con:
+                while pendentes:
+                    pasta, parent = pendentes.pop()
+                    try:
+                        mtime_ns = os.stat(pasta).st_mtime_ns
+                    except OSError:
+                        self.apaga(con, pasta, filhas)
+                        continue
+                    if pastas.get(pasta) == mtime_ns:
+                        pendentes += [(filha, pasta) for filha in filhas.get(pasta, [])]
+                        todos += guardados.get(pasta, [])
+                        continue
+                    try:
+                        mtime_ns, subpastas, arquivos = self.listaPasta(
+                            pasta, self.EXTENSOES, self.N)
+                    except OSError:
+                        self.apaga(con, pasta, filhas)
+                        continue
+                    for filha in set(filhas.get(pasta, [])) - set(subpastas):
+                        self.apaga(con, filha, filhas)
+                    con.execute("INSERT OR REPLACE INTO recent_dirs VALUES (?, ?, ?)",
+                                [pasta, parent, mtime_ns])
+                    con.execute("DELETE FROM recent_files WHERE dir = ?", [pasta])
+                    con.executemany("INSERT INTO recent_files VALUES (?, ?, ?, ?)",
+                                    [(pasta, arquivo, extensao, mtime)
+                                     for mtime, arquivo, extensao in arquivos])
+                    pendentes += [(filha, pasta) for filha in subpastas]
+                    todos += arquivos
+            return todos
+        finally:
+            con.close()
+
+    def apaga(self, con, pasta, filhas):
+        """Tira do índice a pasta que não existe mais, com as suas subpastas"""
+        for filha in filhas.get(pasta, []):
+            self.apaga(con, filha, filhas)
+        con.execute("DELETE FROM recent_dirs WHERE dir = ?", [pasta])
+        con.execute("DELETE FROM recent_files WHERE dir = ?", [pasta])
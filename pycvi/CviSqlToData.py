@@ -1,18 +1,51 @@
 import os
 import html
-from bs4 import BeautifulSoup
+import shutil
 from typing import List
 
+from pycvi.CviJobs import CviJobs
+from pycvi.CviHtmlPag import CviHtmlPag
+
+HTML_DIREITA = ' style="text-align: right;"'
+HTML_NEGATIVO = ' style="text-align: right;color: red;"'
+# início das células html, ver celulaHtml: title é columnType#tipo do valor
+TD_INT = f'        <td title="1#{int}"'
+TD_FLOAT = f'        <td title="2#{float}"'
+TD_STR = f'        <td title="3#{str}"'
+
+
+def pareceInt(campo: str) -> bool:
+    # o mesmo que campo.lstrip('-').isdigit() (ver tipo_campo), sem copiar o texto
+    #     quando ele não começa com '-'
+    return campo.isdigit() or (campo[:1] == '-' and campo.lstrip('-').isdigit())
+
+
+def xlsxNumero(campo: str) -> bool:
+    # texto que vira número no xlsx: parece int, cabe nos 15 dígitos do Excel e não
+    #     tem zero à esquerda (CNPJ, códigos...), que o número perderia
+    digitos = campo.lstrip('-')
+    return pareceInt(campo) and len(digitos) <= 15 \
+        and (digitos[0] != '0' or campo == '0')
+
 
 class CviSqlToData:
-    def __init__(self, toDataType: str, maxCells: int, showSql: bool) -> None:
+    BLOCO_LINHAS = 5000  # linhas por fetchmany em run
+    BUFFER_ESCRITA = 1024 * 1024  # buffer do arquivo gerado, em bytes
+    XLSX_LINHAS = 1048576  # limite de linhas de uma planilha do Excel, com o cabeçalho
+
+    def __init__(self, toDataType: str, maxCells: int, showSql: bool,
+                 spread: bool = False) -> None:
         self.setToDataType(toDataType)
         # maxCells are not used in toDataType == 'txt'
         self.maxCells = maxCells
         self.showSql = showSql
+        # spread = True: no html, cada linha vira uma sequência de tabelas pequenas,
+        #     uma por grupo de campos (ver putLineSpread), em vez de uma tabela larga
+        self.spread = spread
 
     def setToDataType(self, toDataType):
-        if toDataType not in ['html', 'txt']:
+        # 'htmlpag': html paginado, sem o corte de maxCells, ver CviHtmlPag
+        if toDataType not in ['html', 'txt', 'xlsx', 'htmlpag']:
             toDataType = 'html'  # if an unknown data type is provided, set it to html by default
         self.toDataType = toDataType
 
@@ -25,6 +58,10 @@ class CviSqlToData:
                 line += campo.replace("\r", "").replace("\n", "")
             line += "\n"
             return line
+        if self.toDataType == 'html' and self.spread:
+            return self.htmlHead(queryTitle,
+                                 (f"<h6>{sql}</h6>" if self.showSql else ""),
+                                 self.FileName, fields, table=False)
         if self.toDataType == 'html':
             html = self.htmlHead(queryTitle,
                                  (f"<h6>{sql}</h6>" if self.showSql else ""),
@@ -64,101 +101,286 @@ class CviSqlToData:
         """
         Atençao para putLineHtml e putLineTxt - leia em putLineHtml
         """
-        line = ""
-        for campo in row:
-            columnType = self.tipo_campo(campo)
-            # abaixo é o seguinte... campo int é o que parece int,
-            #     mesmo que seja string
-            # campo float sempre vem float,
-            #     não precisa corrigir o tipo da variável
-            campo = int(campo) if columnType == 1 else campo
-            line += "" if line == "" else "\t"
-            if columnType == 1:
-                if campo > 999999999999999:
-                    # Excel cuts off numbers above 15 digits,
-                    # exemplo: Chave de Acesso
-                    # so prepend "#" to treat them as strings
-                    line += "#"
-                line += str(campo)
-            if columnType == 2:
-                line += self.dotToComma(campo, True)
-            if columnType == 3:
-                # caso venha newline no campo, tira
-                line += campo.replace("\r", "").replace("\n", "")
-            if columnType == 4:
-                line += '#Bytes#'
-            if columnType == 5:
-                line += '#NaN#'
-        line += "\n"
-        return line
+        return self.juntaTxt([self.celulaTxt(campo) for campo in row])
+
+    def juntaTxt(self, cells: List) -> str:
+        # o tab só entra depois que a linha tem algum conteúdo, ou seja,
+        #     campos vazios no início da linha não geram tab (sempre foi assim)
+        inicio = 0
+        while inicio < len(cells) and cells[inicio] == "":
+            inicio += 1
+        return "\t".join(cells[inicio:]) + "\n"
+
+    def celulaTxt(self, campo) -> str:
+        columnType = self.tipo_campo(campo)
+        # abaixo é o seguinte... campo int é o que parece int,
+        #     mesmo que seja string
+        # campo float sempre vem float,
+        #     não precisa corrigir o tipo da variável
+        campo = int(campo) if columnType == 1 else campo
+        if columnType == 1:
+            return self.txtInt(campo)
+        if columnType == 2:
+            return self.dotToComma(campo, True)
+        if columnType == 3:
+            # caso venha newline no campo, tira
+            return campo.replace("\r", "").replace("\n", "")
+        if columnType == 4:
+            return '#Bytes#'
+        return '#NaN#'
+
+    def txtInt(self, campo: int) -> str:
+        if campo > 999999999999999:
+            # Excel cuts off numbers above 15 digits,
+            # exemplo: Chave de Acesso
+            # so prepend "#" to treat them as strings
+            return "#" + str(campo)
+        return str(campo)
 
     def putLineHtml(self, row: List) -> str:
-        line = '      <tr>\n'
-        for campo in row:
-            columnType = self.tipo_campo(campo)
-            # abaixo é o seguinte... campo int é o que parece int,
-            #     mesmo que seja string
-            # campo float sempre vem float,
-            #     não precisa corrigir o tipo da variável
-            campo = int(campo) if columnType == 1 else campo
-            negative_css = 'color: red;'\
-                if columnType <= 2 and campo < 0 else ''
-            textalign = f' style="text-align: right;{negative_css}"'\
-                if columnType <= 2 else ''
-            if columnType == 1:
-                if campo > 999999999999999:
-                    # Excel cuts off numbers above 15 digits,
-                    # exemplo: Chave de Acesso
-                    # so prepend "#" to treat them as strings
-                    htmlValue = "#" + str(campo)
-                else:
-                    htmlValue = str(campo)
-            if columnType == 2:
-                # em formato html se coloca também os pontos de milhar
-                e_value = self.dotToComma(campo, True).split(',')
-                s_com_pontos = "{:,}".format(int(e_value[0])).replace(',', '.')
-                htmlValue = s_com_pontos + ',' + e_value[1]
-            if columnType == 3:
-                htmlValue = self.htmlHighlight(html.escape(campo))
-            if columnType == 4:
-                htmlValue = '#Bytes#'
-            if columnType == 5:
-                htmlValue = '#NaN#'
-
-#            columnType = 2 if isinstance(campo, float) else 1 if isinstance(campo, int) else 3
-#            negative_css = 'color: red;' if columnType <= 2 and campo < 0 else ''
-#            textalign = f' style="text-align: right;{negative_css}"' if columnType <= 2 else ''
-#            if (columnType == 2):
-#                campo = self.dotToComma(campo, True)
-            # htmlValue = campo if columnType == 1 else self.htmlHighlight(html.escape(campo))
-#            htmlValue = campo
-            line += f"""\
+        return '      <tr>\n' + ''.join([self.celulaHtml(campo) for campo in row]) \
+            + "      </tr>\n"
+
+    def celulaHtml(self, campo) -> str:
+        columnType = self.tipo_campo(campo)
+        # abaixo é o seguinte... campo int é o que parece int,
+        #     mesmo que seja string
+        # campo float sempre vem float,
+        #     não precisa corrigir o tipo da variável
+        campo = int(campo) if columnType == 1 else campo
+        negative_css = 'color: red;'\
+            if columnType <= 2 and campo < 0 else ''
+        textalign = f' style="text-align: right;{negative_css}"'\
+            if columnType <= 2 else ''
+        if columnType == 1:
+            if campo > 999999999999999:
+                # Excel cuts off numbers above 15 digits,
+                # exemplo: Chave de Acesso
+                # so prepend "#" to treat them as strings
+                htmlValue = "#" + str(campo)
+            else:
+                htmlValue = str(campo)
+        if columnType == 2:
+            htmlValue = self.htmlMilhar(campo)
+        if columnType == 3:
+            htmlValue = self.htmlHighlight(html.escape(campo))
+        if columnType == 4:
+            htmlValue = '#Bytes#'
+        if columnType == 5:
+            htmlValue = '#NaN#'
+        return f"""\
         <td title="{columnType}#{type(campo)}"{textalign}>{htmlValue}</td>
 """
-        line += "      </tr>\n"
-        return line
+
+    def htmlMilhar(self, campo: float) -> str:
+        # em formato html se coloca também os pontos de milhar
+        valor = self.dotToComma(campo, True)
+        e_value = valor.split(',')
+        if len(e_value) != 2 or not e_value[0].lstrip('-').isdigit():
+            return valor  # 1e-05, 1e+22, inf, nan: como em str(campo), sem pontos de milhar
+        s_com_pontos = "{:,}".format(int(e_value[0])).replace(',', '.')
+        return s_com_pontos + ',' + e_value[1]
+
+    def formatadores(self) -> dict:
+        """
+        Formatadores de coluna por tipo do valor: recebem a lista de valores da coluna
+        no bloco, todos do mesmo tipo, e devolvem a lista de células já formatadas,
+        com o mesmo resultado de celulaTxt ou celulaHtml em cada valor
+        """
+        if self.toDataType == 'txt':
+            return {int: self.colunaTxtInt, float: self.colunaTxtFloat,
+                    str: self.colunaTxtStr}
+        return {int: self.colunaHtmlInt, float: self.colunaHtmlFloat, str: self.colunaHtmlStr}
+
+    def colunaTxtInt(self, coluna: List) -> List:
+        return ["#" + str(campo) if campo > 999999999999999 else str(campo)
+                for campo in coluna]
+
+    def colunaTxtFloat(self, coluna: List) -> List:
+        # dotToComma(campo, True): só há uma casa depois da vírgula se ela for a penúltima
+        valores = [repr(campo).replace('.', ',') for campo in coluna]
+        return [valor + '0' if valor[-2:-1] == ',' else valor for valor in valores]
+
+    def colunaTxtStr(self, coluna: List) -> List:
+        txtInt = self.txtInt
+        return [txtInt(int(campo)) if pareceInt(campo)
+                else campo.replace("\r", "").replace("\n", "")
+                for campo in coluna]
+
+    def colunaHtmlInt(self, coluna: List) -> List:
+        return [f'{TD_INT}{HTML_NEGATIVO if campo < 0 else HTML_DIREITA}>'
+                + f'{"#" if campo > 999999999999999 else ""}{campo}</td>\n'
+                for campo in coluna]
+
+    def colunaHtmlFloat(self, coluna: List) -> List:
+        celulas = []
+        for campo, valor in zip(coluna, self.colunaTxtFloat(coluna)):
+            # em formato html se coloca também os pontos de milhar,
+            #     só calculados se a parte inteira tiver mais de 3 dígitos
+            inteiro, virgula, decimais = valor.partition(',')
+            if not virgula:
+                valor = self.htmlMilhar(campo)  # 1e-05, inf, nan, sem vírgula no repr
+            elif len(inteiro) > 3:
+                valor = "{:,}".format(int(inteiro)).replace(',', '.') + ',' + decimais
+            elif inteiro == '-0':
+                valor = '0,' + decimais  # int('-0') perde o sinal em htmlMilhar
+            celulas.append(f'{TD_FLOAT}{HTML_NEGATIVO if campo < 0 else HTML_DIREITA}>'
+                           + f'{valor}</td>\n')
+        return celulas
+
+    def colunaHtmlStr(self, coluna: List) -> List:
+        celulas = []
+        for campo in coluna:
+            if pareceInt(campo):
+                numero = int(campo)
+                celulas.append(f'{TD_INT}{HTML_NEGATIVO if numero < 0 else HTML_DIREITA}>'
+                               + f'{"#" if numero > 999999999999999 else ""}{numero}</td>\n')
+                continue
+            htmlValue = html.escape(campo)
+            if '#' in htmlValue:
+                htmlValue = self.htmlHighlight(htmlValue)
+            celulas.append(f'{TD_STR}>{htmlValue}</td>\n')
+        return celulas
+
+    def tiposColunas(self, rows: List) -> List:
+        """
+        Tipo de cada coluna, inferido no primeiro bloco de linhas: o tipo do valor
+        se for um só na coluna (NULL à parte), senão None
+        """
+        tipos = []
+        for coluna in zip(*rows):
+            tiposColuna = set(map(type, coluna))
+            tiposColuna.discard(type(None))
+            tipos.append(tiposColuna.pop() if len(tiposColuna) == 1 else None)
+        return tipos
+
+    def putBlock(self, rows: List, formatadores: dict, tipos: List) -> str:
+        """
+        Formata de uma vez um bloco de linhas vindo de fetchmany, coluna a coluna.
+        Se os valores da coluna no bloco são do tipo inferido (ver tiposColunas),
+        com ou sem NULL, vão todos juntos para o formatador do tipo; se a coluna mudou
+        de tipo, cada célula é formatada por celulaTxt ou celulaHtml
+        """
+        celula = self.celulaTxt if self.toDataType == 'txt' else self.celulaHtml
+        nulo = celula(None)
+        colunas = []
+        for tipo, coluna in zip(tipos, zip(*rows)):
+            formatador = formatadores.get(tipo)
+            tiposColuna = set(map(type, coluna))
+            if formatador is not None and tiposColuna == {tipo}:
+                colunas.append(formatador(coluna))
+            elif formatador is not None and tiposColuna == {tipo, type(None)}:
+                celulas = iter(formatador([campo for campo in coluna if campo is not None]))
+                colunas.append([nulo if campo is None else next(celulas) for campo in coluna])
+            else:
+                colunas.append([celula(campo) for campo in coluna])
+        if self.toDataType == 'txt':
+            juntaTxt = self.juntaTxt
+            return ''.join(['\t'.join(cells) + '\n' if cells[0] != "" else juntaTxt(cells)
+                            for cells in zip(*colunas)])
+        return ''.join(['      <tr>\n' + ''.join(cells) + '      </tr>\n'
+                        for cells in zip(*colunas)])
+
+    def putBlockSpread(self, rows: List, fields: List, primeira: int, varias: bool) -> str:
+        """Bloco de linhas no formato spread, com o título 'Linha n' se houver mais de uma"""
+        partes = []
+        for numero, row in enumerate(rows, primeira):
+            if varias:
+                partes.append('<h4 style="color: brown; padding: 0; margin: 10px 0 0 0;">'
+                              + f'Linha {numero}</h4>\n')
+            partes.append(self.putLineSpread(fields, row))
+        return ''.join(partes)
+
+    def putLineSpread(self, fields: List, row: List) -> str:
+        """
+        Uma linha como uma sequência de tabelas pequenas (cabeçalho + valores).
+        Um grupo de campos começa em cada coluna marcadora, cujo valor é um '[Tag]'
+        (ex.: '[NfeC101-Emitente]' AS tC, em DfeNFe), ou quando o grupo atual passa
+        de 100 caracteres
+        """
+        tabelas = []
+        ths, tds, tamanho = [], [], 0
+        for campo, valor in zip(fields, row):
+            marcador = isinstance(valor, str) and len(valor) > 1 \
+                and valor[0] == '[' and valor[-1] == ']'
+            if marcador and ths:
+                tabelas.append(self.tabelaSpread(ths, tds))
+                ths, tds, tamanho = [], [], 0
+            if marcador:
+                estilo = ' style="color: green; background-color: lightyellow;"'
+                ths.append(f'<th{estilo}>{campo}</th>')
+                tds.append(f'<td{estilo}>{html.escape(valor)}</td>')
+            else:
+                ths.append(f'<th>{campo}</th>')
+                tds.append(self.celulaHtml(valor).strip())
+            tamanho += max(len(campo), len(str(valor)))
+            if tamanho > 100:
+                tabelas.append(self.tabelaSpread(ths, tds))
+                ths, tds, tamanho = [], [], 0
+        if ths:
+            tabelas.append(self.tabelaSpread(ths, tds))
+        return ''.join(tabelas) + '\n'
+
+    def tabelaSpread(self, ths: List, tds: List) -> str:
+        return ('<table style="margin: 0px 0px 5px 0px;"><thead><tr>' + ''.join(ths)
+                + '</tr></thead><tbody><tr>' + ''.join(tds) + '</tr></tbody></table>\n')
+
+    def limiteLinhas(self, colunas: int):
+        """
+        Linhas a exportar (None = todas). maxCells vale só para html e o corte
+        é na linha em que o total de células atinge maxCells, com no mínimo uma linha
+        """
+        if self.toDataType != 'html' or self.maxCells == -1:
+            return None
+        return max(1, -(-self.maxCells // max(colunas, 1)))
 
     def run(self, sqlDb, sql: str, fileName: str, queryTitle=''):
         # Config.create_dir_if_not_exists()
-        self.FileName = fileName + '.' + self.toDataType
+        extensao = 'html' if self.toDataType == 'htmlpag' else self.toDataType
+        self.FileName = fileName + '.' + extensao
         if os.path.exists(self.FileName):
             os.remove(self.FileName)
+        if self.toDataType == 'xlsx':
+            self.runXlsx(sqlDb, sql, queryTitle)
+            return
+        if self.toDataType == 'htmlpag':
+            self.runHtmlPag(sqlDb, sql, fileName, queryTitle)
+            return
         try:
-            self.FileHandle = open(self.FileName, 'w', encoding='utf-8')
+            # as linhas vêm em blocos de BLOCO_LINHAS com fetchmany, cada bloco é
+            #     formatado inteiro e gravado com um só write, num buffer grande
+            self.FileHandle = open(self.FileName, 'w', encoding='utf-8',
+                                   buffering=self.BUFFER_ESCRITA)
             sqlDb.cursor.execute(sql)
             #  ##TODO##  falta prever se há erro no sql !
-            row = sqlDb.cursor.fetchone()
             fields = [description[0]
                       for description in sqlDb.cursor.description]
             self.FileHandle.write(self.putHeader(fields, sql, queryTitle))
-            cells = 0
-            while row is not None:
-                self.FileHandle.write(self.putLine(row))
-                cells += len(row)
-                if self.toDataType == 'html' and self.maxCells != -1 and cells >= self.maxCells:
+            restantes = self.limiteLinhas(len(fields))
+            formatadores = self.formatadores()
+            tipos = None
+            primeira = 1  # número da primeira linha do bloco, para o spread
+            while restantes is None or restantes > 0:
+                rows = sqlDb.cursor.fetchmany(self.BLOCO_LINHAS)
+                if not rows:
                     break
-                row = sqlDb.cursor.fetchone()
-            if self.toDataType == 'html':
+                CviJobs.progresso(len(rows))  # linhas/s e cancelamento, se rodando num job
+                if restantes is not None:
+                    rows = rows[:restantes]
+                    restantes -= len(rows)
+                if self.spread and self.toDataType == 'html':
+                    # fetchmany só traz menos que BLOCO_LINHAS no fim do resultado,
+                    #     então um primeiro bloco de uma linha é o resultado inteiro
+                    self.FileHandle.write(self.putBlockSpread(
+                        rows, fields, primeira, primeira > 1 or len(rows) > 1))
+                    primeira += len(rows)
+                    continue
+                if tipos is None:
+                    tipos = self.tiposColunas(rows)
+                self.FileHandle.write(self.putBlock(rows, formatadores, tipos))
+            if self.toDataType == 'html' and self.spread:
+                self.FileHandle.write("</body>\n</html>\n")
+            elif self.toDataType == 'html':
                 self.FileHandle.write("    </tbody>\n  </table>\n</body>\n</html>\n")
         except IOError as e:
             print("##FATAL ERROR### : ", e)
@@ -176,6 +398,123 @@ class CviSqlToData:
 #                    print("##FATAL ERROR... Could not write a line ({}) in sql.txt file".format(line))
 #                    return
 
+    def runHtmlPag(self, sqlDb, sql: str, fileName: str, queryTitle=''):
+        """
+        Grava o resultado inteiro em blocos .js na pasta <fileName>_dados e a página
+        fileName.html que os carrega sob demanda (ver CviHtmlPag).
+        A página é gravada por último, quando já se sabe o total de linhas
+        """
+        pasta = fileName + '_dados'
+        if os.path.exists(pasta):
+            shutil.rmtree(pasta)
+        os.makedirs(pasta)
+        sqlDb.cursor.execute(sql)
+        fields = [description[0]
+                  for description in sqlDb.cursor.description]
+        total, blocos, tipos = 0, 0, None
+        while True:
+            rows = sqlDb.cursor.fetchmany(self.BLOCO_LINHAS)
+            if not rows:
+                break
+            CviJobs.progresso(len(rows))
+            if tipos is None:
+                tipos = self.tiposColunas(rows)
+            with open(os.path.join(pasta, CviHtmlPag.nomeBloco(blocos)), 'w',
+                      encoding='utf-8', buffering=self.BUFFER_ESCRITA) as file:
+                file.write(CviHtmlPag.bloco(blocos, rows))
+            total += len(rows)
+            blocos += 1
+        tipos = [tipo.__name__ if tipo is not None else None
+                 for tipo in (tipos or [None] * len(fields))]
+        with open(self.FileName, 'w', encoding='utf-8') as file:
+            file.write(CviHtmlPag.pagina(self.FileName, queryTitle,
+                                         sql if self.showSql else '', fields, tipos,
+                                         total, blocos, self.BLOCO_LINHAS,
+                                         os.path.basename(pasta)))
+
+    def runXlsx(self, sqlDb, sql: str, queryTitle=''):
+        """
+        Grava o resultado do sql em xlsx, direto do cursor, sem passar pelo txt.
+        O xlsxwriter em constant_memory grava cada linha assim que a próxima começa,
+        então a memória não cresce com o tamanho do resultado.
+        Números vão como números; valores acima de 15 dígitos e as colunas de chave
+        de acesso (chv..., chave...) vão como texto, para o Excel não cortar os dígitos.
+        Acima do limite de linhas do Excel, continua numa nova planilha
+        """
+        try:
+            import xlsxwriter
+        except ImportError:
+            raise Exception("Para gerar xlsx é preciso instalar o xlsxwriter "
+                            + "(pip install xlsxwriter)")
+        workbook = xlsxwriter.Workbook(self.FileName, {'constant_memory': True})
+        try:
+            workbook.set_properties({'title': queryTitle,
+                                     'comments': sql if self.showSql else ''})
+            # cabeçalho como em CviPr.abreExcelCom
+            formatoHeader = workbook.add_format({'bold': True, 'font_size': 12,
+                                                 'text_wrap': True, 'align': 'center',
+                                                 'valign': 'vcenter', 'bg_color': '#C0C0C0'})
+            formatoFloat = workbook.add_format({'num_format': '#,##0.00'})
+            sqlDb.cursor.execute(sql)
+            fields = [description[0]
+                      for description in sqlDb.cursor.description]
+            colunasTexto = {coluna for coluna, campo in enumerate(fields)
+                            if campo.lower().startswith(('chv', 'chave'))}
+            sheet, linha = None, self.XLSX_LINHAS
+            planilhas = 0
+            while True:
+                rows = sqlDb.cursor.fetchmany(self.BLOCO_LINHAS)
+                if not rows:
+                    break
+                CviJobs.progresso(len(rows))
+                for row in rows:
+                    if linha == self.XLSX_LINHAS:
+                        planilhas += 1
+                        sheet = self.sheetXlsx(workbook, planilhas, fields, formatoHeader)
+                        linha = 1
+                    self.putRowXlsx(sheet, linha, row, colunasTexto, formatoFloat)
+                    linha += 1
+            if sheet is None:
+                # sql sem nenhuma linha: fica só o cabeçalho
+                sheet = self.sheetXlsx(workbook, 1, fields, formatoHeader)
+                linha = 1
+            sheet.autofilter(0, 0, linha - 1, len(fields) - 1)
+        finally:
+            workbook.close()
+
+    def sheetXlsx(self, workbook, planilha: int, fields: List, formatoHeader):
+        sheet = workbook.add_worksheet('Dados' if planilha == 1 else f'Dados{planilha}')
+        for coluna, campo in enumerate(fields):
+            sheet.write_string(0, coluna, campo, formatoHeader)
+        sheet.freeze_panes(1, 0)
+        if planilha > 1:
+            # a planilha anterior ficou cheia: o filtro dela vai até a última linha
+            anterior = workbook.worksheets()[-2]
+            anterior.autofilter(0, 0, self.XLSX_LINHAS - 1, len(fields) - 1)
+        return sheet
+
+    def putRowXlsx(self, sheet, linha: int, row: List, colunasTexto: set, formatoFloat):
+        for coluna, campo in enumerate(row):
+            tipo = type(campo)
+            if campo is None:
+                continue  # NULL fica como célula vazia
+            if tipo is float:
+                sheet.write_number(linha, coluna, campo, formatoFloat)
+            elif tipo is str:
+                if coluna not in colunasTexto and xlsxNumero(campo):
+                    sheet.write_number(linha, coluna, int(campo))
+                else:
+                    sheet.write_string(linha, coluna, campo)
+            elif isinstance(campo, int):
+                if coluna in colunasTexto or abs(campo) > 999999999999999:
+                    sheet.write_string(linha, coluna, str(campo))
+                else:
+                    sheet.write_number(linha, coluna, campo)
+            elif tipo is bytes:
+                sheet.write_string(linha, coluna, '#Bytes#')
+            else:
+                sheet.write_string(linha, coluna, str(campo))
+
     def htmlHighlight(self, htmlValue):
         if not isinstance(htmlValue, str):
             return htmlValue
@@ -201,7 +540,7 @@ class CviSqlToData:
                         htmlValue[ep2 + 1:]
         return htmlValue
 
-    def htmlHead(self, title='', sql='', fileName='', fieldNames=''):
+    def htmlHead(self, title='', sql='', fileName='', fieldNames='', table=True):
         tableid = fileName.replace('.', '_').replace(']', '_').replace('[', '_').split('/')[-1]
         if isinstance(fieldNames, list):
             style = "  <style>\n"
@@ -233,6 +572,9 @@ class CviSqlToData:
 <body>
   <h2>{title}</h2>
   {sql}
+"""
+        if table:
+            html += f"""\
   <table id="{tableid}">
     <thead>
       <tr>
@@ -256,216 +598,89 @@ class CviSqlToData:
                 value += '0'
         return value
 
-    def join_html(self, new_html, html_list):
-        global PR, CVI_RESULT
-
-        if PR != '':
-            new_html = os.path.join(PR, new_html)
-        print(f"Consolidating in {CVI_RESULT}\\{new_html}.html "
-              + "the following files: ")
-
-        new_html_path = os.path.join(CVI_RESULT, new_html)
-        # If there are subfolders, create everything before generating the file
-        os.makedirs(os.path.dirname(new_html_path), exist_ok=True)
-
-        new_html_path = f"{new_html_path}.html"
-
-        if os.path.exists(new_html_path):
-            os.remove(new_html_path)
-            time.sleep(1)  # Sometimes it takes time to delete, so I'm going to give it one more second
-
-        if os.path.exists(new_html_path):
-            logging.error(f"##FATAL ERROR... Could not delete {new_html_path}")
-            return
-
-        with open(new_html_path, 'w') as w_fh:
-            first_file = True
-            for val in html_list:
-                if PR != '':
-                    val = os.path.join(PR, val)
-
-                print(f" `->{val}.html")
-                curr_html = os.path.join(CVI_RESULT, f"{val}.html")
-
-                if not os.path.exists(curr_html):
-                    logging.error(f"##FATAL ERROR... Could not find {curr_html}")
-                    return
-
-                with open(curr_html, 'r') as r_fh:
-                    after_body = False
-                    for line in r_fh:
-                        if line.strip() == '</body>':
-                            break
-                        if first_file or after_body:
-                            w_fh.write(line)
-                        if line.strip() == '<body>':
-                            after_body = True
-
-                first_file = False
-                os.remove(curr_html)
-
-            w_fh.write('</body>\n</html>\n')
-
-    def tableSpread(self, html):
-        print(f"Espalhando a tabela de {html}.html: \n")
-        newHtml = os.path.join(f"{html}.html")
-        oldHtml = os.path.join(f"{html}.old.html")
-        print(f"Primeiro movendo a tabela de {newHtml} para {oldHtml}:n")
-        try:
-            if os.path.exists(oldHtml):
-                os.remove(oldHtml)
-            os.rename(newHtml, oldHtml)
-        except Exception as e:
-            print(f"##FATAL ERROR... Could not rename {newHtml} to {oldHtml}", e)
-            return
-        # Carregue o arquivo HTML
-        with open(oldHtml, "r", encoding='utf-8') as file:
-            soup = BeautifulSoup(file, "html.parser")
-        # Encontra a tabela original
-        original_table = soup.find('table')
-        # Encontra o cabeçalho e os dados da tabela original
-        header_cells = original_table.find_all('th')
-        data_cells = original_table.find_all('td')
-        # Remove a tabela original
-        original_table.decompose()
-        # Divide o cabeçalho e os dados em três partes
-        for i in range(0, len(header_cells), 4):
-            header_part = header_cells[i:i + 4]
-            data_part = data_cells[i:i + 4]
-            # Cria uma nova tabela
-            new_table = soup.new_tag('table')
-            # Cria a linha do cabeçalho na nova tabela
-            new_header_row = soup.new_tag('tr')
-            for header_cell in header_part:
-                new_th = soup.new_tag('th')
-                new_th.string = header_cell.text
-                new_header_row.append(new_th)
-            new_table.append(new_header_row)
-            # Cria a linha de dados na nova tabela
-            new_data_row = soup.new_tag('tr')
-            for data_cell in data_part:
-                new_td = soup.new_tag('td')
-                new_td.string = data_cell.text
-                new_data_row.append(new_td)
-            new_table.append(new_data_row)
-            # Adiciona a nova tabela ao documento
-            soup.append(new_table)
-        # Salve o novo HTML
-        with open(newHtml, "w", encoding='utf-8') as file:
-            file.write(str(soup))
-
-    def tableSpreadOld(self, html, keepOriginalTable=False):
-        # se keepOriginalTable = True, ficam duas tabelas,
-        #   a original e a 'spread'
-        print(f"Espalhando a tabela de {html}.html: \n")
-        newHtml = os.path.join(f"{html}.html")
-        oldHtml = os.path.join(f"{html}.old.html")
-        print(f"Primeiro movendo a tabela de {newHtml} para {oldHtml}:n")
-        try:
-            if os.path.exists(oldHtml):
-                os.remove(oldHtml)
-            os.rename(newHtml, oldHtml)
-        except Exception as e:
-            print(f"##FATAL ERROR... Could not rename {newHtml} to {oldHtml}", e)
-        if os.path.exists(newHtml):
-            print(f"##FATAL ERROR... File {newHtml} still there...")
-            return
-        try:
-            wFH = open(newHtml, 'w', encoding='utf-8')
-        except Exception as e:
-            print(f"##FATAL ERROR... Could not open {newHtml} for write", e)
-            wFH.close()
-        if not os.path.exists(oldHtml):
-            print(f"##FATAL ERROR... Could not find {oldHtml}")
-            return
+    def join_html(self, new_html: str, html_list: List, toc: bool = False,
+                  apaga: bool = True) -> bool:
+        """
+        Consolida em new_html.html os relatórios html de html_list (nomes como os
+        passados a run, sem o .html), na ordem da lista: fica o <head> do primeiro
+        e o conteúdo do <body> de cada um. Os arquivos são copiados linha a linha,
+        então a memória não depende do tamanho dos relatórios, e cada parte pode ter
+        sido gerada separadamente (inclusive em paralelo) antes da consolidação.
+        toc = True: índice no início, com um link para cada parte (o título <h2>).
+        apaga = True: apaga os arquivos das partes depois de consolidados.
+        Não serve para o html paginado (htmlpag), cujas partes dependem de scripts
+        """
+        new_html_path = f"{new_html}.html"
+        partes = [f"{val}.html" for val in html_list]
+        print(f"Consolidando em {new_html_path} os arquivos:")
+        for parte in partes:
+            print(f" `->{parte}")
+            if not os.path.exists(parte):
+                print(f"##ERRO## Não encontrei {parte}, consolidação cancelada")
+                return False
+        if not partes:
+            print("##ERRO## Nenhum arquivo para consolidar")
+            return False
+        if os.path.dirname(new_html_path):
+            # se houver subpastas, cria tudo antes de gerar o arquivo
+            os.makedirs(os.path.dirname(new_html_path), exist_ok=True)
         try:
-            rFH = open(oldHtml, 'r', encoding='utf-8')
-        except Exception as e:
-            print(f"##FATAL ERROR... Could not open {oldHtml} for read", e)
-            rFH.close()
-        # ok, estamos assim: rFW é a leitura do antigo, wFH é a gravação do novo
-        # primeiro vamos ler inteiro rFW no próximo bloco
-        # varrendo o html, espera-se que seja uma linha apenas
-        headerTr = ''
-        alineTr = []
-        innerTable = False  # True quando começa a table, False quando termina
-        for saux in rFH:
-            saux = saux.strip()
-            if saux == '</body>':
-                break
-            if saux.strip()[:6]('<table'):
-                innerTable = True
-            if saux == '<thead>':
-                headerTr = '<thead>'
-            if saux.strip()[:4]('<tr>'):
-                if headerTr == '<thead>':
-                    headerTr = saux
-                else:
-                    alineTr.append(saux)
-            if keepOriginalTable:
-                try:
-                    wFH.write(saux)
-                except Exception as e:
-                    print(f"##FATAL ERROR while writing {newHtml}", e)
-                    wFH.close()
+            with open(new_html_path, 'w', encoding='utf-8',
+                      buffering=self.BUFFER_ESCRITA) as w_fh:
+                self.joinHead(w_fh, partes[0], new_html_path)
+                if toc:
+                    self.joinToc(w_fh, partes)
+                for indice, parte in enumerate(partes, 1):
+                    w_fh.write(f'  <a id="parte{indice}"></a>\n')
+                    self.joinBody(w_fh, parte)
+                w_fh.write('</body>\n</html>\n')
+        except IOError as e:
+            print(f"##ERRO## Falha ao consolidar em {new_html_path}:", e)
+            return False
+        if apaga:
+            for parte in partes:
+                if os.path.realpath(parte) != os.path.realpath(new_html_path):
+                    os.remove(parte)
+        return True
+
+    def joinHead(self, w_fh, parte: str, new_html_path: str):
+        # o <head> do primeiro arquivo, com o <title> do arquivo consolidado
+        with open(parte, 'r', encoding='utf-8') as r_fh:
+            for line in r_fh:
+                if line.strip().startswith('<title>'):
+                    line = f"  <title>Exportação html de {new_html_path}</title>\n"
+                w_fh.write(line)
+                if line.strip() == '<body>':
                     return
-            else:
-                if not innerTable:
-                    try:
-                        wFH.write(saux)
-                    except Exception as e:
-                        print(f"##FATAL ERROR while writing {newHtml}", e)
-                        wFH.close()
-                        return
-            if saux.strip()[:7] == '</table':
-                innerTable = False
-
-            if saux.startswith('</table'):
-                innerTable = False
-        aeheaderTr = [item for item in headerTr.replace('<tr>', '').replace('</tr>', '').split('</th>') if item]
-        aelineTr = []
-        for i, val in enumerate(alineTr):
-            aelineTr.append([item for item in val.replace('<tr>', '').replace('</tr>', '').split('</td>') if item])
-
-        for linTr in range(len(alineTr)):
-            headerTr = ''
-            lineTr = ''
-            tableSpread = ''
-            if len(alineTr) > 1:
-                tableSpread = f"<h4 style=\"color: brown; padding: 0; margin: 10px 0 0 0;\">Linha {linTr + 1}</h4>\n"
-            ilength = 0
-
-            for i in range(len(aeheaderTr)):
-                if '>t' in aeheaderTr[i][-3:]:
-                    aeheaderTr[i] = aeheaderTr[i].replace('>t', ' style="color: green; background-color: lightyellow;">t')
-
-                headerTr += (aeheaderTr[i] if headerTr == '' else '</th>' + aeheaderTr[i])
-                lineTr   += (aelineTr[linTr][i] if lineTr == '' else '</td>' + aelineTr[linTr][i])
-
-                hlen = len(aeheaderTr[i]) - aeheaderTr[i].find('>')
-                llen = len(aelineTr[linTr][i]) - aelineTr[linTr][i].find('>')
-
-                ilength += (hlen if hlen > llen else llen)
-
-                detectFieldGroup = False
-                if 0 < i < (len(aeheaderTr) - 1) and '>t' in aeheaderTr[i+1][-3:]:
-                    detectFieldGroup = True
-                if detectFieldGroup or ilength > 100:
-                    tableSpread += f"<table><thead><tr>{headerTr}</th></tr></thead><tbody><tr>{lineTr}</td></tr></tbody></table>\n"
-                    headerTr = ''
-                    lineTr = ''
-                    ilength = 0
-
-            if headerTr != '':
-                tableSpread += f"<table><thead><tr>{headerTr}</th></tr></thead><tbody><tr>{lineTr}</td></tr></tbody></table>\n"
-            
-            tableSpread = tableSpread.replace('<table>', '<table style="margin: 0px 0px 5px 0px;">')
-
-            try:
-                wFH.write(f"{tableSpread}\n")
-            except Exception as e:
-                print(f"##FATAL ERROR while writing {newHtml}")
-                return
-        rFH.close()
-        wFH.close()
-        os.remove(oldHtml)
+
+    def joinBody(self, w_fh, parte: str):
+        with open(parte, 'r', encoding='utf-8') as r_fh:
+            after_body = False
+            for line in r_fh:
+                if line.strip() == '</body>':
+                    break
+                if after_body:
+                    w_fh.write(line)
+                if line.strip() == '<body>':
+                    after_body = True
+
+    def joinToc(self, w_fh, partes: List):
+        # o título de cada parte é o <h2> logo depois do <body> (ver htmlHead);
+        #     só o começo de cada arquivo é lido
+        w_fh.write('  <h2>Índice</h2>\n  <ul>\n')
+        for indice, parte in enumerate(partes, 1):
+            titulo = ''
+            with open(parte, 'r', encoding='utf-8') as r_fh:
+                after_body = False
+                for line in r_fh:
+                    if after_body and line.strip().startswith('<h2>'):
+                        titulo = line.strip()[4:].replace('</h2>', '')
+                        break
+                    if line.strip() == '<body>':
+                        after_body = True
+                    elif after_body and line.strip():
+                        break  # a parte não começa com um título
+            if not titulo:
+                titulo = html.escape(os.path.basename(parte))
+            w_fh.write(f'    <li><a href="#parte{indice}">{titulo}</a></li>\n')
+        w_fh.write('  </ul>\n')
@@ -0,0 +1,143 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+
+# backend 'db': cvi_sys_data numa linha do cvi_sys.db, com um contador de versão
+SYS_DATA = """
+CREATE TABLE IF NOT EXISTS sys_data
+    (id INTEGER PRIMARY KEY CHECK (id = 1), versao INT, dados TEXT);
+"""
+
+
+class CviSysData:
+    """cvi_sys_data (as opções gravadas do sistema) com cache e gravação atômica
+
+    Usado por Config.load_cvi_sys_data e Config.save_cvi_sys_data.
+    load devolve uma cópia do dict guardado em memória, que só é lido e interpretado de novo
+    quando o arquivo muda (inode, mtime ou tamanho diferentes do da última leitura).
+    save grava num arquivo temporário da mesma pasta e troca com os.replace: quem lê ao
+    mesmo tempo (a janela, os notebooks do Jupyter) vê o arquivo antigo ou o novo, nunca um
+    pela metade, e uma queda no meio da gravação deixa o cvi_sys.json intacto.
+    Com backend='db' (variável de ambiente CVI_SYS_DATA=db), as opções ficam na tabela
+    sys_data do cvi_sys.db, gravadas numa transação e invalidadas pela coluna versao; na
+    primeira leitura o conteúdo do cvi_sys.json, se existir, é copiado para lá
+    """
+    TENTATIVAS = 5  # os.replace no Windows falha se outro processo está com o arquivo aberto
+
+    def __init__(self, json_path, db_path, backend='json'):
+        self.json_path = json_path
+        self.db_path = db_path
+        self.backend = backend
+        self.chave = None  # identifica a versão guardada em self.dados
+        self.dados = None
+        self.lock = threading.Lock()
+
+    def existe(self):
+        """Há cvi_sys_data gravado (com backend 'db', o cvi_sys.json ainda a migrar conta)"""
+        if os.path.isfile(self.json_path):
+            return True
+        if self.backend == 'db' and os.path.isfile(self.db_path):
+            try:
+                return self.versaoDb() is not None
+            except sqlite3.Error:
+                return False
+        return False
+
+    def load(self):
+        """Cópia de cvi_sys_data; exceção se não conseguir ler"""
+        with self.lock:
+            if self.backend == 'db':
+                chave = self.versaoDb()
+                if chave is None:
+                    self.migraJson()
+                    chave = self.versaoDb()
+            else:
+                stat = os.stat(self.json_path)
+                chave = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+            if chave != self.chave or self.dados is None:
+                self.chave, self.dados = self.leDb() if self.backend == 'db' \
+                    else (chave, self.leJson())
+            return json.loads(json.dumps(self.dados))
+
+    def save(self, cvi_sys_data):
+        """Grava cvi_sys_data; exceção se não conseguir gravar"""
+        texto = json.dumps(cvi_sys_data)
+        with self.lock:
+            if self.backend == 'db':
+                self.chave = self.gravaDb(texto)
+            else:
+                self.gravaJson(texto)
+                stat = os.stat(self.json_path)
+                self.chave = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+            self.dados = json.loads(texto)
+
+    def leJson(self):
+        with open(self.json_path, 'r') as file:
+            return json.load(file)
+
+    def gravaJson(self, texto):
+        temporario = f"{self.json_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(temporario, 'w') as file:
+                file.write(texto)
+                file.flush()
+                os.fsync(file.fileno())
+            for tentativa in range(self.TENTATIVAS):
+                try:
+                    os.replace(temporario, self.json_path)
+                    break
+                except PermissionError:
+                    if tentativa == self.TENTATIVAS - 1:
+                        raise
+                    time.sleep(0.05 * (tentativa + 1))
+        finally:
+            if os.path.exists(temporario):
+                os.remove(temporario)
+
+    def conecta(self):
+        con = sqlite3.connect(self.db_path, timeout=10)
+        con.execute(SYS_DATA)
+        return con
+
+    def versaoDb(self):
+        con = self.conecta()
+        try:
+            row = con.execute("SELECT versao FROM sys_data WHERE id = 1").fetchone()
+            return row[0] if row else None
+        finally:
+            con.close()
+
+    def leDb(self):
+        con = self.conecta()
+        try:
+            versao, dados = con.execute(
+                "SELECT versao, dados FROM sys_data WHERE id = 1").fetchone()
+            return versao, json.loads(dados)
+        finally:
+            con.close()
+
+    def gravaDb(self, texto):
+        con = self.conecta()
+        try:
+            with con:
+                con.execute("INSERT INTO sys_data VALUES (1, 1, ?) ON CONFLICT (id) DO UPDATE "
+                            + "SET versao = versao + 1, dados = excluded.dados", [texto])
+                return con.execute("SELECT versao FROM sys_data WHERE id = 1").fetchone()[0]
+        finally:
+            con.close()
+
+    def migraJson(self):
+        """Primeira leitura com backend 'db': traz o cvi_sys.json, se existir"""
+        if not os.path.isfile(self.json_path):
+            raise FileNotFoundError(f"cvi_sys_data não está em {self.db_path} "
+                                    + f"nem em {self.json_path}")
+        con = self.conecta()
+        try:
+            with con:
+                con.execute("INSERT OR IGNORE INTO sys_data VALUES (1, 1, ?)",
+                            [json.dumps(self.leJson())])
+        finally:
+            con.close()
+        print(f"cvi_sys_data copiado de {self.json_path} para {self.db_path}")
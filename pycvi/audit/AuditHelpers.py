@@ -1,9 +1,13 @@
-import PySimpleGUI as sg
 import os
+import time
+import threading
 import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from pycvi.CviDb import CviDb
+from pycvi.CviJobs import CviCancelado, na_janela, interativa
 from pycvi.CviSqlToData import CviSqlToData
+from pycvi.audit.AuditIndices import AuditIndices
 
 
 class AuditHelpers:
@@ -18,23 +22,34 @@ class AuditHelpers:
         cnpj = values[18:32]
         return osf, cnpj
 
-    def audits_action(self, osf: str, cnpj: str):
+    def audits_action(self, osf: str, cnpj: str, readonly=False):
         db_dir = os.path.join(self.config.CVI_VAR, 'result', cnpj)
         cvidb = CviDb(db_dir, f'cv_{osf}.db3')
         try:
-            cvidb.opendb()
+            cvidb.opendb(readonly)
         except Exception as e:
             print(f"Erro ao abrir o banco de dados {db_dir}\\cv_{osf}.db3", e)
             return False
         try:
-            cvidb.attachdb(db_dir, f'osf{osf}.db3')
-            return cvidb
+            cvidb.attachdb(db_dir, f'osf{osf}.db3', readonly)
         except Exception as e:
             print(f"Erro com attach no banco de dados {db_dir}\\osf{osf}.db3",
                   e)
             return False
+        if not readonly:
+            self.indices(cvidb, osf)
+        return cvidb
 
+    def indices(self, cvidb, osf: str):
+        # índices do catálogo (ver AuditIndices), criados só na primeira abertura da osf
+        try:
+            AuditIndices(cvidb, osf).provisiona()
+        except Exception as e:
+            print(f"##ERRO## Não consegui criar os índices da osf {osf}:", e)
+
+    @na_janela
     def get_sql_input(self, window, fileName, queryTitle, sql):
+        import PySimpleGUI as sg  # só com janela, a linha de comando (CviCli) roda sem
         layout = [
             [sg.Text("Nome do Arquivo"),
              sg.Input(default_text=fileName, key='-FILENAME-', size=(120, 1))],
@@ -57,8 +72,8 @@ class AuditHelpers:
 
     def sqlToData_run_aux(self, window, cv_db, sql: str,
                           fileName: str, queryTitle=''):
-        if window is not False:
-            # ou seja, se window = False, não abre janela de confirmação do SQL
+        if interativa(window):
+            # ou seja, se window = False (ou JanelaCli), não abre janela de confirmação do SQL
             # window.disappear()
             sql_input = self.get_sql_input(window, fileName, queryTitle, sql)
             if sql_input is None:
@@ -74,15 +89,114 @@ class AuditHelpers:
                                  cvi_sys_data['showSql'])
         print(sql)
         try:
+            if cvi_sys_data.get('indexAdvisor', False):
+                AuditIndices.mostra_avisos(AuditIndices.advisor(cv_db.cursor, sql), fileName)
             sqlToData.run(cv_db, sql, fileName, queryTitle)
             print(f"Do sql acima, o arquivo {fileName} foi gerado com sucesso")
             return True
+        except CviCancelado:
+            raise
         except Exception as e:
             print(f"Do sql acima, {fileName} ##NÃO## foi gerado "
                   + "em razão do seguinte erro:", e, "\n")
             traceback.print_exc()
             return False
 
+    def sqlToData_batch(self, window, osf: str, cnpj: str, jobs, workers=None):
+        """Gera vários relatórios independentes em paralelo
+
+        jobs: lista de (sql, fileName, queryTitle), como em sqlToData_run_aux.
+        workers: conexões em paralelo; se None, auditWorkers de cvi_sys_data ou até 4.
+        Primeiro todos os SQLs são confirmados (ver interativa), aqui na thread
+        principal; depois cada thread do pool abre a sua conexão só de leitura ao
+        cv_<osf>.db3, com o osf<osf>.db3 anexado, e gera os relatórios que pegar.
+        Os índices vêm do catálogo de AuditIndices, criados na abertura normal da osf.
+        Só a thread principal imprime, conforme os relatórios ficam prontos.
+        Retorna o número de relatórios gerados
+        """
+        confirmados = []
+        for sql, fileName, queryTitle in jobs:
+            if interativa(window):
+                sql_input = self.get_sql_input(window, fileName, queryTitle, sql)
+                if sql_input is None:
+                    print(f"Relatório {fileName} cancelado pelo usuário")
+                    continue
+                fileName, queryTitle, sql = sql_input
+            confirmados.append((sql, fileName, queryTitle))
+        if not confirmados:
+            return 0
+        cvi_sys_data = self.config.load_cvi_sys_data()
+        if workers is None:
+            workers = cvi_sys_data.get('auditWorkers') \
+                or min(len(confirmados), os.cpu_count() or 1, 4)
+        print(f"Gerando {len(confirmados)} relatórios com {workers} conexões em paralelo\n")
+        if window is not False:
+            window.refresh()
+        local = threading.local()
+        conexoes = []
+        lock = threading.Lock()
+
+        def conexao():
+            # uma conexão só de leitura por thread do pool
+            if getattr(local, 'cvidb', None) is None:
+                cvidb = self.audits_action(osf, cnpj, readonly=True)
+                if cvidb is False:
+                    raise Exception(f"Não consegui abrir os bancos da osf {osf}")
+                local.cvidb = cvidb
+                with lock:
+                    conexoes.append(cvidb)
+            return local.cvidb
+
+        def job(sql, fileName, queryTitle):
+            start_time = time.time()
+            cvidb = conexao()
+            avisos = None
+            if cvi_sys_data.get('indexAdvisor', False):
+                avisos = AuditIndices.advisor(cvidb.cursor, sql)
+            sqlToData = CviSqlToData(cvi_sys_data['toDataType'],
+                                     cvi_sys_data['maxCells'],
+                                     cvi_sys_data['showSql'])
+            sqlToData.run(cvidb, sql, fileName, queryTitle)
+            return time.time() - start_time, avisos
+
+        start_time = time.time()
+        gerados = 0
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futuros = {executor.submit(job, *confirmado): confirmado
+                           for confirmado in confirmados}
+                try:
+                    for concluidos, futuro in enumerate(as_completed(futuros), 1):
+                        sql, fileName, queryTitle = futuros[futuro]
+                        try:
+                            elapsed, avisos = futuro.result()
+                            gerados += 1
+                            print(f"[{concluidos}/{len(confirmados)}] {fileName} "
+                                  + f"gerado com sucesso em {elapsed:.1f} segundos")
+                            if avisos is not None:
+                                AuditIndices.mostra_avisos(avisos, fileName)
+                        except CviCancelado:
+                            raise
+                        except Exception as e:
+                            print(f"[{concluidos}/{len(confirmados)}] Do sql abaixo,",
+                                  f"{fileName} ##NÃO## foi gerado em razão do seguinte erro:",
+                                  e)
+                            print(sql)
+                            traceback.print_exception(type(e), e, e.__traceback__)
+                        if window is not False:
+                            window.refresh()
+                except CviCancelado:
+                    # os relatórios ainda na fila não começam; os já iniciados param
+                    # no próximo CviJobs.progresso de CviSqlToData.run
+                    executor.shutdown(wait=True, cancel_futures=True)
+                    raise
+        finally:
+            for cvidb in conexoes:
+                cvidb.close()
+        print(f"\n{gerados} de {len(confirmados)} relatórios gerados em "
+              + f"{time.time() - start_time:.1f} segundos\n")
+        return gerados
+
     def createTableFromSql(self, window, cv_db, table: str, sql: str):
         sqldrop = f'''
 DROP TABLE IF EXISTS {table}
@@ -0,0 +1,165 @@
+import time
+
+# Catálogo dos índices das tabelas Safic do osf<osf>.db3 (dfe_fiscal_*, _fiscal_*, docatrib_*)
+# usados nos JOINs e WHEREs das auditorias: (tabela, campo, campo2).
+# Os nomes seguem CviDb.createIndex (<tabela>_<campo>[_<campo2>]), então os índices já
+# criados antes por createIndex são reaproveitados. Índice novo numa auditoria: é só
+# acrescentar aqui, que ele é criado na próxima abertura de cada osf
+INDICES = [
+    # EFD - bloco 0 e C
+    ('dfe_fiscal_Efd0150', 'idEfd0150', ''),
+    ('_fiscal_efd0190', 'UNID', 'idArquivo'),
+    ('_fiscal_efd0200', 'COD_ITEM', 'idArquivo'),
+    ('dfe_fiscal_EfdC100', 'idEfdC100', ''),
+    ('dfe_fiscal_EfdC100', 'CHV_NFE', ''),
+    ('dfe_fiscal_EfdC100Detalhe', 'idEfdC100', ''),
+    ('dfe_fiscal_EfdC110', 'idEfdC100', ''),
+    ('dfe_fiscal_EfdC170', 'idEfdC170', ''),
+    ('dfe_fiscal_EfdC190', 'idEfdC100', ''),
+    ('dfe_fiscal_EfdC195', 'idEfdC100', ''),
+    ('dfe_fiscal_EfdC197', 'idEfdC195', ''),
+    # EFD - blocos D, E, G e H
+    ('dfe_fiscal_EfdD100Detalhe', 'idEfdD100', ''),
+    ('dfe_fiscal_EfdD190', 'idEfdD100', ''),
+    ('_fiscal_EfdE111', 'idEfdE110', ''),
+    ('_fiscal_EfdE111Descr', 'idEfdE111', ''),
+    ('_fiscal_EfdE112', 'idEfdE111', ''),
+    ('_fiscal_EfdE112Descr', 'idEfdE112', ''),
+    ('_fiscal_EfdE113', 'idEfdE111', ''),
+    ('_fiscal_EfdE115', 'idEfdE110', ''),
+    ('_fiscal_EfdE115Descr', 'idEfdE115', ''),
+    ('_fiscal_EfdE116', 'idEfdE110', ''),
+    ('_fiscal_EfdE116Descr', 'idEfdE116', ''),
+    ('dfe_fiscal_EfdG125', 'idEfdG110', ''),
+    ('dfe_fiscal_EfdG126', 'idEfdG125', ''),
+    ('dfe_fiscal_EfdG130', 'idEfdG125', ''),
+    ('dfe_fiscal_EfdG140', 'idEfdG130', ''),
+    ('dfe_fiscal_EfdH005', 'idEfdH005', ''),
+    ('dfe_fiscal_EfdH010Descr', 'idEfdH010', ''),
+    ('dfe_fiscal_EfdH010Posse', 'idEfdH010', ''),
+    ('dfe_fiscal_EfdH010Prop', 'idEfdH010', ''),
+    # itens
+    ('_fiscal_ItemServicoDeclarado', 'codigo', ''),
+    ('_fiscal_ItemServicoDeclarado', 'idItemServicoDeclarado', ''),
+    ('_fiscal_RelItemServicoEfd0200', 'idEfd0200', ''),
+    # NFe
+    ('dfe_fiscal_NfeC100', 'idNfeC100', ''),
+    ('dfe_fiscal_NfeC100', 'CHV_NFE', ''),
+    ('dfe_fiscal_NfeC100Detalhe', 'idNfeC100', ''),
+    ('dfe_fiscal_NfeC101', 'idNfeC100', ''),
+    ('dfe_fiscal_NfeC102', 'idNfeC100', ''),
+    ('dfe_fiscal_NfeC110', 'idNfeC100', ''),
+    ('dfe_fiscal_NfeC112', 'idNfeC100', ''),
+    ('dfe_fiscal_NfeC115', 'idNfeC100', ''),
+    ('dfe_fiscal_NfeC116', 'idNfeC100', ''),
+    ('dfe_fiscal_NfeC127', 'idNfeC100', ''),
+    ('dfe_fiscal_NfeC130', 'idNfeC100', ''),
+    ('dfe_fiscal_NfeC140', 'idNfeC100', ''),
+    ('dfe_fiscal_NfeC170', 'idNFeC170', ''),
+    ('dfe_fiscal_NfeC170', 'idNFeC100', 'NUM_ITEM'),
+    # DocAtributos
+    ('DocAtrib_fiscal_DocAtributos', 'idDocAtributos', ''),
+    ('DocAtrib_fiscal_DocAtributosDeApuracao', 'idDocAtributos', ''),
+    ('docatrib_fiscal_DocAtributosItem', 'idDocAtributos', ''),
+]
+
+
+class AuditIndices:
+    """Índices do catálogo INDICES no osf<osf>.db3, criados uma só vez
+
+    provisiona: na abertura da osf (AuditHelpers.audits_action), cria numa única transação
+        os índices do catálogo que ainda não estão criados segundo a tabela cvi_indices do
+        osf<osf>.db3 e registra cada um lá (criado, sem tabela ou erro). Nas aberturas
+        seguintes basta ler cvi_indices; os sem tabela ou com erro são tentados de novo,
+        para a tabela importada depois da primeira abertura
+    advisor: EXPLAIN QUERY PLAN de um SQL de relatório, apontando as varreduras completas
+        de tabela (SCAN) e os índices automáticos que ainda restam
+    """
+    TABELA = 'cvi_indices'
+
+    def __init__(self, cv_db, osf: str):
+        self.cv_db = cv_db
+        self.osf = osf
+        self.schema = f"'osf{osf}'"
+
+    @staticmethod
+    def nome(table, field, field2=''):
+        return f"{table}_{field}_{field2}" if field2 else f"{table}_{field}"
+
+    def provisiona(self):
+        """Cria os índices que faltam; retorna quantos foram criados"""
+        cursor = self.cv_db.cursor
+        cursor.execute(f"CREATE TABLE IF NOT EXISTS {self.schema}.{self.TABELA} "
+                       + "(nome text PRIMARY KEY, tabela text, campos text, "
+                       + "situacao text, quando text)")
+        registrados = {row[0].lower() for row in cursor.execute(
+            f"SELECT nome FROM {self.schema}.{self.TABELA} WHERE situacao = 'criado'")}
+        faltam = [indice for indice in INDICES
+                  if self.nome(*indice).lower() not in registrados]
+        if not faltam:
+            self.cv_db.conn.commit()
+            return 0
+        start_time = time.time()
+        tabelas = {row[0].lower() for row in cursor.execute(
+            f"SELECT name FROM {self.schema}.sqlite_master WHERE type = 'table'")}
+        quando = time.strftime('%Y-%m-%d %H:%M:%S')
+        criados = 0
+        for table, field, field2 in faltam:
+            if table.lower() not in tabelas:
+                situacao = 'sem tabela'
+            else:
+                try:
+                    cursor.execute(self.cv_db.indexSql(self.osf, table, field, field2))
+                    situacao = 'criado'
+                    criados += 1
+                except Exception as e:
+                    # por exemplo, campo que não existe nesta versão do Safic
+                    situacao = f'erro: {e}'
+                    print(f"##ERRO## Índice {self.nome(table, field, field2)} não criado:", e)
+            cursor.execute(f"INSERT OR REPLACE INTO {self.schema}.{self.TABELA} "
+                           + "VALUES (?, ?, ?, ?, ?)",
+                           [self.nome(table, field, field2), table,
+                            f"{field}, {field2}" if field2 else field, situacao, quando])
+        self.cv_db.conn.commit()
+        if criados == 0:
+            return 0  # nada novo: só os que continuam sem tabela ou com erro
+        print(f"Índices da osf {self.osf}: {criados} criados em "
+              + f"{time.time() - start_time:.1f} segundos "
+              + f"({len(faltam) - criados} sem tabela ou com erro)")
+        return criados
+
+    @staticmethod
+    def plano(cursor, sql: str):
+        """Linhas (id, parent, detail) do EXPLAIN QUERY PLAN de sql"""
+        return [(row[0], row[1], row[-1])
+                for row in cursor.execute(f"EXPLAIN QUERY PLAN {sql.strip().rstrip(';')}")]
+
+    @staticmethod
+    def advisor(cursor, sql: str):
+        """Avisos sobre o plano de sql: varreduras completas e índices automáticos
+
+        A primeira varredura do plano é a tabela principal do relatório (o FROM), que é
+        lida inteira de qualquer jeito, e não entra nos avisos
+        """
+        avisos = []
+        principal = True
+        for _, _, detail in AuditIndices.plano(cursor, sql):
+            if 'AUTOMATIC' in detail:
+                # o sqlite está criando um índice temporário a cada execução
+                avisos.append(f"índice automático: {detail}")
+            elif detail.startswith('SCAN ') and ' USING ' not in detail \
+                    and 'CONSTANT ROW' not in detail and 'SUBQUERY' not in detail.upper():
+                if principal:
+                    principal = False
+                    continue
+                avisos.append(f"varredura completa: {detail}")
+        return avisos
+
+    @staticmethod
+    def mostra_avisos(avisos, fileName: str):
+        if not avisos:
+            print(f"Plano de {fileName}: sem varreduras completas")
+            return
+        print(f"#ATENÇÃO# Plano de {fileName}, veja se falta índice em INDICES:")
+        for aviso in avisos:
+            print(f"    {aviso}")
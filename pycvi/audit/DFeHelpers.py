@@ -1,9 +1,10 @@
-import PySimpleGUI as sg
 import os
 import traceback
 
 from pycvi.CviDb import CviDb
+from pycvi.CviJobs import na_janela
 from pycvi.CviSqlToData import CviSqlToData
+from pycvi.audit.AuditIndices import AuditIndices
 
 
 class DFeHelpers:
@@ -28,12 +29,19 @@ class DFeHelpers:
             return False
         try:
             cvidb.attachdb(db_dir, f'osf{osf}.db3')
-            return cvidb
         except Exception as e:
             print(f"Erro com attach no banco de dados {db_dir}\\osf{osf}.db3", e)
             return False
+        try:
+            # índices do catálogo (ver AuditIndices), criados só na primeira abertura da osf
+            AuditIndices(cvidb, osf).provisiona()
+        except Exception as e:
+            print(f"##ERRO## Não consegui criar os índices da osf {osf}:", e)
+        return cvidb
 
+    @na_janela
     def get_keys_input(self, window, dirName):
+        import PySimpleGUI as sg  # só com janela, a linha de comando (CviCli) roda sem
         layout = [
             [sg.Text("Diretorio para Gravação"),
              sg.Input(default_text=dirName, key='-DIRNAME-', size=(120, 1))],
@@ -65,7 +73,7 @@ class DFeHelpers:
     def DfeNFe(self, window, osf, cv_db, fileName: str, key: str):
         cvi_sys_data = self.config.load_cvi_sys_data()
         sqlToData = CviSqlToData(toDataType='html', maxCells=-1,
-                                 showSql=cvi_sys_data['showSql'])
+                                 showSql=cvi_sys_data['showSql'], spread=True)
         sql = f'''\
 SELECT
 CASE WHEN IND_EMIT = 0 THEN
@@ -107,19 +115,7 @@ A.DT_DOC, A.DT_E_S, A.VL_DOC, A.VL_BC_ICMS, A.VL_ICMS, A.VL_BC_ICMS_ST, A.VL_ICM
    LEFT OUTER JOIN dfe_fiscal_NfeC140 AS N ON N.idNfeC100 = A.idNfeC100
    WHERE A.CHV_NFE = '{key}'
 '''
-        cv_db.createIndex(osf, 'dfe_fiscal_NfeC100', 'CHV_NFE')
-        cv_db.createIndex(osf, 'dfe_fiscal_NfeC100Detalhe', 'idNfeC100')
-        cv_db.createIndex(osf, 'dfe_fiscal_NfeC101', 'idNfeC100')
-        cv_db.createIndex(osf, 'dfe_fiscal_NfeC102', 'idNfeC100')
-        cv_db.createIndex(osf, 'dfe_fiscal_NfeC110', 'idNfeC100')
-        cv_db.createIndex(osf, 'dfe_fiscal_NfeC112', 'idNfeC100')
-        cv_db.createIndex(osf, 'dfe_fiscal_NfeC115', 'idNfeC100')
-        cv_db.createIndex(osf, 'dfe_fiscal_NfeC116', 'idNfeC100')
-        cv_db.createIndex(osf, 'dfe_fiscal_NfeC127', 'idNfeC100')
-        cv_db.createIndex(osf, 'dfe_fiscal_NfeC130', 'idNfeC100')
-        cv_db.createIndex(osf, 'dfe_fiscal_NfeC140', 'idNfeC100')
 
         queryTitle = f"{key} - Dados Principais da NFe"
         self.DfeNFe_aux(window, cv_db, fileName, sqlToData, sql, queryTitle)
-        sqlToData.tableSpread(fileName)
 #    $aHtmlFiles[] = $fileName;    
@@ -11,7 +11,7 @@ def _00_action(window, values: str):
     osf, cnpj = ah.values_to_osf_cnpj(values)
     cv_db = ah.audits_action(osf, cnpj)
     if cv_db is False:
-        return
+        return False
     file_selection = os.path.join(config.CVI_VAR, 'result', cnpj, f'cv_{osf}.db3')
     exe_path = os.path.join(config.CVI_USR, 'Sqliteman-1.2.2', 'sqliteman.exe')
     subprocess.run([exe_path] + [file_selection])
@@ -10,18 +10,17 @@ def _02_action(window, values: str):
     osf, cnpj = ah.values_to_osf_cnpj(values)
     cv_db = ah.audits_action(osf, cnpj)
     if cv_db is False:
-        return
+        return False
     print(f"Gerando 02 Auditorias Conciliação na osf {osf} \
         do cnpj {cnpj}...\n\n#AGUARDE#")
     window.refresh()
+    # os relatórios são gerados juntos no final, em paralelo (ver sqlToData_batch)
+    jobs = []
     fileName = os.path.join(config.CVI_VAR, 'result', cnpj, osf,
                             'Audit_02A-ConciliacaoAnaliticoDoAudit_01Bpy')
     sql = 'SELECT * FROM chaveNroTudao;'
-    ah.sqlToData_run_aux(window, cv_db, sql, fileName,
-                         os.path.basename(fileName))
+    jobs.append((sql, fileName, os.path.basename(fileName)))
 
-    cv_db.createIndex(osf, 'dfe_fiscal_EfdC100', 'idEfdC100')
-    cv_db.createIndex(osf, 'dfe_fiscal_NfeC100', 'idNfeC100')
     nivelDetalhe = 1
     if (nivelDetalhe != 0):
         nd0 = f'''\
@@ -49,4 +48,7 @@ LEFT OUTER JOIN dfe_fiscal_NfeC100 AS C ON C.idNfeC100 = A.idNfeC100
         "<h3>tpJoin: 0 - Chave de Acesso bate; 1 - Número Bate; " +\
         "2 - Não localizou nem número, nem chave de acesso<br>" +\
         "O inverso pode ser verificado em .[fiscal].[NfeEfdParticip]</h3>"
-    ah.sqlToData_run_aux(window, cv_db, sql, fileName, queryTitle)
+    jobs.append((sql, fileName, queryTitle))
+
+    gerados = ah.sqlToData_batch(window, osf, cnpj, jobs)
+    return gerados == len(jobs)  # False se algum relatório não foi gerado (ver CviCli)
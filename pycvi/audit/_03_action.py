@@ -10,10 +10,12 @@ def _03_action(window, values: str):
     osf, cnpj = ah.values_to_osf_cnpj(values)
     cv_db = ah.audits_action(osf, cnpj)
     if cv_db is False:
-        return
+        return False
     print(f"Gerando 02 Auditorias-DocAtribs na osf {osf} \
         do cnpj {cnpj}...\n\n#AGUARDE#")
     window.refresh()
+    # os relatórios são gerados juntos no final, em paralelo (ver sqlToData_batch)
+    jobs = []
 
     nivelDetalhe = 1
     if (nivelDetalhe != 0):
@@ -46,7 +48,7 @@ SELECT '[DocAtrib_fiscal_DocAtributos]' AS tA, A.*,
     fileName = os.path.join(config.CVI_VAR, 'result', cnpj, osf,
                             'Audit_03A-DocAtributos_py')
     queryTitle = os.path.basename(fileName)
-    ah.sqlToData_run_aux(window, cv_db, sql, fileName, queryTitle)
+    jobs.append((sql, fileName, queryTitle))
 
     if (nivelDetalhe != 0):
         nd0 = f'''\
@@ -96,12 +98,8 @@ FROM
     fileName = os.path.join(config.CVI_VAR, 'result', cnpj, osf,
                             'Audit_03B-DocAtributosDeApuracao_py')
     queryTitle = os.path.basename(fileName)
-    ah.sqlToData_run_aux(window, cv_db, sql, fileName, queryTitle)
+    jobs.append((sql, fileName, queryTitle))
 
-    cv_db.createIndex(osf, '_fiscal_ItemServicoDeclarado',
-                      'idItemServicoDeclarado')
-    cv_db.createIndex(osf, 'dfe_fiscal_NfeC170', 'idNFeC170')
-    cv_db.createIndex(osf, 'dfe_fiscal_EfdC170', 'idEfdC170')
     if (nivelDetalhe != 0):
         nd0 = f'''\
 SELECT AI.idDocAtributosItem,
@@ -158,4 +156,7 @@ FROM
     fileName = os.path.join(config.CVI_VAR, 'result', cnpj, osf,
                             'Audit_03C-DocAtributosItem_py')
     queryTitle = os.path.basename(fileName)
-    ah.sqlToData_run_aux(window, cv_db, sql, fileName, queryTitle)
+    jobs.append((sql, fileName, queryTitle))
+
+    gerados = ah.sqlToData_batch(window, osf, cnpj, jobs)
+    return gerados == len(jobs)  # False se algum relatório não foi gerado (ver CviCli)
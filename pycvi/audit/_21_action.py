@@ -10,13 +10,13 @@ def _21_action(window, values: str):
     osf, cnpj = ah.values_to_osf_cnpj(values)
     cv_db = ah.audits_action(osf, cnpj)
     if cv_db is False:
-        return
+        return False
     print(f"Gerando 21 Dados das EFDs na osf {osf} "
           + "do cnpj {cnpj}...\n\n#AGUARDE#")
     window.refresh()
+    # os relatórios são gerados juntos no final, em paralelo (ver sqlToData_batch)
+    jobs = []
 
-    cv_db.createIndex(osf, 'dfe_fiscal_EfdC100Detalhe', 'idEfdC100')
-    cv_db.createIndex(osf, 'dfe_fiscal_Efd0150', 'idEfd0150')
     sql = f'''\
 SELECT '[EfdC100]' AS tA, A.*, '[EfdC100Detalhe]' AS tB, B.*, '[Efd0150]' AS tG, G.*
    FROM dfe_fiscal_EfdC100 AS A
@@ -26,13 +26,8 @@ SELECT '[EfdC100]' AS tA, A.*, '[EfdC100Detalhe]' AS tB, B.*, '[Efd0150]' AS tG,
     fileName = os.path.join(config.CVI_VAR, 'result', cnpj, osf,
                             'EFD_01a-EFDC100_py')
     queryTitle = "01a - Lista de EFDs C100 (sem duplicar) com C100Detalhe"
-    ah.sqlToData_run_aux(window, cv_db, sql, fileName, queryTitle)
+    jobs.append((sql, fileName, queryTitle))
 
-    cv_db.createIndex(osf, '_fiscal_efd0200', 'COD_ITEM', 'idArquivo')
-    cv_db.createIndex(osf, '_fiscal_efd0190', 'UNID', 'idArquivo')
-    cv_db.createIndex(osf, 'dfe_fiscal_EfdC100', 'idEfdC100')
-    cv_db.createIndex(osf, 'dfe_fiscal_EfdC100Detalhe', 'idEfdC100')
-    cv_db.createIndex(osf, 'dfe_fiscal_Efd0150', 'idEfd0150')
     sql = f'''\
 SELECT '[EfdC170]' AS tA, A.*, '[Efd0200]' AS tD, D.*, '[Efd0190]' AS tE, E.*,
    '[EfdC100]' AS tB, B.*, '[EfdC100Detalhe]' AS tC, C.*, '[Efd0150]' AS tG, G.*
@@ -46,14 +41,8 @@ SELECT '[EfdC170]' AS tA, A.*, '[Efd0200]' AS tD, D.*, '[Efd0190]' AS tE, E.*,
     fileName = os.path.join(config.CVI_VAR, 'result', cnpj, osf,
                             'EFD_01b-EFDC170_EFDC100_py')
     queryTitle = "01b - Lista de EFDs C170 com C100, C100Detalhe e Efd0150"
-    ah.sqlToData_run_aux(window, cv_db, sql, fileName, queryTitle)
+    jobs.append((sql, fileName, queryTitle))
 
-    cv_db.createIndex(osf, 'dfe_fiscal_EfdC100Detalhe', 'idEfdC100')
-    cv_db.createIndex(osf, 'dfe_fiscal_EfdC110', 'idEfdC100')
-    cv_db.createIndex(osf, 'dfe_fiscal_EfdC190', 'idEfdC100')
-    cv_db.createIndex(osf, 'dfe_fiscal_EfdC195', 'idEfdC100')
-    cv_db.createIndex(osf, 'dfe_fiscal_EfdC197', 'idEfdC195')
-    cv_db.createIndex(osf, 'dfe_fiscal_Efd0150', 'idEfd0150')
     sql = f'''\
 SELECT '[EfdC100]' AS tA, A.*, '[EfdC100Detalhe]' AS tB, '[Efd0150]' AS tG, G.*,
 B.*, '[EfdC110]' AS tC, C.*,
@@ -69,10 +58,8 @@ B.*, '[EfdC110]' AS tC, C.*,
     fileName = os.path.join(config.CVI_VAR, 'result', cnpj, osf,
                             'EFD_01c-EFDsC100s_C190s')
     queryTitle = "01c - Lista de EFDs C100s e C190 podendo duplicar"
-    ah.sqlToData_run_aux(window, cv_db, sql, fileName, queryTitle)
+    jobs.append((sql, fileName, queryTitle))
 
-    cv_db.createIndex(osf, 'dfe_fiscal_EfdD100Detalhe', 'idEfdD100')
-    cv_db.createIndex(osf, 'dfe_fiscal_EfdD190', 'idEfdD100')
     sql = f'''\
 SELECT '[EfdD100]' AS tA, A.*, '[EfdD100Detalhe]' AS tB, B.*, '[EfdD190]' AS tC, C.*
    FROM dfe_fiscal_EfdD100 AS A
@@ -82,17 +69,8 @@ SELECT '[EfdD100]' AS tA, A.*, '[EfdD100Detalhe]' AS tB, B.*, '[EfdD190]' AS tC,
     fileName = os.path.join(config.CVI_VAR, 'result', cnpj, osf,
                             'EFD_01d-EFDD100_py')
     queryTitle = "01d - Lista de EFDs D100 (sem duplicar) com D100Detalhe e D190"
-    ah.sqlToData_run_aux(window, cv_db, sql, fileName, queryTitle)
+    jobs.append((sql, fileName, queryTitle))
 
-    cv_db.createIndex(osf, '_fiscal_EfdE111', 'idEfdE110')
-    cv_db.createIndex(osf, '_fiscal_EfdE111Descr', 'idEfdE111')
-    cv_db.createIndex(osf, '_fiscal_EfdE112', 'idEfdE111')
-    cv_db.createIndex(osf, '_fiscal_EfdE112Descr', 'idEfdE112')
-    cv_db.createIndex(osf, '_fiscal_EfdE113', 'idEfdE111')
-    cv_db.createIndex(osf, '_fiscal_EfdE115', 'idEfdE110')
-    cv_db.createIndex(osf, '_fiscal_EfdE115Descr', 'idEfdE115')
-    cv_db.createIndex(osf, '_fiscal_EfdE116', 'idEfdE110')
-    cv_db.createIndex(osf, '_fiscal_EfdE116Descr', 'idEfdE116')
     sql = f'''\
 SELECT '[EfdE110]' AS tA, A.*, '[EfdE111]' AS tB, B.*, '[EfdE111Descr]' AS tC, C.*,
    '[EfdE112]' AS tD, D.*, '[EfdE112Descr]' AS tE, E.*,
@@ -113,10 +91,8 @@ SELECT '[EfdE110]' AS tA, A.*, '[EfdE111]' AS tB, B.*, '[EfdE111Descr]' AS tC, C
     fileName = os.path.join(config.CVI_VAR, 'result', cnpj, osf,
                             'EFD_01e1-EFDBlocoE100_py')
     queryTitle = "EFD_BlocoE100"
-    ah.sqlToData_run_aux(window, cv_db, sql, fileName, queryTitle)
+    jobs.append((sql, fileName, queryTitle))
 
-    cv_db.createIndex(osf, 'Dfe_fiscal_EfdG125', 'idEfdG110')
-    cv_db.createIndex(osf, 'Dfe_fiscal_EfdG126', 'idEfdG125')
     sql = f'''\
 SELECT '[EfdG110]' AS tA, A.*, '[EfdG125]' AS tB, B.*, '[EfdG126]' AS tC, C.*
    FROM Dfe_fiscal_EfdG110 AS A
@@ -126,10 +102,8 @@ SELECT '[EfdG110]' AS tA, A.*, '[EfdG125]' AS tB, B.*, '[EfdG126]' AS tC, C.*
     fileName = os.path.join(config.CVI_VAR, 'result', cnpj, osf,
                             'EFD_01f1-EFDBlocoG')
     queryTitle = "01f1 - Bloco G - Sintético"
-    ah.sqlToData_run_aux(window, cv_db, sql, fileName, queryTitle)
+    jobs.append((sql, fileName, queryTitle))
 
-    cv_db.createIndex(osf, 'Dfe_fiscal_EfdG130', 'idEfdG125')
-    cv_db.createIndex(osf, 'Dfe_fiscal_EfdG140', 'idEfdG130')
     sql = f'''\
 SELECT '[EfdG110]' AS tA, A.*, '[EfdG125]' AS tB, B.*, '[EfdG126]' AS tC,
    C.*, '[EfdG130]' AS tD, D.*, '[EfdG140]' AS tE, E.*
@@ -142,13 +116,8 @@ SELECT '[EfdG110]' AS tA, A.*, '[EfdG125]' AS tB, B.*, '[EfdG126]' AS tC,
     fileName = os.path.join(config.CVI_VAR, 'result', cnpj, osf,
                             'EFD_01f2-EFDBlocoG_py')
     queryTitle = "01f2 - Bloco G - Analítico"
-    ah.sqlToData_run_aux(window, cv_db, sql, fileName, queryTitle)
+    jobs.append((sql, fileName, queryTitle))
 
-    cv_db.createIndex(osf, '_fiscal_ItemServicoDeclarado', 'codigo')
-    cv_db.createIndex(osf, 'dfe_fiscal_EfdH005', 'idEfdH005')
-    cv_db.createIndex(osf, 'dfe_fiscal_EfdH010Descr', 'idEfdH010')
-    cv_db.createIndex(osf, 'dfe_fiscal_EfdH010Posse', 'idEfdH010')
-    cv_db.createIndex(osf, 'dfe_fiscal_EfdH010Prop', 'idEfdH010')
     sql = f'''\
 SELECT '[EfdH010]' AS tA, A.*, '[ItemServicoDeclarado]' AS tE, E.*,
 '[EfdH005]' AS tF, F.*, '[EfdH010Descr]' AS tB, B.*, '[EfdH010Posse]' AS tC, C.*,
@@ -163,10 +132,8 @@ SELECT '[EfdH010]' AS tA, A.*, '[ItemServicoDeclarado]' AS tE, E.*,
     fileName = os.path.join(config.CVI_VAR, 'result', cnpj, osf,
                             'EFD_01f2-EFDBlocoH_py')
     queryTitle = "01g - Bloco H"
-    ah.sqlToData_run_aux(window, cv_db, sql, fileName, queryTitle)
+    jobs.append((sql, fileName, queryTitle))
 
-    cv_db.createIndex(osf, '_fiscal_RelItemServicoEfd0200', 'idEfd0200')
-    cv_db.createIndex(osf, '_fiscal_ItemServicoDeclarado', 'idItemServicoDeclarado')
     sql = f'''\
 SELECT '[Efd0200]' AS tA, A.*,'[RelItemServicoEfd0200]' AS tB, B.*,
 '[ItemServicoDeclarado]' AS tC, C.*
@@ -177,4 +144,7 @@ SELECT '[Efd0200]' AS tA, A.*,'[RelItemServicoEfd0200]' AS tB, B.*,
     fileName = os.path.join(config.CVI_VAR, 'result', cnpj, osf,
                             'EFD_01g-EFD0200_py')
     queryTitle = "01h - 0200"
-    ah.sqlToData_run_aux(window, cv_db, sql, fileName, queryTitle)
+    jobs.append((sql, fileName, queryTitle))
+
+    gerados = ah.sqlToData_batch(window, osf, cnpj, jobs)
+    return gerados == len(jobs)  # False se algum relatório não foi gerado (ver CviCli)
@@ -10,7 +10,7 @@ def _35_action(window, values: str):
     osf, cnpj = ah.values_to_osf_cnpj(values)
     cv_db = ah.audits_action(osf, cnpj)
     if cv_db is False:
-        return
+        return False
     print(f"Gerando 35 Scanc - Verificações na osf {osf} \
         do cnpj {cnpj}...\n\n#AGUARDE#")
     window.refresh()
@@ -34,4 +34,4 @@ LEFT OUTER JOIN dfe_fiscal_NfeC170 AS H ON H.idNFeC100 = K.idNFeC100 AND H.NUM_I
 LEFT OUTER JOIN chaveNroTudao AS L ON L.chave = J.CHV_NFE
 WHERE cod_item = '000003'
 '''
-    ah.sqlToData_run_aux(window, cv_db, sql, fileName, os.path.basename(fileName))
+    return ah.sqlToData_run_aux(window, cv_db, sql, fileName, os.path.basename(fileName))
@@ -1,21 +1,31 @@
 import os
 from pycvi.Config import Config
 from pycvi.audit.DFeHelpers import DFeHelpers
+from pycvi.CviJobs import interativa
 
 config = Config()
 dh = DFeHelpers(config)
 
 
-def _90_action(window, values: str):
+def _90_action(window, values: str, keys=None, dirName=None):
+    # keys (separadas por ; ou \n) e dirName já informados na linha de comando (ver CviCli);
+    #   senão, pergunta
     osf, cnpj = dh.values_to_osf_cnpj(values)
     cv_db = dh.audits_action(osf, cnpj)
     if cv_db is False:
-        return
+        return False
     print(f"Gerando DFe(s), a partir da osf {osf} \
         do cnpj {cnpj}...\n\n#AGUARDE#")
     window.refresh()
-    dirName = os.path.join(config.CVI_VAR, 'result', cnpj, osf, 'DFes')
-    dirName, keys = dh.get_keys_input(window, dirName)
+    if dirName is None:
+        dirName = os.path.join(config.CVI_VAR, 'result', cnpj, osf, 'DFes')
+    if keys is None:
+        keys_input = dh.get_keys_input(window, dirName)
+        if keys_input is None:
+            print("Geração de DFes cancelada pelo usuário")
+            return False
+        dirName, keys = keys_input
+    Config.create_dir_if_not_exists(dirName)
     # se veio separado por ponto e vírgula, muda para separado por \n
     keys = keys.replace(';', "\n")
     keys = keys.split("\n")
@@ -36,7 +46,7 @@ def _90_action(window, values: str):
             print(f'Não gerei a DFe {key}. Modelo 57 ainda não disponível')
         i += 1
 
-    if i == 1:
+    if i == 1 and interativa(window):
         print("\nComo gerei somente uma DFe, vou abrir o arquivo .html.\n")
         os.startfile(os.path.realpath(os.path.join(dirName, f"{key}.html")))
         print(f"Aberto {fileName} - verifique se está em segundo plano")
@@ -10,7 +10,7 @@ def _95_action(window, values: str):
     osf, cnpj = ah.values_to_osf_cnpj(values)
     cv_db = ah.audits_action(osf, cnpj)
     if cv_db is False:
-        return
+        return False
     print(f"Gerando 95 Específico - Verificações na osf {osf} \
         do cnpj {cnpj}...\n\n#AGUARDE#")
     window.refresh()
@@ -193,5 +193,5 @@ SELECT A.*,
       AND A.g1 IN ('1-Receitas', '2-Compras Insumos')
   LIMIT 500000
 '''
-    ah.sqlToData_run_aux(window, cv_db, sql, fileName,
-                         os.path.basename(fileName))
+    return ah.sqlToData_run_aux(window, cv_db, sql, fileName,
+                                os.path.basename(fileName))
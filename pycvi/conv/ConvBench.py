@@ -0,0 +1,187 @@
+"""Benchmark dos conversores SPED (ver ConvSped), com arquivos sintéticos de ConvGera
+
+    python -m pycvi.conv.ConvBench suite [--linhas N] [--periodos P] [--formatos ...]
+        converte cada formato num processo novo e mostra linhas/s, linhas/s por tabela,
+        pico de memória (RSS) e tamanho final do banco
+    python -m pycvi.conv.ConvBench leitura [--linhas N]
+        compara as leituras 'readline' e 'mmap' num Cat42 e confere se geram as mesmas linhas
+    python -m pycvi.conv.ConvBench gera formato pasta [--linhas N] [--periodos P]
+        só gera os arquivos, para testes manuais
+"""
+import os
+import sys
+import time
+import sqlite3
+import hashlib
+import argparse
+import tempfile
+import contextlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from pycvi.conv.ConvCat42 import ConvCat42
+from pycvi.conv.ConvEfd import ConvEfd
+from pycvi.conv import ConvGera
+
+CONVERSORES = {'cat42': ConvCat42, 'cat42difis': ConvCat42, 'efd': ConvEfd}
+
+
+def pico_memoria():
+    """Pico de memória (RSS) deste processo em MB, ou None se não der para saber"""
+    try:
+        import resource
+    except ImportError:
+        return pico_memoria_windows()
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss vem em KB no Linux e em bytes no macOS
+    return maxrss / 1024 / (1024 if sys.platform == 'darwin' else 1)
+
+
+def pico_memoria_windows():
+    try:
+        import ctypes
+        from ctypes import wintypes
+
+        class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+            _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD),
+                        ('PeakWorkingSetSize', ctypes.c_size_t),
+                        ('WorkingSetSize', ctypes.c_size_t),
+                        ('QuotaPeakPagedPoolUsage', ctypes.c_size_t),
+                        ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                        ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t),
+                        ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                        ('PagefileUsage', ctypes.c_size_t),
+                        ('PeakPagefileUsage', ctypes.c_size_t)]
+
+        counters = PROCESS_MEMORY_COUNTERS()
+        counters.cb = ctypes.sizeof(counters)
+        handle = ctypes.windll.kernel32.GetCurrentProcess()
+        if not ctypes.windll.psapi.GetProcessMemoryInfo(handle, ctypes.byref(counters),
+                                                        counters.cb):
+            return None
+        return counters.PeakWorkingSetSize / 1024 / 1024
+    except Exception:
+        return None
+
+
+def digest(db_path, tables):
+    """Hash do conteúdo das tabelas, para comparar duas conversões"""
+    conn = sqlite3.connect(db_path)
+    h = hashlib.sha1()
+    for table in tables:
+        for row in conn.execute(f'SELECT * FROM {table} ORDER BY ord'):
+            h.update(repr(row).encode())
+    conn.close()
+    return h.hexdigest()
+
+
+def converte(classe, arquivos, result_dir, reader='readline', staging=False):
+    """Converte arquivos em result_dir sem mostrar o andamento; retorna (segundos, linhas)"""
+    linhas = 0
+    start_time = time.time()
+    for arquivo in arquivos:
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            conv = classe(None, arquivo, result_dir, 'latin-1', staging=staging, reader=reader)
+        conv.db.conn.close()
+        if conv.erro is not None:
+            raise conv.erro
+        linhas += conv.ilidos - 1
+    return time.time() - start_time, linhas, conv
+
+
+def bench_formato(formato, linhas, periodos, reader):
+    """Executada num processo novo, para que o pico de memória seja só desta conversão"""
+    classe = CONVERSORES[formato]
+    with tempfile.TemporaryDirectory() as tmp:
+        arquivos = ConvGera.gera(formato, tmp, linhas, periodos)
+        tamanho = sum(os.path.getsize(arquivo) for arquivo in arquivos)
+        result_dir = os.path.join(tmp, 'result')
+        os.mkdir(result_dir)
+        elapsed, lidas, conv = converte(classe, arquivos, result_dir, reader)
+        db_path = os.path.join(result_dir, conv.db.name)
+        conn = sqlite3.connect(db_path)
+        tabelas = {table: conn.execute(f'SELECT count(*) FROM {table}').fetchone()[0]
+                   for table in conv.tabelas_dados()}
+        conn.close()
+        return {'formato': formato, 'arquivos': len(arquivos), 'tamanho': tamanho,
+                'segundos': elapsed, 'linhas': lidas, 'tabelas': tabelas,
+                'pico_mb': pico_memoria(), 'banco': os.path.getsize(db_path)}
+
+
+def suite(linhas, periodos, formatos, reader='readline'):
+    print(f"Benchmark: {linhas} linhas em {periodos} período(s), leitura {reader}\n")
+    resultados = []
+    for formato in formatos:
+        # spawn: um processo limpo, sem a memória herdada deste
+        with ProcessPoolExecutor(max_workers=1,
+                                 mp_context=multiprocessing.get_context('spawn')) as executor:
+            resultado = executor.submit(bench_formato, formato, linhas, periodos,
+                                        reader).result()
+        resultados.append(resultado)
+        mostra(resultado)
+    return resultados
+
+
+def mostra(r):
+    mb = 1024 * 1024
+    pico = '?' if r['pico_mb'] is None else f"{r['pico_mb']:.0f} MB"
+    print(f"{r['formato']}: {r['arquivos']} arquivo(s), {r['tamanho'] / mb:.1f} MB,",
+          f"{r['linhas']} linhas em {r['segundos']:.2f} segundos")
+    print(f"  {r['linhas'] / r['segundos']:.0f} linhas/s, pico de memória {pico},",
+          f"banco final {r['banco'] / mb:.1f} MB")
+    for table, quantidade in r['tabelas'].items():
+        if quantidade:
+            print(f"  {table:6} {quantidade:10} linhas {quantidade / r['segundos']:10.0f} linhas/s",
+                  f"{quantidade / r['linhas']:7.1%} do total")
+    print()
+
+
+def leitura(linhas):
+    """Compara as leituras readline e mmap num Cat42 de linhas linhas"""
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"Gerando {linhas} linhas em {tmp}")
+        arquivos = ConvGera.gera('cat42', tmp, linhas)
+        print(f"Tamanho: {os.path.getsize(arquivos[0]) / 1024 / 1024:.1f} MB\n")
+        resultados = dict()
+        for reader in ('readline', 'mmap'):
+            with tempfile.TemporaryDirectory() as result_dir:
+                # staging: só as tabelas de dados, sem as tabelas auxiliares nem os índices
+                elapsed, lidas, conv = converte(ConvCat42, arquivos, result_dir, reader, True)
+                resultados[reader] = digest(os.path.join(result_dir, conv.db.name),
+                                            conv.tabelas_dados())
+            print(f"{reader:8}: {elapsed:8.2f} segundos, {lidas / elapsed:10.0f} linhas/s")
+        if resultados['readline'] == resultados['mmap']:
+            print("\nAs duas leituras geraram as mesmas linhas")
+        else:
+            print("\n##ERRO## As leituras readline e mmap geraram linhas diferentes!")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m pycvi.conv.ConvBench',
+                                     description='Benchmark dos conversores Cat42 e EFD')
+    comandos = parser.add_subparsers(dest='comando', required=True)
+    p = comandos.add_parser('suite', help='converte cada formato e mede')
+    p.add_argument('--linhas', type=int, default=1000000)
+    p.add_argument('--periodos', type=int, default=3)
+    p.add_argument('--formatos', nargs='+', choices=ConvGera.FORMATOS,
+                   default=list(ConvGera.FORMATOS))
+    p.add_argument('--reader', choices=('readline', 'mmap'), default='readline')
+    p = comandos.add_parser('leitura', help='compara as leituras readline e mmap')
+    p.add_argument('--linhas', type=int, default=5000000)
+    p = comandos.add_parser('gera', help='só gera os arquivos sintéticos')
+    p.add_argument('formato', choices=ConvGera.FORMATOS)
+    p.add_argument('pasta')
+    p.add_argument('--linhas', type=int, default=1000000)
+    p.add_argument('--periodos', type=int, default=1)
+    args = parser.parse_args(argv)
+    if args.comando == 'suite':
+        suite(args.linhas, args.periodos, args.formatos, args.reader)
+    elif args.comando == 'leitura':
+        leitura(args.linhas)
+    else:
+        for arquivo in ConvGera.gera(args.formato, args.pasta, args.linhas, args.periodos):
+            print(arquivo)
+
+
+if __name__ == '__main__':
+    main()
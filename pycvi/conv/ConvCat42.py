@@ -1,74 +1,83 @@
-import os
-import time
+from pycvi.conv.ConvSped import ConvSped, TABELA_CFOPD, TABELA_TAB4_1_1, TABELA_MUNIC
+from pycvi.conv.ConvLayout import ConvLayout, decimalBR, decimalUS, dtaSPED
 
-from pycvi.conv.ConvHelpers import ConvHelpers
-from pycvi.Config import Config
-config = Config()
-
-
-class ConvCat42:
-    def __init__(self, window, filename, result_dir, encoding):
-        self.window = window
-        self.filename = filename
-        self.encoding = encoding
-        self.db = ConvHelpers(result_dir, 'cat42.db3')
-        window.refresh()
-        self.db3_open()
-        window.refresh()
-        self.cat42Read()
-
-    def db3_open(self):
-        db_path = os.path.join(self.db.dir, self.db.name)
-        if os.path.exists(db_path):
-            try:
-                self.db.connect()
-            except Exception as e:
-                print(f"Falha ao abrir Banco de Dados {db_path}: {e}")
-                return
-        else:
-            try:
-                self.db.connect()
-            except Exception as e:
-                print(f"Falha ao criar Banco de Dados {db_path}: {e}")
-                return
-
-            self.db.exec("""
-CREATE TABLE cfopd (cfop int, dfi text, st text, classe text,
-    g1 text, c3 text, g2 text, g3 text, descri_simplif text, descri text, pod_creditar text);
-""")
-            self.db.exec("""
-CREATE INDEX cfopd_cfop ON cfopd (cfop ASC);
-""")
-            self.db.insert_into_table_from_txt(
-                os.path.join(config.CVI_RES, 'tabelas', 'cfopd.txt'),
-                'cfopd')
-            self.db.exec('CREATE TABLE conta_reg (arq, aaaamm, reg, qtd int)')
-            self.db.exec("""
+TABELA_DESCRI_REG = ('descri_reg', """
 CREATE TABLE descri_reg (reg text, proc text, nivel int, descri text, obrig text, ocorr text);
-""")
-            self.db.exec("""
-CREATE INDEX descri_reg_reg ON descri_reg (reg ASC);
-""")
-            self.db.insert_into_table_from_txt(
-                os.path.join(config.CVI_RES, 'tabelas', 'CAT42_Reg_Descri.txt'),
-                'descri_reg')
-            self.db.exec("""
-CREATE TABLE tab4_1_1 (cod text, descri text, mod text);
-""")
-            self.db.exec("""
-CREATE INDEX tab4_1_1_cod ON tab4_1_1 (cod ASC);
-""")
-            self.db.insert_into_table_from_txt(
-                os.path.join(config.CVI_RES, 'tabelas', 'Tab4.1.1.txt'),
-                'tab4_1_1')
-            self.db.exec("""
-CREATE TABLE tab_munic (cod int primary key, uf text, munic text);
-""")
-            self.db.insert_into_table_from_txt(
-                os.path.join(config.CVI_RES, 'tabelas', 'Tabela_Municipios.txt'),
-                'tab_munic')
-
-            self.db.exec("""
+""", 'CAT42_Reg_Descri.txt', 'CREATE INDEX descri_reg_reg ON descri_reg (reg ASC);')
+
+
+class ConvCat42(ConvSped):
+    DB3_NAME = 'cat42.db3'
+    TABELAS = [TABELA_CFOPD, TABELA_DESCRI_REG, TABELA_TAB4_1_1, TABELA_MUNIC]
+
+    # índices criados por create_indexes ao final da carga de cada arquivo
+    INDEXES = [
+        'CREATE INDEX IF NOT EXISTS "o150_reg_prim" ON o150 (cod_part ASC)',
+        'CREATE INDEX IF NOT EXISTS "o200_reg_prim" ON o200 (cod_item ASC)',
+    ]
+
+    # registro -> tabela e colunas, ver ConvLayout
+    LAYOUTS = {
+        '0000': ConvLayout('o000', ['periodo', 'nome', 'cnpj', 'ie', 'cod_mun', 'cod_ver',
+                                    'cod_fin']),
+        '0150': ConvLayout('o150', ['cod_part', 'nome', 'cod_pais', 'cnpj', 'cpf', 'ie',
+                                    'cod_mun']),
+        # 0200 - Tabela de Identificação do Item (Produtos e Serviços)
+        '0200': ConvLayout('o200', ['cod_item', 'descr_item', 'cod_barra', 'unid_inv',
+                                    'cod_ncm', ('aliq_icms', decimalBR), 'cest']),
+        # 0205 - Alteração do Item
+        '0205': ConvLayout('o205', ['cod_item', 'cod_ant_item', 'descr_ant_item']),
+        # 1050 – Registro de Saldos
+        '1050': ConvLayout('l050', ['cod_item', ('qtd_ini', decimalBR),
+                                    ('icms_tot_ini', decimalBR), ('qtd_fim', decimalBR),
+                                    ('icms_tot_fim', decimalBR)]),
+        # 1100 – Documento Fiscal Eletrônico para fins de ressarcimento
+        '1100': ConvLayout('l100', ['chv_doc', ('data', dtaSPED), 'num_item', 'ind_oper',
+                                    'cod_item', 'cfop', ('qtd', decimalBR),
+                                    ('icms_tot', decimalBR), ('vl_confr', decimalBR),
+                                    'cod_legal']),
+        # 1200 – Documento Fiscal Não-Eletrônico para fins de ressarcimento
+        '1200': ConvLayout('l200', ['cod_part', 'cod_mod', 'ecf_fab', 'ser', 'num_doc',
+                                    'num_item', 'ind_oper', ('data', dtaSPED), 'cfop',
+                                    'cod_item', ('qtd', decimalBR), ('icms_tot', decimalBR),
+                                    ('vl_confr', decimalBR), 'cod_legal']),
+        # 5000 – Processamento Portaria CAT 42/2018 - Auxiliar - Arquivo ACOLHIDO
+        '5000': ConvLayout('s000', ['todo1', 'cod_item']),
+        # EITA.... 5001 e 5010 estão com real em formato inglês .... 99,999.99
+        '5001': ConvLayout('s001', ['todo1', 'todo2', ('data', dtaSPED), 'chv_doc', 'ecf_fab',
+                                    'cod_mod', 'ser', 'num_doc', 'cod_part',
+                                    'cfop', 'num_item', 'cod_item', 'ind_oper',
+                                    'cod_legal', 'num_linha', 'e_s', 'sinal',
+                                    ('qtd_ent', decimalUS), ('icms_tot_ent', decimalUS),
+                                    ('qtd_sai', decimalUS), ('icms_uni_sai', decimalUS),
+                                    ('icms_cod_legal1', decimalUS),
+                                    ('icms_cod_legal2', decimalUS),
+                                    ('icms_cod_legal3', decimalUS),
+                                    ('icms_cod_legal4', decimalUS),
+                                    ('icms_sai_comercial', decimalUS),
+                                    ('icms_confr_sai_consumidor', decimalUS),
+                                    ('icms_confr_sai_demais_hip', decimalUS),
+                                    ('qtd_saldo', decimalUS), ('icms_saldo', decimalUS),
+                                    ('val_ressarc', decimalUS), ('val_complem', decimalUS),
+                                    ('cred_op_proprias', decimalUS)]),
+        # 5010 – Processamento Portaria CAT 42/2018 - Totais - Arquivo ACOLHIDO
+        '5010': ConvLayout('s010', ['todo1', 'todo2', 'cod_legal',
+                                    ('icms_cod_legal1', decimalUS),
+                                    ('icms_cod_legal2', decimalUS),
+                                    ('icms_cod_legal3', decimalUS),
+                                    ('icms_cod_legal4', decimalUS),
+                                    ('icms_sai_comercial', decimalUS),
+                                    ('icms_confr_sai_consumidor', decimalUS),
+                                    ('icms_confr_sai_demais_hip', decimalUS),
+                                    ('val_ressarc', decimalUS), ('val_complem', decimalUS),
+                                    ('cred_op_proprias', decimalUS)]),
+        # 5100 – Processamento Portaria CAT 42/2018 - Log - Arquivo ACOLHIDO
+        '5100': ConvLayout('s100', ['COD_REG', 'DATA_HORA', 'TIPO_MSG', 'NUM_MSG',
+                                    'VALOR_CAMPO', 'DESCRICAO', 'todo', 'LINHA', 'TIPO_REG']),
+    }
+
+    def db3_create(self):
+        self.db.exec("""
 CREATE TABLE o000 (
   ord int primary key,
   periodo text,
@@ -80,7 +89,7 @@ CREATE TABLE o000 (
   cod_fin int)
 """)
 
-            self.db.exec("""
+        self.db.exec("""
 CREATE TABLE o150 (
   ord int primary key,
   cod_part text,
@@ -91,52 +100,50 @@ CREATE TABLE o150 (
   ie text,
   cod_mun text)
 """)
-            self.db.exec('CREATE INDEX "o150_reg_prim" ON o150 (cod_part ASC)')
-            # 0200 - Tabela de Identificação do Item (Produtos e Serviços)
-            self.db.exec("""
+        # 0200 - Tabela de Identificação do Item (Produtos e Serviços)
+        self.db.exec("""
 CREATE TABLE o200 (
   ord int primary key,
   cod_item text, descr_item text, cod_barra text, unid_inv text,
   cod_ncm text, aliq_icms real, cest int)
 """)
-            self.db.exec('CREATE INDEX "o200_reg_prim" ON o200 (cod_item ASC)')
-            # 0205 - Alteração do Item
-            self.db.exec("""
+        # 0205 - Alteração do Item
+        self.db.exec("""
 CREATE TABLE o205 (
   ord int primary key,
   cod_item text, cod_ant_item, descr_ant_item)
 """)
-            # REGISTRO 1050 – REGISTRO DE SALDOS
-            self.db.exec("""
+        # REGISTRO 1050 – REGISTRO DE SALDOS
+        self.db.exec("""
 CREATE TABLE l050 (
   ord int primary key,
   cod_item text, qtd_ini real, icms_tot_ini real, qtd_fim real, icms_tot_fim reak)
 """)
-            # REGISTRO 1100 – REGISTRO DE DOCUMENTO FISCAL ELETRÔNICO
-            # PARA FINS DE RESSARCIMENTO DE SUBSTITUIÇÂO TRIBUTÁRIA OU ANTECIPAÇÃO.
-            self.db.exec("""
+        # REGISTRO 1100 – REGISTRO DE DOCUMENTO FISCAL ELETRÔNICO
+        # PARA FINS DE RESSARCIMENTO DE SUBSTITUIÇÂO TRIBUTÁRIA OU ANTECIPAÇÃO.
+        self.db.exec("""
 CREATE TABLE l100 (
   ord int primary key,
   chv_doc text, data text, num_item int, ind_oper int, cod_item text,
   cfop int, qtd real, icms_tot real, vl_confr real, cod_legal int)
 """)
-            # REGISTRO 1200 – REGISTRO DE DOCUMENTO FISCAL NÃO-ELETRÔNICO
-            # PARA FINS DE RESSARCIMENTO DE SUBSTITUIÇÂO TRIBUTÁRIA – SP
-            self.db.exec("""
+        # REGISTRO 1200 – REGISTRO DE DOCUMENTO FISCAL NÃO-ELETRÔNICO
+        # PARA FINS DE RESSARCIMENTO DE SUBSTITUIÇÂO TRIBUTÁRIA – SP
+        self.db.exec("""
 CREATE TABLE l200 (
   ord int primary key,
   cod_part text, cod_mod text, ecf_fab text, ser text, num_doc int, num_item int, ind_oper int,
   data text, cfop int, cod_item text, qtd real, icms_tot real, vl_confr real, cod_legal int)
 """)
-            # REGISTRO 5000 – Processamento Portaria CAT 42/2018
-            # - Auxiliar - Arquivo ACOLHIDO
-            self.db.exec("""
+        # REGISTRO 5000 – Processamento Portaria CAT 42/2018
+        # - Auxiliar - Arquivo ACOLHIDO
+        self.db.exec("""
 CREATE TABLE s000 (
   ord int primary key,
   todo1, cod_item text)
 """)
-            # REGISTRO 5001 – Processamento Portaria CAT 42/2018 - Arquivo ACOLHIDO
-            self.db.exec("""
+        # REGISTRO 5001 – Processamento Portaria CAT 42/2018 - Arquivo ACOLHIDO
+        self.db.exec("""
 CREATE TABLE s001 (
   ord int primary key,
   todo1, todo2, data text, chv_doc text, ecf_fab text,
@@ -151,8 +158,8 @@ CREATE TABLE s001 (
   qtd_saldo real, icms_saldo real,
   val_ressarc real, val_complem real, cred_op_proprias real)
 """)
-            # REGISTRO 5010 – Processamento Portaria CAT 42/2018 - Totais - Arquivo ACOLHIDO
-            self.db.exec("""
+        # REGISTRO 5010 – Processamento Portaria CAT 42/2018 - Totais - Arquivo ACOLHIDO
+        self.db.exec("""
 CREATE TABLE s010 (
   ord int primary key,
   todo1, todo2, cod_legal int,
@@ -160,163 +167,19 @@ CREATE TABLE s010 (
   icms_sai_comercial real, icms_confr_sai_consumidor real, icms_confr_sai_demais_hip real,
   val_ressarc real, val_complem real, cred_op_proprias real)
 """)
-            # REGISTRO 5100 – Processamento Portaria CAT 42/2018 - Log - Arquivo ACOLHIDO
-            self.db.exec("""
+        # REGISTRO 5100 – Processamento Portaria CAT 42/2018 - Log - Arquivo ACOLHIDO
+        self.db.exec("""
 CREATE TABLE s100 (
   ord int primary key,
   COD_REG, DATA_HORA, TIPO_MSG, NUM_MSG CAMPO, VALOR_CAMPO, DESCRICAO, todo, LINHA, TIPO_REG)
 """)
 
-    def cat42Read(self):
-        self.ilidos = 1
-        self.ianomes = 601
-        self.a_conta_reg = dict()
-        self.aaaamm = ''
-        # txt_encoding = 'ANSI'
-        self.cat42difis = False
-        start_time = time.time()  # Armazena o tempo inicial
-        # self.db.execute('BEGIN;')
-        try:
-            with open(self.filename, 'r', encoding=self.encoding) as file:
-                while True:
-                    line = file.readline()
-                    if not line:
-                        break  # Fim do arquivo
-                    self.cat42ReadLine(line)  # noqa: F401
-                    if self.ilidos % 50000 == 0:
-                        print("Tempo decorrido:", time.time() - start_time, "segundos")
-                        # self.db.execute('COMMIT;')
-                        # self.db.execute('BEGIN;')
-                    self.ilidos += 1
-        except Exception as e:
-            print(f"Erro ao abrir ou ler o arquivo {self.filename}", e)
-        self.db.conn.commit()
-        for indice, valor in self.a_conta_reg.items():
-            sql = f"INSERT INTO conta_reg VALUES (?, ?, ?, ?)"
-            fields = [self.filename, self.aaaamm, indice, valor]
-            self.db.cursor.execute(sql, fields)
-        self.db.conn.commit()
-
-        print(f"Parte 1 - Leitura finalizada: {self.ilidos} linhas do arquivo",
-              f"{self.filename}")
-        print("Tempo decorrido:", time.time() - start_time, "segundos\n")
-
-    def cat42ReadLine(self, linha):
-        if linha[:22] == '|0000|RessarcimentoSt|':
-            self.cat42difis = True
-        if not self.cat42difis:
-            linha = '|' + linha
-        campos = linha.strip().split('|')
-        if len(campos) <= 1:
-            return
-        if campos[1] == '0000':
-            if self.cat42difis:
-                self.ianomes = int(campos[3][-2:] + campos[3][:2])
-            else:
-                self.ianomes = int(campos[2][-2:] + campos[2][:2])
-        iord = self.ilidos + self.ianomes * 10000000
-
-        if len(campos[1]) == 4:
-            self.a_conta_reg[campos[1]] = self.a_conta_reg.get(campos[1], 0) + 1
-
-        # campos = [self.db.execute("SELECT quote(?)", (valor,)).fetchone()[0] for valor in campos]
-
-        if campos[1] == '0000':
-            self.aaaamm = campos[2][-4:] + campos[2][:2]
-            fields = [iord, campos[2], campos[3], campos[4],
-                      campos[5], campos[6], campos[7], campos[8]]
-            self.db.insert('o000', fields)
-
-        if campos[1] == '0150':
-            fields = [iord, campos[2], campos[3], campos[4],
-                      campos[5], campos[6], campos[7], campos[8]]
-            self.db.insert('o150', fields)
-
-        if campos[1] == '0200':
-            fields = [iord, campos[2], campos[3], campos[4],
-                      campos[5], campos[6],
-                      campos[7].replace('.', '').replace(',', '.'), campos[8]]
-            self.db.insert('o200', fields)
-
-        if campos[1] == '0205':
-            fields = [iord, campos[2], campos[3], campos[4]]
-            self.db.insert('o205', fields)
-
-        if campos[1] == '1050':
-            fields = [iord, campos[2],
-                      campos[3].replace('.', '').replace(',', '.'),
-                      campos[4].replace('.', '').replace(',', '.'),
-                      campos[5].replace('.', '').replace(',', '.'),
-                      campos[6].replace('.', '').replace(',', '.')]
-            self.db.insert('l050', fields)
-
-        if campos[1] == '1100':
-            fields = [iord, campos[2], self.db.dtaSPED(campos[3]),
-                      campos[4], campos[5], campos[6], campos[7],
-                      campos[8].replace('.', '').replace(',', '.'),
-                      campos[9].replace('.', '').replace(',', '.'),
-                      campos[10].replace('.', '').replace(',', '.'),
-                      campos[11]]
-            self.db.insert('l100', fields)
-
-        if campos[1] == '1200':
-            fields = [iord, campos[2], campos[3], campos[4],
-                      campos[5], campos[6], campos[7], campos[8],
-                      self.db.dtaSPED(campos[9]),
-                      campos[10], campos[11],
-                      campos[12].replace('.', '').replace(',', '.'),
-                      campos[13].replace('.', '').replace(',', '.'),
-                      campos[14].replace('.', '').replace(',', '.'),
-                      campos[15]]
-            self.db.insert('l200', fields)
-
-        if campos[1] == '5000':
-            fields = [iord, campos[2], campos[3]]
-            self.db.insert('s000', fields)
-
-        # EITA.... 5001 e 5010 estão com real em formato inglês .... 99,999.99
-        if campos[1] == '5001':
-            fields = [iord, campos[2], campos[3], self.db.dtaSPED(campos[4]),
-                      campos[5], campos[6], campos[7], campos[8],
-                      campos[9], campos[10], campos[11], campos[12],
-                      campos[13], campos[14], campos[15], campos[16],
-                      campos[17], campos[18],
-                      campos[19].replace(',', ''),
-                      campos[20].replace(',', ''),
-                      campos[21].replace(',', ''),
-                      campos[22].replace(',', ''),
-                      campos[23].replace(',', ''),
-                      campos[24].replace(',', ''),
-                      campos[25].replace(',', ''),
-                      campos[26].replace(',', ''),
-                      campos[27].replace(',', ''),
-                      campos[28].replace(',', ''),
-                      campos[29].replace(',', ''),
-                      campos[30].replace(',', ''),
-                      campos[31].replace(',', ''),
-                      campos[32].replace(',', ''),
-                      campos[33].replace(',', ''),
-                      campos[34].replace(',', ''),
-                      ]
-            self.db.insert('s001', fields)
-
-        if campos[1] == '5010':
-            fields = [iord, campos[2], campos[3], campos[4],
-                      campos[5].replace(',', ''),
-                      campos[6].replace(',', ''),
-                      campos[7].replace(',', ''),
-                      campos[8].replace(',', ''),
-                      campos[9].replace(',', ''),
-                      campos[10].replace(',', ''),
-                      campos[11].replace(',', ''),
-                      campos[12].replace(',', ''),
-                      campos[13].replace(',', ''),
-                      campos[14].replace(',', ''),
-                      ]
-            self.db.insert('s010', fields)
+    @staticmethod
+    def periodo(campos):
+        """(ianomes, aaaamm) do registro 0000 já separado em campos
 
-        if campos[1] == '5100':
-            fields = [iord, campos[2], campos[3], campos[4],
-                      campos[5], campos[6], campos[7], campos[8],
-                      campos[9], campos[10]]
-            self.db.insert('s100', fields)
+        ianomes = AAMM compõe o ord (ianomes * ORD_PERIODO + linha).
+        Na variante |0000|RessarcimentoSt|MMAAAA|... o período vem um campo depois
+        """
+        mmaaaa = campos[3] if campos[2] == 'RessarcimentoSt' else campos[2]
+        return int(mmaaaa[-2:] + mmaaaa[:2]), mmaaaa[-4:] + mmaaaa[:2]
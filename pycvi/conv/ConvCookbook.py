@@ -4,27 +4,120 @@ import chardet
 
 
 class ConvCookbook:
+    # a codificação é detectada numa amostra: o início do arquivo
+    #   mais alguns blocos espaçados ao longo dele
+    SAMPLE_SIZE = 256 * 1024
+    BLOCK_SIZE = 64 * 1024
+    BLOCKS = 4
+    # cache das codificações já detectadas, chave (caminho, tamanho, mtime)
+    _encodings = dict()
 
     @staticmethod
     def fileConv(entry):
         try:
+            stat = os.stat(entry)
+            key = (os.path.abspath(entry), stat.st_size, stat.st_mtime_ns)
             with open(entry, 'rb') as f:
-                result = chardet.detect(f.read())
+                prefix = f.read(ConvCookbook.SAMPLE_SIZE)
+                encoding = ConvCookbook._encodings.get(key)
+                if encoding is None:
+                    blocks = ConvCookbook.readBlocks(f, stat.st_size)
+                    encoding = ConvCookbook.detectEncoding(prefix, blocks)
+                    ConvCookbook._encodings[key] = encoding
             print(f"Processando arquivo {entry}, "
-                  + f"codificação detectada como tipo {result['encoding']}")
-            with codecs.open(entry, 'r', encoding=result['encoding']) as handle:
-                linha1 = handle.readline().strip()
-                linha2 = handle.readline().strip()
-                fileDetected = ConvCookbook.fileDetect(entry, linha1, linha2)
-                if fileDetected == "unknown":
-                    print(f"Mas não foi reconhecido como algum tipo de arquivo específico\n")
-                else:
-                    print(f"detectado como " + ConvCookbook.fileDescription(fileDetected) + "\n")
-                return fileDetected, result['encoding']
+                  + f"codificação detectada como tipo {encoding}")
+            return ConvCookbook.fileSniff(entry, prefix, encoding), encoding
         except Exception as e:
             print(f"Erro... Não foi possivel a leitura do arquivo {entry}\n", e)
             return False, False
 
+    @staticmethod
+    def fileConvZip(zip_ref, info):
+        """Igual a fileConv, para um membro de um .zip
+
+        Lê apenas o início do membro, sem extrair o arquivo. Os blocos espaçados ficam de fora:
+        posicionar num membro compactado obriga a descompactar tudo o que vem antes
+        """
+        try:
+            key = (os.path.abspath(zip_ref.filename), info.filename, info.file_size, info.CRC)
+            with zip_ref.open(info) as f:
+                prefix = f.read(ConvCookbook.SAMPLE_SIZE)
+            encoding = ConvCookbook._encodings.get(key)
+            if encoding is None:
+                encoding = ConvCookbook.detectEncoding(prefix)
+                ConvCookbook._encodings[key] = encoding
+            print(f"Processando arquivo {info.filename} do zip, "
+                  + f"codificação detectada como tipo {encoding}")
+            return ConvCookbook.fileSniff(info.filename, prefix, encoding), encoding
+        except Exception as e:
+            print(f"Erro... Não foi possivel a leitura do arquivo {info.filename}\n", e)
+            return False, False
+
+    @staticmethod
+    def fileSniff(entry, prefix, encoding):
+        """Reconhece o tipo do arquivo pelas duas primeiras linhas de prefix (bytes)"""
+        linhas = prefix.decode(encoding, errors='replace').splitlines()[:2]
+        linha1 = linhas[0].strip() if len(linhas) > 0 else ''
+        linha2 = linhas[1].strip() if len(linhas) > 1 else ''
+        fileDetected = ConvCookbook.fileDetect(entry, linha1, linha2)
+        if fileDetected == "unknown":
+            print(f"Mas não foi reconhecido como algum tipo de arquivo específico\n")
+        else:
+            print(f"detectado como " + ConvCookbook.fileDescription(fileDetected) + "\n")
+        return fileDetected
+
+    @staticmethod
+    def readBlocks(f, size):
+        """Lê BLOCKS blocos de BLOCK_SIZE bytes igualmente espaçados depois do prefixo"""
+        resto = size - ConvCookbook.SAMPLE_SIZE
+        if resto <= 0:
+            return []
+        step = resto // ConvCookbook.BLOCKS
+        blocks = []
+        for i in range(1, ConvCookbook.BLOCKS + 1):
+            f.seek(ConvCookbook.SAMPLE_SIZE + i * step - min(step, ConvCookbook.BLOCK_SIZE))
+            blocks.append(f.read(ConvCookbook.BLOCK_SIZE))
+        return blocks
+
+    @staticmethod
+    def detectEncoding(prefix, blocks=()):
+        """Detecta a codificação a partir do início do arquivo (prefix) e de blocks
+
+        Só chama o chardet (lento) se não houver BOM e a amostra não for UTF-8 válido.
+        Se a amostra for só ASCII, não dá pra saber o que vem depois. Como o Guia Prático
+        da EFD manda usar ISO-8859-1, fica latin-1, que aliás nunca dá erro na leitura.
+        Idem se o chardet não tiver confiança no resultado
+        """
+        if prefix.startswith(codecs.BOM_UTF8):
+            return 'utf-8-sig'
+        if prefix.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+            return 'utf-16'
+        if prefix.isascii() and all(block.isascii() for block in blocks):
+            return 'latin-1'
+        if ConvCookbook.isUtf8(prefix) and all(ConvCookbook.isUtf8(block, True)
+                                               for block in blocks):
+            return 'utf-8'
+        result = chardet.detect(prefix + b''.join(blocks))
+        # com pouca confiança o chardet chuta até Big5 para um arquivo SPED em latin-1
+        if result['encoding'] in (None, 'ascii') or result['confidence'] < 0.5:
+            return 'latin-1'
+        return result['encoding']
+
+    @staticmethod
+    def isUtf8(block, middle=False):
+        """Verifica se block é UTF-8 válido, tolerando um caractere cortado nas pontas"""
+        if middle:
+            # um bloco do meio do arquivo pode começar no meio de um caractere
+            inicio = 0
+            while inicio < 3 and inicio < len(block) and 0x80 <= block[inicio] <= 0xBF:
+                inicio += 1
+            block = block[inicio:]
+        try:
+            codecs.getincrementaldecoder('utf-8')().decode(block, final=False)
+            return True
+        except UnicodeDecodeError:
+            return False
+
     @staticmethod
     def fileDetect(entry, linha1, linha2):
         fileDetected = "unknown"
@@ -34,7 +127,8 @@ class ConvCookbook:
             fileDetected = "Safic"
         if linha1.startswith('|0000|LECD|'):
             fileDetected = "SpedCont"
-        if linha1.startswith('|0000|') and not linha1.startswith('|0000|RessarcimentoSt|'):
+        if linha1.startswith('|0000|') and not linha1.startswith('|0000|RessarcimentoSt|')\
+           and not linha1.startswith('|0000|LECD|'):
             fileDetected = "SpedEfd"
         if linha1.startswith('01') and linha2.startswith('02'):
             fileDetected = "Cat17"
@@ -1,309 +1,170 @@
-import os
-import time
-
-from pycvi.conv.ConvHelpers import ConvHelpers
-from pycvi.Config import Config
-config = Config()
-
-
-class ConvEfd:
-    def __init__(self, window, filename, result_dir):
-        self.window = window
-        self.filename = filename
-        self.db = ConvHelpers(result_dir, 'efd.db3')
-        window.refresh()
-        self.db3_open()
-        window.refresh()
-        self.efdRead()
-
-    def db3_open(self):
-        db_path = os.path.join(self.db.dir, self.db.name)
-        if os.path.exists(db_path):
-            try:
-                self.db.connect()
-            except Exception as e:
-                print(f"Falha ao abrir Banco de Dados {db_path}: {e}")
-                return
-        else:
-            try:
-                self.db.connect()
-            except Exception as e:
-                print(f"Falha ao criar Banco de Dados {db_path}: {e}")
-                return
-
-            self.db.exec("""
-CREATE TABLE cfopd (cfop int, dfi text, st text, classe text,
-    g1 text, c3 text, g2 text, g3 text, descri_simplif text, descri text, pod_creditar text);
-""")
-            self.db.exec("""
-CREATE INDEX cfopd_cfop ON cfopd (cfop ASC);
-""")
-            self.db.insert_into_table_from_txt(
-                os.path.join(config.CVI_RES, 'tabelas', 'cfopd.txt'),
-                'cfopd')
-            self.db.exec('CREATE TABLE conta_reg (arq, aaaamm, reg, qtd int)')
-            self.db.exec("""
-CREATE TABLE descri_reg (reg text, proc text, nivel int, descri text, obrig text, ocorr text);
-""")
-            self.db.exec("""
-CREATE INDEX descri_reg_reg ON descri_reg (reg ASC);
-""")
-            self.db.insert_into_table_from_txt(
-                os.path.join(config.CVI_RES, 'tabelas', 'CAT42_Reg_Descri.txt'),
-                'descri_reg')
-            self.db.exec("""
-CREATE TABLE tab4_1_1 (cod text, descri text, mod text);
-""")
-            self.db.exec("""
-CREATE INDEX tab4_1_1_cod ON tab4_1_1 (cod ASC);
-""")
-            self.db.insert_into_table_from_txt(
-                os.path.join(config.CVI_RES, 'tabelas', 'Tab4.1.1.txt'),
-                'tab4_1_1')
-            self.db.exec("""
-CREATE TABLE tab_munic (cod int primary key, uf text, munic text);
-""")
-            self.db.insert_into_table_from_txt(
-                os.path.join(config.CVI_RES, 'tabelas', 'Tabela_Municipios.txt'),
-                'tab_munic')
-
-            self.db.exec("""
-CREATE TABLE o000 (
-  ord int primary key,
-  periodo text,
-  nome text,
-  cnpj int,
-  ie text,
-  cod_mun text,
-  cod_ver int,
-  cod_fin int)
-""")
-
-            self.db.exec("""
-CREATE TABLE o150 (
-  ord int primary key,
-  cod_part text,
-  nome text,
-  cod_pais int,
-  cnpj int,
-  cpf int,
-  ie text,
-  cod_mun text)
-""")
-            self.db.exec('CREATE INDEX "o150_reg_prim" ON o150 (cod_part ASC)')
-            # 0200 - Tabela de Identificação do Item (Produtos e Serviços)
-            self.db.exec("""
-CREATE TABLE o200 (
-  ord int primary key,
-  cod_item text, descr_item text, cod_barra text, unid_inv text,
-  cod_ncm text, aliq_icms real, cest int)
-""")
-            self.db.exec('CREATE INDEX "o200_reg_prim" ON o200 (cod_item ASC)')
-            # 0205 - Alteração do Item
-            self.db.exec("""
-CREATE TABLE o205 (
-  ord int primary key,
-  cod_item text, cod_ant_item, descr_ant_item)
-""")
-            # REGISTRO 1050 – REGISTRO DE SALDOS
-            self.db.exec("""
-CREATE TABLE l050 (
-  ord int primary key,
-  cod_item text, qtd_ini real, icms_tot_ini real, qtd_fim real, icms_tot_fim reak)
-""")
-            # REGISTRO 1100 – REGISTRO DE DOCUMENTO FISCAL ELETRÔNICO
-            # PARA FINS DE RESSARCIMENTO DE SUBSTITUIÇÂO TRIBUTÁRIA OU ANTECIPAÇÃO.
-            self.db.exec("""
-CREATE TABLE l100 (
-  ord int primary key,
-  chv_doc text, data text, num_item int, ind_oper int, cod_item text,
-  cfop int, qtd real, icms_tot real, vl_confr real, cod_legal int)
-""")
-            # REGISTRO 1200 – REGISTRO DE DOCUMENTO FISCAL NÃO-ELETRÔNICO
-            # PARA FINS DE RESSARCIMENTO DE SUBSTITUIÇÂO TRIBUTÁRIA – SP
-            self.db.exec("""
-CREATE TABLE l200 (
-  ord int primary key,
-  cod_part text, cod_mod text, ecf_fab text, ser text, num_doc int, num_item int, ind_oper int,
-  data text, cfop int, cod_item text, qtd real, icms_tot real, vl_confr real, cod_legal int)
-""")
-            # REGISTRO 5000 – Processamento Portaria CAT 42/2018
-            # - Auxiliar - Arquivo ACOLHIDO
-            self.db.exec("""
-CREATE TABLE s000 (
-  ord int primary key,
-  todo1, cod_item text)
-""")
-            # REGISTRO 5001 – Processamento Portaria CAT 42/2018 - Arquivo ACOLHIDO
-            self.db.exec("""
-CREATE TABLE s001 (
-  ord int primary key,
-  todo1, todo2, date text, chv_doc text, ecf_fab text,
-  cod_mod text, ser text, num_doc int, cod_part text,
-  cfop int, num_item int, cod_item text, ind_oper int,
-  cod_legal int, ord2 int, e_s, todo3,
-  qtd_ent real, icms_tot_ent real,
-  qtd_sai real, icms_uni_sai real,
-  tot_cod_legal1 real, tot_cod_legal2 real, tot_cod_legal3 real,
-  tot_cod_legal4 real, tot_com_sub real,
-  conf_20 real, conf_21 real,
-  qtd_saldo real, icms_saldo real,
-  val_ressarc real, val_complem real, cred_op_proprias real)
-""")
-            # REGISTRO 5010 – Processamento Portaria CAT 42/2018 - Totais - Arquivo ACOLHIDO
-            self.db.exec("""
-CREATE TABLE s010 (
-  ord int primary key,
-  todo1, todo2, todo3, todo4, todo5, todo6, todo7, todo8, todo9, todo10, todo11, todo12, todo13)
-""")
-            # REGISTRO 5100 – Processamento Portaria CAT 42/2018 - Log - Arquivo ACOLHIDO
-            self.db.exec("""
-CREATE TABLE s100 (
-  ord int primary key,
-  todo1, todo2, todo3, todo4, todo5, todo6, todo7, todo8)
-""")
-
-    def cat42Read(self):
-        self.ilidos = 1
-        self.ianomes = 601
-        self.a_conta_reg = dict()
-        self.aaaamm = ''
-        # txt_encoding = 'ANSI'
-        self.cat42difis = False
-        start_time = time.time()  # Armazena o tempo inicial
-        # self.db.execute('BEGIN;')
-        try:
-            with open(self.filename, 'r', encoding='utf-8') as file:
-                while True:
-                    line = file.readline()
-                    if not line:
-                        break  # Fim do arquivo
-                    self.cat42ReadLine(line)  # noqa: F401
-                    if self.ilidos % 50000 == 0:
-                        print("Tempo decorrido:", time.time() - start_time, "segundos")
-                        # self.db.execute('COMMIT;')
-                        # self.db.execute('BEGIN;')
-                    self.ilidos += 1
-        except Exception as e:
-            print(f"Erro ao abrir ou ler o arquivo {self.filename}", e)
-        self.db.conn.commit()
-        for indice, valor in self.a_conta_reg.items():
-            sql = f"INSERT INTO conta_reg VALUES (?, ?, ?, ?)"
-            fields = [self.filename, self.aaaamm, indice, valor]
-            self.db.cursor.execute(sql, fields)
-        self.db.conn.commit()
-
-        print(f"Parte 1 - Leitura finalizada: {self.ilidos} linhas do arquivo",
-              f"{self.filename}")
-        print("Tempo decorrido:", time.time() - start_time, "segundos\n")
-
-    def cat42ReadLine(self, linha):
-        if linha[:22] == '|0000|RessarcimentoSt|':
-            self.cat42difis = True
-        if not self.cat42difis:
-            linha = '|' + linha
-        campos = linha.strip().split('|')
-        if len(campos) <= 1:
-            return
-        if campos[1] == '0000':
-            if self.cat42difis:
-                self.ianomes = int(campos[3][-2:] + campos[3][:2])
-            else:
-                self.ianomes = int(campos[2][-2:] + campos[2][:2])
-        iord = self.ilidos + self.ianomes * 10000000
-
-        if len(campos[1]) == 4:
-            self.a_conta_reg[campos[1]] = self.a_conta_reg.get(campos[1], 0) + 1
-
-        # campos = [self.db.execute("SELECT quote(?)", (valor,)).fetchone()[0] for valor in campos]
-
-        if campos[1] == '0000':
-            self.aaaamm = campos[2][-4:] + campos[2][:2]
-            fields = [iord, campos[2], campos[3], campos[4],
-                      campos[5], campos[6], campos[7], campos[8]]
-            self.db.insert('o000', fields)
-
-        if campos[1] == '0150':
-            fields = [iord, campos[2], campos[3], campos[4],
-                      campos[5], campos[6], campos[7], campos[8]]
-            self.db.insert('o150', fields)
-
-        if campos[1] == '0200':
-            fields = [iord, campos[2], campos[3], campos[4],
-                      campos[5], campos[6],
-                      campos[7].replace('.', '').replace(',', '.'), campos[8]]
-            self.db.insert('o200', fields)
-
-        if campos[1] == '0205':
-            fields = [iord, campos[2], campos[3], campos[4]]
-            self.db.insert('o205', fields)
-
-        if campos[1] == '1050':
-            fields = [iord, campos[2],
-                      campos[3].replace('.', '').replace(',', '.'),
-                      campos[4].replace('.', '').replace(',', '.'),
-                      campos[5].replace('.', '').replace(',', '.'),
-                      campos[6].replace('.', '').replace(',', '.')]
-            self.db.insert('l050', fields)
-
-        if campos[1] == '1100':
-            fields = [iord, campos[2], self.db.dtaSPED(campos[3]),
-                      campos[4], campos[5], campos[6], campos[7],
-                      campos[8].replace('.', '').replace(',', '.'),
-                      campos[9].replace('.', '').replace(',', '.'),
-                      campos[10].replace('.', '').replace(',', '.'),
-                      campos[11]]
-            self.db.insert('l100', fields)
-
-        if campos[1] == '1200':
-            fields = [iord, campos[2], campos[3], campos[4],
-                      campos[5], campos[6], campos[7], campos[8],
-                      self.db.dtaSPED(campos[9]),
-                      campos[10], campos[11],
-                      campos[12].replace('.', '').replace(',', '.'),
-                      campos[13].replace('.', '').replace(',', '.'),
-                      campos[14].replace('.', '').replace(',', '.'),
-                      campos[15]]
-            self.db.insert('l200', fields)
-
-        if campos[1] == '5000':
-            fields = [iord, campos[2], campos[3]]
-            self.db.insert('s000', fields)
-
-        if campos[1] == '5001':
-            fields = [iord, campos[2], campos[3], self.db.dtaSPED(campos[4]),
-                      campos[5], campos[6], campos[7], campos[8],
-                      campos[9], campos[10], campos[11], campos[12],
-                      campos[13], campos[14], campos[15], campos[16],
-                      campos[17], campos[18],
-                      campos[19].replace('.', '').replace(',', '.'),
-                      campos[20].replace('.', '').replace(',', '.'),
-                      campos[21].replace('.', '').replace(',', '.'),
-                      campos[22].replace('.', '').replace(',', '.'),
-                      campos[23].replace('.', '').replace(',', '.'),
-                      campos[24].replace('.', '').replace(',', '.'),
-                      campos[25].replace('.', '').replace(',', '.'),
-                      campos[26].replace('.', '').replace(',', '.'),
-                      campos[27].replace('.', '').replace(',', '.'),
-                      campos[28].replace('.', '').replace(',', '.'),
-                      campos[29].replace('.', '').replace(',', '.'),
-                      campos[30].replace('.', '').replace(',', '.'),
-                      campos[31].replace('.', '').replace(',', '.'),
-                      campos[32].replace('.', '').replace(',', '.'),
-                      campos[33].replace('.', '').replace(',', '.'),
-                      campos[34].replace('.', '').replace(',', '.'),
-                      ]
-            self.db.insert('s001', fields)
-
-        if campos[1] == '5010':
-            fields = [iord, campos[2], campos[3], campos[4],
-                      campos[5], campos[6], campos[7], campos[8],
-                      campos[9], campos[10], campos[11], campos[12],
-                      campos[13], campos[14]]
-            self.db.insert('s010', fields)
-
-        if campos[1] == '5100':
-            fields = [iord, campos[2], campos[3], campos[4],
-                      campos[5], campos[6], campos[7], campos[8],
-                      campos[9]]
-            self.db.insert('s100', fields)
+from pycvi.conv.ConvSped import ConvSped, TABELA_CFOPD, TABELA_TAB4_1_1, TABELA_MUNIC
+from pycvi.conv.ConvLayout import ConvLayout, decimalBR, dtaSPED
+
+
+class ConvEfd(ConvSped):
+    """Sped Fiscal - EFD ICMS/IPI, leiaute do Guia Prático da EFD ICMS/IPI
+
+    Registros filhos guardam o ord do registro pai (ex. c170.ord_c100 = c100.ord), que faz
+    o papel dos idEfdC100, idEfdE110... das tabelas do Safic usadas em _21_action
+    """
+    DB3_NAME = 'efd.db3'
+    # uma EFD pode passar de 10 milhões de linhas: reserva 1 bilhão de linhas por período
+    ORD_PERIODO = 1000000000
+    TABELAS = [TABELA_CFOPD, TABELA_TAB4_1_1, TABELA_MUNIC]
+
+    # registro -> tabela e colunas, ver ConvLayout
+    LAYOUTS = {
+        # BLOCO 0 - Abertura, Identificação e Referências
+        '0000': ConvLayout('o000', ['cod_ver', 'cod_fin', ('dt_ini', dtaSPED),
+                                    ('dt_fin', dtaSPED), 'nome', 'cnpj', 'cpf', 'uf', 'ie',
+                                    'cod_mun', 'im', 'suframa', 'ind_perfil', 'ind_ativ']),
+        '0150': ConvLayout('o150', ['cod_part', 'nome', 'cod_pais', 'cnpj', 'cpf', 'ie',
+                                    'cod_mun', 'suframa', 'end', 'num', 'compl', 'bairro']),
+        '0190': ConvLayout('o190', ['unid', 'descr']),
+        '0200': ConvLayout('o200', ['cod_item', 'descr_item', 'cod_barra', 'cod_ant_item',
+                                    'unid_inv', 'tipo_item', 'cod_ncm', 'ex_ipi', 'cod_gen',
+                                    'cod_lst', ('aliq_icms', decimalBR), 'cest']),
+        '0220': ConvLayout('o220', ['unid_conv', ('fat_conv', decimalBR), 'cod_barra'],
+                           pai='o200'),
+        # BLOCO C - Documentos Fiscais I - Mercadorias (ICMS/IPI)
+        'C100': ConvLayout('c100', ['ind_oper', 'ind_emit', 'cod_part', 'cod_mod', 'cod_sit',
+                                    'ser', 'num_doc', 'chv_nfe', ('dt_doc', dtaSPED),
+                                    ('dt_e_s', dtaSPED), ('vl_doc', decimalBR), 'ind_pgto',
+                                    ('vl_desc', decimalBR), ('vl_abat_nt', decimalBR),
+                                    ('vl_merc', decimalBR), 'ind_frt', ('vl_frt', decimalBR),
+                                    ('vl_seg', decimalBR), ('vl_out_da', decimalBR),
+                                    ('vl_bc_icms', decimalBR), ('vl_icms', decimalBR),
+                                    ('vl_bc_icms_st', decimalBR), ('vl_icms_st', decimalBR),
+                                    ('vl_ipi', decimalBR), ('vl_pis', decimalBR),
+                                    ('vl_cofins', decimalBR), ('vl_pis_st', decimalBR),
+                                    ('vl_cofins_st', decimalBR)]),
+        'C170': ConvLayout('c170', ['num_item', 'cod_item', 'descr_compl', ('qtd', decimalBR),
+                                    'unid', ('vl_item', decimalBR), ('vl_desc', decimalBR),
+                                    'ind_mov', 'cst_icms', 'cfop', 'cod_nat',
+                                    ('vl_bc_icms', decimalBR), ('aliq_icms', decimalBR),
+                                    ('vl_icms', decimalBR), ('vl_bc_icms_st', decimalBR),
+                                    ('aliq_st', decimalBR), ('vl_icms_st', decimalBR),
+                                    'ind_apur', 'cst_ipi', 'cod_enq', ('vl_bc_ipi', decimalBR),
+                                    ('aliq_ipi', decimalBR), ('vl_ipi', decimalBR), 'cst_pis',
+                                    ('vl_bc_pis', decimalBR), ('aliq_pis_perc', decimalBR),
+                                    ('quant_bc_pis', decimalBR), ('aliq_pis_reais', decimalBR),
+                                    ('vl_pis', decimalBR), 'cst_cofins',
+                                    ('vl_bc_cofins', decimalBR), ('aliq_cofins_perc', decimalBR),
+                                    ('quant_bc_cofins', decimalBR),
+                                    ('aliq_cofins_reais', decimalBR), ('vl_cofins', decimalBR),
+                                    'cod_cta', ('vl_abat_nt', decimalBR)],
+                           pai='c100'),
+        'C190': ConvLayout('c190', ['cst_icms', 'cfop', ('aliq_icms', decimalBR),
+                                    ('vl_opr', decimalBR), ('vl_bc_icms', decimalBR),
+                                    ('vl_icms', decimalBR), ('vl_bc_icms_st', decimalBR),
+                                    ('vl_icms_st', decimalBR), ('vl_red_bc', decimalBR),
+                                    ('vl_ipi', decimalBR), 'cod_obs'],
+                           pai='c100'),
+        'C195': ConvLayout('c195', ['cod_obs', 'txt_compl'], pai='c100'),
+        'C197': ConvLayout('c197', ['cod_aj', 'descr_compl_aj', 'cod_item',
+                                    ('vl_bc_icms', decimalBR), ('aliq_icms', decimalBR),
+                                    ('vl_icms', decimalBR), ('vl_outros', decimalBR)],
+                           pai='c195'),
+        # BLOCO D - Documentos Fiscais II - Serviços (ICMS)
+        'D100': ConvLayout('d100', ['ind_oper', 'ind_emit', 'cod_part', 'cod_mod', 'cod_sit',
+                                    'ser', 'sub', 'num_doc', 'chv_cte', ('dt_doc', dtaSPED),
+                                    ('dt_a_p', dtaSPED), 'tp_cte', 'chv_cte_ref',
+                                    ('vl_doc', decimalBR), ('vl_desc', decimalBR), 'ind_frt',
+                                    ('vl_serv', decimalBR), ('vl_bc_icms', decimalBR),
+                                    ('vl_icms', decimalBR), ('vl_nt', decimalBR), 'cod_inf',
+                                    'cod_cta', 'cod_mun_orig', 'cod_mun_dest']),
+        'D190': ConvLayout('d190', ['cst_icms', 'cfop', ('aliq_icms', decimalBR),
+                                    ('vl_opr', decimalBR), ('vl_bc_icms', decimalBR),
+                                    ('vl_icms', decimalBR), ('vl_red_bc', decimalBR),
+                                    'cod_obs'],
+                           pai='d100'),
+        # BLOCO E - Apuração do ICMS e do IPI
+        'E100': ConvLayout('e100', [('dt_ini', dtaSPED), ('dt_fin', dtaSPED)]),
+        'E110': ConvLayout('e110', [('vl_tot_debitos', decimalBR), ('vl_aj_debitos', decimalBR),
+                                    ('vl_tot_aj_debitos', decimalBR),
+                                    ('vl_estornos_cred', decimalBR),
+                                    ('vl_tot_creditos', decimalBR),
+                                    ('vl_aj_creditos', decimalBR),
+                                    ('vl_tot_aj_creditos', decimalBR),
+                                    ('vl_estornos_deb', decimalBR),
+                                    ('vl_sld_credor_ant', decimalBR),
+                                    ('vl_sld_apurado', decimalBR), ('vl_tot_ded', decimalBR),
+                                    ('vl_icms_recolher', decimalBR),
+                                    ('vl_sld_credor_transportar', decimalBR),
+                                    ('deb_esp', decimalBR)],
+                           pai='e100'),
+        'E111': ConvLayout('e111', ['cod_aj_apur', 'descr_compl_aj', ('vl_aj_apur', decimalBR)],
+                           pai='e110'),
+        'E112': ConvLayout('e112', ['num_da', 'num_proc', 'ind_proc', 'proc', 'txt_compl'],
+                           pai='e111'),
+        'E113': ConvLayout('e113', ['cod_part', 'cod_mod', 'ser', 'sub', 'num_doc',
+                                    ('dt_doc', dtaSPED), 'cod_item', ('vl_aj_item', decimalBR),
+                                    'chv_doce'],
+                           pai='e111'),
+        'E115': ConvLayout('e115', ['cod_inf_adic', ('vl_inf_adic', decimalBR),
+                                    'descr_compl_aj'],
+                           pai='e110'),
+        'E116': ConvLayout('e116', ['cod_or', ('vl_or', decimalBR), ('dt_vcto', dtaSPED),
+                                    'cod_rec', 'num_proc', 'ind_proc', 'proc', 'txt_compl',
+                                    'mes_ref'],
+                           pai='e110'),
+        # BLOCO G - Controle do Crédito de ICMS do Ativo Permanente - CIAP
+        'G110': ConvLayout('g110', [('dt_ini', dtaSPED), ('dt_fin', dtaSPED),
+                                    ('saldo_in_icms', decimalBR), ('som_parc', decimalBR),
+                                    ('vl_trib_exp', decimalBR), ('vl_total', decimalBR),
+                                    ('ind_per_sai', decimalBR), ('icms_aprop', decimalBR),
+                                    ('som_icms_oc', decimalBR)]),
+        'G125': ConvLayout('g125', ['cod_ind_bem', ('dt_mov', dtaSPED), 'tipo_mov',
+                                    ('vl_imob_icms_op', decimalBR),
+                                    ('vl_imob_icms_st', decimalBR),
+                                    ('vl_imob_icms_frt', decimalBR),
+                                    ('vl_imob_icms_dif', decimalBR), 'num_parc',
+                                    ('vl_parc_pass', decimalBR)],
+                           pai='g110'),
+        'G126': ConvLayout('g126', [('dt_ini', dtaSPED), ('dt_fim', dtaSPED), 'num_parc',
+                                    ('vl_parc_pass', decimalBR), ('vl_trib_oc', decimalBR),
+                                    ('vl_total', decimalBR), ('ind_per_sai', decimalBR),
+                                    ('vl_parc_aprop', decimalBR)],
+                           pai='g125'),
+        'G130': ConvLayout('g130', ['ind_emit', 'cod_part', 'cod_mod', 'serie', 'num_doc',
+                                    'chv_nfe_cte', ('dt_doc', dtaSPED), 'num_da'],
+                           pai='g125'),
+        'G140': ConvLayout('g140', ['num_item', 'cod_item', ('qtde', decimalBR), 'unid',
+                                    ('vl_icms_op_aplicado', decimalBR),
+                                    ('vl_icms_st_aplicado', decimalBR),
+                                    ('vl_icms_frt_aplicado', decimalBR),
+                                    ('vl_icms_dif_aplicado', decimalBR)],
+                           pai='g130'),
+        # BLOCO H - Inventário Físico
+        'H005': ConvLayout('h005', [('dt_inv', dtaSPED), ('vl_inv', decimalBR), 'mot_inv']),
+        'H010': ConvLayout('h010', ['cod_item', 'unid', ('qtd', decimalBR),
+                                    ('vl_unit', decimalBR), ('vl_item', decimalBR), 'ind_prop',
+                                    'cod_part', 'txt_compl', 'cod_cta',
+                                    ('vl_item_ir', decimalBR)],
+                           pai='h005'),
+        'H020': ConvLayout('h020', ['cst_icms', ('bc_icms', decimalBR), ('vl_icms', decimalBR)],
+                           pai='h010'),
+    }
+
+    # índices criados por create_indexes ao final da carga de cada arquivo:
+    #   chaves usadas nos joins e o ord do pai de cada registro filho
+    INDEXES = [
+        'CREATE INDEX IF NOT EXISTS "o150_cod_part" ON o150 (cod_part ASC)',
+        'CREATE INDEX IF NOT EXISTS "o190_unid" ON o190 (unid ASC)',
+        'CREATE INDEX IF NOT EXISTS "o200_cod_item" ON o200 (cod_item ASC)',
+        'CREATE INDEX IF NOT EXISTS "c100_chv_nfe" ON c100 (chv_nfe ASC)',
+        'CREATE INDEX IF NOT EXISTS "d100_chv_cte" ON d100 (chv_cte ASC)',
+    ] + [layout.create_index() for layout in LAYOUTS.values() if layout.pai is not None]
+
+    def db3_create(self):
+        for layout in self.LAYOUTS.values():
+            self.db.exec(layout.create_table())
+
+    @staticmethod
+    def periodo(campos):
+        """(ianomes, aaaamm) a partir do DT_INI (DDMMAAAA) do registro 0000 em campos"""
+        dt_ini = campos[4]
+        if len(dt_ini) != 8:
+            raise ValueError(f"DT_INI inválido no registro 0000: {dt_ini}")
+        return int(dt_ini[6:8] + dt_ini[2:4]), dt_ini[4:8] + dt_ini[2:4]
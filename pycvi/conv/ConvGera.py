@@ -0,0 +1,228 @@
+"""Gerador de arquivos sintéticos Cat42 e EFD, para testes e benchmark (ver ConvBench)
+
+Os registros são montados a partir dos LAYOUTS de ConvCat42 e ConvEfd: cada coluna recebe
+um valor conforme o conversor (decimal BR/US, data SPED) ou o nome (cod_item, cfop, chv_*...).
+A sequência aleatória é fixa (seed), então o mesmo pedido gera sempre os mesmos arquivos.
+
+Formatos:
+  'cat42':      Cat42 entregue pelo contribuinte, linhas sem | inicial (0000|MMAAAA|...)
+  'cat42difis': Cat42 processado/acolhido, |0000|RessarcimentoSt|MMAAAA|... e série 5000
+  'efd':        EFD ICMS/IPI com blocos 0, C, D, E, H e 9, incluindo registros sem layout
+"""
+import os
+import random
+
+from pycvi.conv.ConvCat42 import ConvCat42
+from pycvi.conv.ConvEfd import ConvEfd
+from pycvi.conv.ConvLayout import decimalBR, decimalUS, dtaSPED
+
+FORMATOS = ('cat42', 'cat42difis', 'efd')
+
+_BR = str.maketrans({',': '.', '.': ','})
+_CFOPS = ['1102', '1403', '2102', '2403', '5102', '5405', '6102', '6404']
+_PALAVRAS = ['PARAFUSO', 'CERVEJA', 'PNEU', 'ÓLEO', 'AÇÚCAR', 'CAFÉ', 'LÂMPADA', 'CABO',
+             'FILTRO', 'SABÃO', 'CHAVE', 'BATERIA', 'TINTA', 'ARROZ', 'FEIJÃO']
+
+
+class Contexto:
+    """Estado da geração de um arquivo: período, cadastros (itens, participantes) e sorteios"""
+
+    def __init__(self, rnd, mes, ano, itens, participantes):
+        self.rnd = rnd
+        self.mes = mes
+        self.ano = ano
+        self.mmaaaa = f'{mes:02d}{ano}'
+        self.itens = [f'IT{i:06d}' for i in range(itens)]
+        self.participantes = [f'P{i:05d}' for i in range(participantes)]
+        self.num_doc = 0
+
+    def decimal(self, maximo=5000, casas=2):
+        return f'{self.rnd.uniform(0, maximo):,.{casas}f}'
+
+    def data(self):
+        return f'{self.rnd.randint(1, 28):02d}{self.mmaaaa}'
+
+    def chave(self, modelo='55'):
+        self.num_doc += 1
+        return (f'35{self.ano % 100:02d}{self.mes:02d}{self.rnd.randint(10**13, 10**14 - 1)}'
+                + f'{modelo}001{self.num_doc:09d}1{self.rnd.randint(10**8, 10**9 - 1)}')[:44]
+
+    def valor(self, nome, conversor):
+        """Valor do campo nome, já no formato do arquivo"""
+        rnd = self.rnd
+        if conversor is decimalBR:
+            return self.decimal().translate(_BR)
+        if conversor is decimalUS:
+            return self.decimal()
+        if conversor is dtaSPED:
+            if nome in ('dt_ini', 'dt_inv'):
+                return f'01{self.mmaaaa}'
+            if nome in ('dt_fin', 'dt_fim'):
+                return f'28{self.mmaaaa}'
+            return self.data()
+        nome = nome.lower()
+        if nome == 'periodo':
+            return self.mmaaaa
+        if nome in ('cod_item', 'cod_ant_item'):
+            return rnd.choice(self.itens)
+        if nome == 'cod_part':
+            return rnd.choice(self.participantes)
+        if nome.startswith('chv_'):
+            return self.chave('57' if 'cte' in nome else '55')
+        if nome == 'cfop':
+            return rnd.choice(_CFOPS)
+        if nome == 'cnpj':
+            return f'{rnd.randint(10**13, 10**14 - 1)}'
+        if nome in ('cpf', 'im', 'suframa', 'cod_barra', 'ex_ipi', 'cod_gen', 'cod_lst',
+                    'compl', 'cod_cta', 'cod_nat', 'cod_enq', 'txt_compl', 'cod_obs',
+                    'cod_inf', 'num_proc', 'proc', 'chv_doce'):
+            return ''
+        if nome == 'ie':
+            return f'{rnd.randint(10**11, 10**12 - 1)}'
+        if nome in ('cod_mun', 'cod_mun_orig', 'cod_mun_dest'):
+            return '3550308'
+        if nome in ('unid', 'unid_inv', 'unid_conv'):
+            return rnd.choice(['UN', 'CX', 'KG'])
+        if nome in ('nome', 'descr', 'descr_item', 'descr_compl', 'descr_compl_aj',
+                    'descr_ant_item', 'descri'):
+            return ' '.join(rnd.choice(_PALAVRAS) for _ in range(rnd.randint(2, 4)))
+        if nome in ('cst_icms', 'cst_ipi', 'cst_pis', 'cst_cofins'):
+            return rnd.choice(['000', '010', '060', '090'])
+        if nome == 'cod_mod':
+            return rnd.choice(['55', '55', '55', '65', '01'])
+        if nome == 'num_doc':
+            return str(rnd.randint(1, 999999))
+        if nome == 'num_item':
+            return str(rnd.randint(1, 30))
+        if nome == 'cod_legal':
+            return str(rnd.randint(0, 4))
+        if nome in ('ind_oper', 'ind_emit', 'ind_mov', 'ind_apur', 'ind_frt', 'ind_pgto'):
+            return rnd.choice(['0', '1'])
+        return str(rnd.randint(0, 99))
+
+
+def registro(ctx, reg, layout, difis=False, **fixos):
+    """Linha do registro reg montada a partir do layout (fixos: valores já definidos)"""
+    valores = [fixos[nome] if nome in fixos else ctx.valor(nome, conversor)
+               for nome, (indice, conversor) in zip(layout.columns, layout.fields)]
+    linha = '|'.join([reg] + valores)
+    return f'|{linha}|\n' if difis else linha + '\n'
+
+
+def gera(formato, pasta, linhas, periodos=1, seed=42):
+    """Gera periodos arquivos (um por mês, a partir de 01/2023) com linhas no total
+
+    Retorna a lista dos arquivos gerados, em latin-1 como manda o Guia Prático
+    """
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato {formato} desconhecido, use um de {FORMATOS}")
+    rnd = random.Random(seed)
+    arquivos = []
+    for periodo in range(periodos):
+        mes, ano = periodo % 12 + 1, 2023 + periodo // 12
+        arquivo = os.path.join(pasta, f'{formato}_{ano}{mes:02d}.txt')
+        ctx = Contexto(rnd, mes, ano, itens=max(10, linhas // periodos // 200),
+                       participantes=max(5, linhas // periodos // 2000))
+        with open(arquivo, 'w', encoding='latin-1', newline='\r\n') as file:
+            if formato == 'efd':
+                gera_efd(file, ctx, linhas // periodos)
+            else:
+                gera_cat42(file, ctx, linhas // periodos, formato == 'cat42difis')
+        arquivos.append(arquivo)
+    return arquivos
+
+
+def gera_cat42(file, ctx, linhas, difis=False):
+    layouts = ConvCat42.LAYOUTS
+    rnd = ctx.rnd
+    if difis:
+        file.write(registro(ctx, '0000', layouts['0000'], difis, periodo='RessarcimentoSt')
+                   .replace('|RessarcimentoSt|', f'|RessarcimentoSt|{ctx.mmaaaa}|', 1))
+    else:
+        file.write(registro(ctx, '0000', layouts['0000']))
+    escritas = 1
+    for cod_part in ctx.participantes:
+        file.write(registro(ctx, '0150', layouts['0150'], difis, cod_part=cod_part))
+    for cod_item in ctx.itens:
+        file.write(registro(ctx, '0200', layouts['0200'], difis, cod_item=cod_item))
+        if difis:
+            file.write(registro(ctx, '5000', layouts['5000'], difis, cod_item=cod_item))
+        else:
+            file.write(registro(ctx, '1050', layouts['1050'], difis, cod_item=cod_item))
+    escritas += len(ctx.participantes) + 2 * len(ctx.itens)
+    # movimento: 1100 (NF-e) e 1200 (não eletrônicos) ou, no acolhido, 5001 com log 5100
+    while escritas < linhas - 5:
+        if difis:
+            reg = '5100' if rnd.random() < 0.01 else '5001'
+        else:
+            reg = '1200' if rnd.random() < 0.1 else '1100'
+        file.write(registro(ctx, reg, layouts[reg], difis))
+        escritas += 1
+    if difis:
+        for cod_legal in range(1, 5):
+            file.write(registro(ctx, '5010', layouts['5010'], difis, cod_legal=str(cod_legal)))
+
+
+def gera_efd(file, ctx, linhas):
+    layouts = ConvEfd.LAYOUTS
+    rnd = ctx.rnd
+    conta = dict()
+
+    def escreve(reg, **fixos):
+        if reg in layouts:
+            file.write(registro(ctx, reg, layouts[reg], True, **fixos))
+        else:
+            # registros sem layout no conversor (aberturas, encerramentos, C101...)
+            file.write('|' + '|'.join([reg] + [fixos[campo] for campo in fixos]) + '|\n')
+        conta[reg] = conta.get(reg, 0) + 1
+
+    escreve('0000', cod_ver='017', cod_fin='0', uf='SP', ind_perfil='A', ind_ativ='1')
+    escreve('0001', ind_mov='0')
+    for cod_part in ctx.participantes:
+        escreve('0150', cod_part=cod_part, cod_pais='1058')
+    for unid in ('UN', 'CX', 'KG'):
+        escreve('0190', unid=unid)
+    for cod_item in ctx.itens:
+        escreve('0200', cod_item=cod_item, tipo_item='00')
+        if rnd.random() < 0.2:
+            escreve('0220')
+    escreve('0990', qtd_lin=str(sum(conta.values()) + 1))
+    escreve('C001', ind_mov='0')
+    # documentos até completar o tamanho pedido, guardando espaço para os blocos E, H e 9
+    alvo = linhas - 60 - len(ctx.itens) // 10
+    while sum(conta.values()) < alvo:
+        if rnd.random() < 0.05:
+            escreve('D100', cod_mod='57')
+            escreve('D190')
+            continue
+        escreve('C100', cod_mod='55')
+        if rnd.random() < 0.1:
+            escreve('C101', vl_fcp_uf_dest='0,00', vl_icms_uf_dest='0,00',
+                    vl_icms_uf_rem='0,00')
+        for num_item in range(1, rnd.randint(1, 8) + 1):
+            escreve('C170', num_item=str(num_item))
+        for _ in range(rnd.randint(1, 3)):
+            escreve('C190')
+        if rnd.random() < 0.05:
+            escreve('C195')
+            escreve('C197')
+    escreve('C990', qtd_lin='0')
+    escreve('E001', ind_mov='0')
+    escreve('E100')
+    escreve('E110')
+    for _ in range(3):
+        escreve('E111')
+    escreve('E116', mes_ref=ctx.mmaaaa)
+    escreve('E990', qtd_lin='0')
+    escreve('H001', ind_mov='0')
+    escreve('H005')
+    for cod_item in ctx.itens[:max(1, len(ctx.itens) // 10)]:
+        escreve('H010', cod_item=cod_item)
+    escreve('H990', qtd_lin='0')
+    escreve('9001', ind_mov='0')
+    registros = sorted(set(conta) | {'9900', '9990', '9999'})
+    for reg in registros:
+        quantidade = len(registros) if reg == '9900' else conta.get(reg, 1)
+        file.write(f'|9900|{reg}|{quantidade}|\n')
+    file.write(f'|9990|{len(registros) + 3}|\n')
+    file.write(f'|9999|{sum(conta.values()) + len(registros) + 2}|\n')
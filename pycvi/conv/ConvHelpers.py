@@ -1,16 +1,55 @@
+import io
 import os
 import sqlite3
-import PySimpleGUI as sg
+import zipfile
+import contextlib
+
+from pycvi.CviJobs import na_janela
 
 
 class ConvHelpers:
-    def __init__(self, result_dir, db3_name):
+    # Perfis de conexão: 'bulk' durante a carga (sem fsync a cada commit, cache grande)
+    #   e 'safe' para o uso normal do banco depois da conversão.
+    #   WAL (e não journal_mode OFF) para que uma queda no meio da carga não corrompa o .db3
+    PROFILES = {
+        'bulk': ['PRAGMA journal_mode = WAL',
+                 'PRAGMA synchronous = OFF',
+                 'PRAGMA cache_size = -262144',  # 256 MB
+                 'PRAGMA temp_store = MEMORY',
+                 'PRAGMA mmap_size = 1073741824'],  # 1 GB
+        'safe': ['PRAGMA journal_mode = DELETE',
+                 'PRAGMA synchronous = FULL',
+                 'PRAGMA cache_size = -2000',
+                 'PRAGMA temp_store = DEFAULT',
+                 'PRAGMA mmap_size = 0',
+                 'PRAGMA optimize'],
+    }
+
+    def __init__(self, result_dir, db3_name, chunkSize=50000):
         self.dir = result_dir
         self.name = db3_name
+        # insert_buffered acumula as linhas por tabela e grava de chunkSize em chunkSize
+        self.chunkSize = chunkSize
+        self.sqlInsert = dict()  # um INSERT preparado por tabela
+        self.buffer = dict()     # linhas pendentes por tabela
 
-    def connect(self):
+    def connect(self, profile='safe'):
         self.conn = sqlite3.connect(os.path.join(self.dir, self.name))
         self.cursor = self.conn.cursor()
+        self.set_profile(profile)
+
+    def set_profile(self, profile):
+        """Aplica os PRAGMAs de PROFILES[profile] ('bulk' ou 'safe')"""
+        # journal_mode não pode ser alterado dentro de uma transação
+        self.conn.commit()
+        for pragma in ConvHelpers.PROFILES[profile]:
+            self.cursor.execute(pragma).fetchall()
+
+    def create_indexes(self, indexes):
+        """Cria os índices só depois da carga, que assim não precisa atualizá-los linha a linha"""
+        for sql in indexes:
+            self.cursor.execute(sql)
+        self.conn.commit()
 
     def exec(self, sql: str):
         self.cursor.execute(sql)
@@ -21,6 +60,103 @@ class ConvHelpers:
         sql = f"INSERT INTO {tablename} VALUES ({placeholders})"
         self.cursor.execute(sql, fields)
 
+    def insert_buffered(self, tablename, fields):
+        """Acumula fields em memória e grava com executemany ao atingir chunkSize
+
+        INSERT simples: ord é primary key, então duas linhas com o mesmo ord (dois arquivos
+        do mesmo período no mesmo banco) são erro, e não uma sobrescrita silenciosa.
+        Reconverter depois de uma queda é seguro porque conv_manifest apaga antes a faixa de
+        ord do período (ver ConvSped.apaga_periodo).
+        Não esqueça de chamar flush() no final!
+        """
+        rows = self.buffer.get(tablename)
+        if rows is None:
+            placeholders = ', '.join('?' for _ in fields)
+            self.sqlInsert[tablename] = f"INSERT INTO {tablename} VALUES ({placeholders})"
+            rows = self.buffer[tablename] = []
+        rows.append(fields)
+        if len(rows) >= self.chunkSize:
+            self.flush(tablename)
+
+    def flush(self, tablename=None):
+        """Grava as linhas pendentes de tablename (ou de todas as tabelas) numa única transação"""
+        tablenames = list(self.buffer) if tablename is None else [tablename]
+        try:
+            if not self.conn.in_transaction:
+                self.cursor.execute('BEGIN')
+            for name in tablenames:
+                rows = self.buffer[name]
+                if rows:
+                    self.cursor.executemany(self.sqlInsert[name], rows)
+                    rows.clear()
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+
+    def manifest_create(self):
+        """conv_manifest: um registro por arquivo de origem já convertido neste banco
+
+        hash e tamanho identificam o conteúdo; ianomes/aaaamm, o período (ver conv_action)
+        """
+        self.cursor.execute("""
+CREATE TABLE IF NOT EXISTS conv_manifest (
+  arq text, hash text, tamanho int, aaaamm text, ianomes int,
+  formato text, dt text, linhas int)
+""")
+        self.conn.commit()
+
+    def manifest_find(self, arq):
+        """Registros do manifesto do arquivo arq"""
+        self.cursor.execute(
+            "SELECT arq, hash, tamanho, aaaamm, ianomes FROM conv_manifest WHERE arq = ?", [arq])
+        return self.cursor.fetchall()
+
+    def manifest_delete_periodo(self, ianomes):
+        """Tira do manifesto os arquivos do período ianomes, que vai ser apagado; retorna os
+        nomes desses arquivos"""
+        self.cursor.execute("SELECT arq FROM conv_manifest WHERE ianomes = ?", [ianomes])
+        arqs = [row[0] for row in self.cursor.fetchall()]
+        self.cursor.execute("DELETE FROM conv_manifest WHERE ianomes = ?", [ianomes])
+        self.conn.commit()
+        return arqs
+
+    def manifest_save(self, arq, hash, tamanho, aaaamm, ianomes, formato, linhas):
+        self.cursor.execute("DELETE FROM conv_manifest WHERE arq = ?", [arq])
+        self.cursor.execute(
+            "INSERT INTO conv_manifest VALUES (?, ?, ?, ?, ?, ?, datetime('now', 'localtime'), ?)",
+            [arq, hash, tamanho, aaaamm, ianomes, formato, linhas])
+        self.conn.commit()
+
+    def delete_ord_range(self, tables, ianomes, periodo=10000000):
+        """Apaga de tables as linhas do período ianomes: ord = ianomes * periodo + linha"""
+        for tablename in tables:
+            self.cursor.execute(f"DELETE FROM {tablename} WHERE ord BETWEEN ? AND ?",
+                                [ianomes * periodo, (ianomes + 1) * periodo - 1])
+
+    def merge(self, staging_path, tables, preparo=()):
+        """Copia tables do banco staging_path para este banco, numa única transação
+
+        As tabelas precisam ter as mesmas colunas nos dois bancos. Os comandos de preparo
+        rodam antes das cópias e podem referenciar o banco anexado como staging.
+        INSERT simples, como em insert_buffered: ord repetido é erro e nada é incorporado
+        """
+        self.conn.commit()
+        self.cursor.execute('ATTACH DATABASE ? AS staging', [staging_path])
+        try:
+            self.cursor.execute('BEGIN')
+            for sql in preparo:
+                self.cursor.execute(sql)
+            for tablename in tables:
+                self.cursor.execute(
+                    f"INSERT INTO {tablename} SELECT * FROM staging.{tablename}")
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        finally:
+            self.cursor.execute('DETACH DATABASE staging')
+
     def insert_into_table_from_txt(self, txt_file, tablename, cabec=True):
         try:
             with open(txt_file, 'r', encoding='utf-8') as file:
@@ -34,8 +170,25 @@ class ConvHelpers:
                 cabec = False
             else:
                 fields = value.strip().split('\t')
-                self.insert(tablename, fields)
-        self.conn.commit()
+                self.insert_buffered(tablename, fields)
+        self.flush(tablename)
+
+    @staticmethod
+    @contextlib.contextmanager
+    def open_text(filename, encoding, zipfile_path=None):
+        """Abre filename para leitura em modo texto
+
+        Se zipfile_path for informado, filename é o nome do membro dentro do .zip,
+        lido (e descompactado) sob demanda, sem extrair nada para o disco
+        """
+        if zipfile_path is None:
+            with open(filename, 'r', encoding=encoding) as handle:
+                yield handle
+        else:
+            with zipfile.ZipFile(zipfile_path, 'r') as zip_ref:
+                with zip_ref.open(filename) as raw:
+                    with io.TextIOWrapper(raw, encoding=encoding) as handle:
+                        yield handle
 
     @staticmethod
     def dtaSPED(data):
@@ -43,7 +196,9 @@ class ConvHelpers:
         return data[4:8] + '-' + data[2:4] + '-' + data[0:2]
 
     @staticmethod
+    @na_janela
     def get_zip_file(window):
+        import PySimpleGUI as sg  # só com janela, a linha de comando (CviCli) roda sem
         layout = [
             [sg.Text("Seleção do Arquivo .zip para Converter"),
              sg.Input(key='-FILEPATH-', enable_events=True),
@@ -0,0 +1,70 @@
+"""Layouts declarativos dos registros SPED / Cat42
+
+Cada registro (campos[1], ex. '0200') aponta para um ConvLayout com a tabela destino e
+as colunas, na ordem do registro a partir de campos[2]. Uma coluna é só o nome
+ou (nome, conversor). Sem conversor o valor vai como está: inteiros e textos
+ficam a cargo da afinidade da coluna no SQLite.
+
+Para incluir um novo registro (ex. uma variante da série 5000) basta acrescentar
+uma entrada no dicionário LAYOUTS do conversor, sem mexer no parser.
+
+Registros filhos (ex. C170, filho do C100) informam pai, a tabela do registro pai:
+a tabela ganha a coluna ord_<pai> com o ord do último registro pai lido.
+"""
+from pycvi.conv.ConvHelpers import ConvHelpers
+
+# tabelas de tradução pré-compiladas, bem mais rápidas que .replace() encadeados
+_DECIMAL_BR = str.maketrans({'.': None, ',': '.'})  # 99.999,99 -> 99999.99
+_DECIMAL_US = str.maketrans({',': None})            # 99,999.99 -> 99999.99
+
+
+def decimalBR(valor):
+    return valor.translate(_DECIMAL_BR)
+
+
+def decimalUS(valor):
+    return valor.translate(_DECIMAL_US)
+
+
+def dtaSPED(data):
+    # datas opcionais (ex. DT_E_S do C100) vêm vazias
+    return ConvHelpers.dtaSPED(data) if data else ''
+
+
+class ConvLayout:
+    def __init__(self, table, columns, first=2, pai=None):
+        self.table = table
+        self.pai = pai
+        self.columns = []
+        self.fields = []  # (índice em campos, conversor ou None)
+        for indice, column in enumerate(columns, first):
+            nome, conversor = (column, None) if isinstance(column, str) else column
+            self.columns.append(nome)
+            self.fields.append((indice, conversor))
+        self.size = first + len(columns)
+
+    def row(self, iord, campos, ord_pai=None):
+        """Monta a linha (ord [+ ord_pai] + colunas) para insert a partir dos campos já separados"""
+        if len(campos) < self.size:
+            # versões antigas do layout podem vir sem os últimos campos
+            campos = campos + [''] * (self.size - len(campos))
+        values = [campos[indice] if conversor is None else conversor(campos[indice])
+                  for indice, conversor in self.fields]
+        if self.pai is None:
+            return [iord] + values
+        return [iord, ord_pai] + values
+
+    def create_table(self):
+        """CREATE TABLE a partir das colunas: valores decimais como real, o resto como text"""
+        columns = ['ord int primary key']
+        if self.pai is not None:
+            columns.append(f'ord_{self.pai} int')
+        for nome, (indice, conversor) in zip(self.columns, self.fields):
+            tipo = 'real' if conversor in (decimalBR, decimalUS) else 'text'
+            columns.append(f'{nome} {tipo}')
+        return f"CREATE TABLE {self.table} (\n  " + ',\n  '.join(columns) + ')'
+
+    def create_index(self):
+        """Índice do ord do pai, usado nos joins com a tabela do registro pai"""
+        return (f'CREATE INDEX IF NOT EXISTS "{self.table}_ord_{self.pai}" '
+                + f'ON {self.table} (ord_{self.pai} ASC)')
@@ -0,0 +1,281 @@
+import os
+import abc
+import mmap
+import time
+import codecs
+
+from pycvi.conv.ConvHelpers import ConvHelpers
+from pycvi.CviJobs import CviJobs, CviCancelado
+from pycvi.Config import Config
+config = Config()
+
+# tabelas auxiliares carregadas de res/tabelas na criação do banco:
+#   (tabela, CREATE TABLE, arquivo .txt com cabeçalho e campos separados por tab,
+#    CREATE INDEX ou None)
+TABELA_CFOPD = ('cfopd', """
+CREATE TABLE cfopd (cfop int, dfi text, st text, classe text,
+g1 text, c3 text, g2 text, g3 text, descri_simplif text, descri text, pod_creditar text);
+""", 'cfopd.txt', 'CREATE INDEX cfopd_cfop ON cfopd (cfop ASC);')
+TABELA_TAB4_1_1 = ('tab4_1_1', """
+CREATE TABLE tab4_1_1 (cod text, descri text, mod text);
+""", 'Tab4.1.1.txt', 'CREATE INDEX tab4_1_1_cod ON tab4_1_1 (cod ASC);')
+TABELA_MUNIC = ('tab_munic', """
+CREATE TABLE tab_munic (cod int primary key, uf text, munic text);
+""", 'Tabela_Municipios.txt', None)
+
+
+class ConvSped(abc.ABC):
+    """Base dos conversores de arquivos no formato SPED (|REG|campo|campo|...)
+
+    O arquivo é lido linha a linha (inclusive direto do .zip, ver ConvHelpers.open_text)
+    e cada registro com entrada em LAYOUTS vai para a sua tabela com insert_buffered.
+    A chave de todas as tabelas é ord = ianomes * ORD_PERIODO + número da linha,
+    onde ianomes = AAMM do período do registro 0000.
+
+    Leitura (reader):
+      'readline': arquivo em modo texto, linha a linha; funciona também direto do .zip
+      'mmap': arquivo em disco mapeado em memória, linhas separadas em bytes e só as linhas
+          que vão para o banco são decodificadas. Só para codificações em que '|' e o fim
+          de linha são sempre bytes ASCII (MMAP_ENCODINGS); nos demais casos usa readline
+
+    As subclasses definem DB3_NAME, LAYOUTS, INDEXES, TABELAS, db3_create (tabelas de dados)
+    e periodo; sem os dois métodos, a subclasse não pode ser instanciada
+    """
+    DB3_NAME = None
+    ORD_PERIODO = 10000000
+    INDEXES = []   # criados por create_indexes ao final da carga
+    LAYOUTS = {}   # registro -> tabela e colunas, ver ConvLayout
+    TABELAS = []   # tabelas auxiliares, ver TABELA_CFOPD
+    MMAP_ENCODINGS = ('utf-8', 'utf-8-sig', 'latin-1', 'iso8859-1', 'cp1252', 'ascii')
+
+    def __init__(self, window, filename, result_dir, encoding, zipfile_path=None,
+                 staging=False, reader='readline'):
+        # se zipfile_path for informado, filename é um membro do .zip, lido sem extrair
+        # staging = True: banco temporário de um processo do pool de conv_action, só com as
+        #   tabelas de dados, sem índices, depois incorporado ao banco final com merge()
+        # filename = None: apenas abre (ou cria) o banco, para receber os merge()
+        #   e então db3_close()
+        self.window = window
+        self.filename = filename
+        self.encoding = encoding
+        self.zipfile_path = zipfile_path
+        self.staging = staging
+        self.reader = reader
+        self.db = ConvHelpers(result_dir, self.DB3_NAME)
+        self.refresh()
+        self.db3_open()
+        if filename is None:
+            return
+        self.refresh()
+        self.spedRead()
+        if not staging:
+            self.db3_close()
+
+    def refresh(self):
+        # nos processos do pool não há janela
+        if self.window is not None:
+            self.window.refresh()
+
+    def db3_open(self):
+        db_path = os.path.join(self.db.dir, self.db.name)
+        if os.path.exists(db_path):
+            try:
+                self.db.connect('bulk')
+            except Exception as e:
+                print(f"Falha ao abrir Banco de Dados {db_path}: {e}")
+                return
+        else:
+            try:
+                self.db.connect('bulk')
+            except Exception as e:
+                print(f"Falha ao criar Banco de Dados {db_path}: {e}")
+                return
+
+            if not self.staging:
+                self.db3_tabelas()
+            self.db.exec('CREATE TABLE conta_reg (arq, aaaamm, reg, qtd int)')
+            self.db3_create()
+        if not self.staging:
+            self.db.manifest_create()
+
+    @abc.abstractmethod
+    def db3_create(self):
+        """Cria as tabelas de dados (as de LAYOUTS)"""
+
+    def db3_tabelas(self):
+        """Tabelas auxiliares (cfop, municípios...), ver TABELAS"""
+        for tablename, create, txt_file, index in self.TABELAS:
+            self.db.exec(create)
+            self.db.insert_into_table_from_txt(
+                os.path.join(config.CVI_RES, 'tabelas', txt_file),
+                tablename)
+            if index is not None:
+                self.db.exec(index)
+
+    def db3_close(self):
+        self.db.create_indexes(self.INDEXES)
+        # fim da carga, volta o banco para o perfil seguro
+        self.db.set_profile('safe')
+
+    def tabelas_dados(self):
+        """Tabelas preenchidas a partir do arquivo, todas com ord como chave"""
+        return sorted({layout.table for layout in self.LAYOUTS.values()})
+
+    def apaga_periodo(self, ianomes, aaaamm):
+        """Apaga as linhas já convertidas de um período, para a reconversão (ver conv_action)"""
+        self.db.delete_ord_range(self.tabelas_dados(), ianomes, self.ORD_PERIODO)
+        self.db.cursor.execute("DELETE FROM conta_reg WHERE aaaamm = ?", [aaaamm])
+        self.db.conn.commit()
+
+    def merge(self, staging_path):
+        """Incorpora o banco de staging staging_path (ver conv_action) ao banco final"""
+        tables = ['conta_reg'] + self.tabelas_dados()
+        # conta_reg não tem chave: apaga antes a contagem de uma conversão anterior do arquivo
+        self.db.merge(staging_path, tables, [
+            'DELETE FROM conta_reg WHERE arq IN (SELECT arq FROM staging.conta_reg)'])
+
+    def spedRead(self):
+        self.ilidos = 1
+        self.igravados = 0  # linhas com layout, gravadas no banco (ver spedInsert)
+        self.ianomes = 601
+        self.a_conta_reg = dict()
+        self.aaaamm = ''
+        self.ords = dict()  # tabela -> ord do último registro, pai dos registros seguintes
+        self.erro = None
+        self.start_time = time.time()  # Armazena o tempo inicial
+        try:
+            if self.reader == 'mmap' and self.mmapOk():
+                self.spedReadMmap()
+            else:
+                with ConvHelpers.open_text(self.filename, self.encoding,
+                                           self.zipfile_path) as file:
+                    while True:
+                        line = file.readline()
+                        if not line:
+                            break  # Fim do arquivo
+                        self.spedReadLine(line)  # noqa: F401
+                        if self.ilidos % 50000 == 0:
+                            self.progresso()
+                        self.ilidos += 1
+        except CviCancelado:
+            # as linhas já gravadas ficam sem manifesto: conv_manifest apaga o período antes
+            # de convertê-lo de novo
+            self.db.conn.close()
+            raise
+        except Exception as e:
+            self.erro = e
+            print(f"Erro ao abrir ou ler o arquivo {self.filename}", e)
+        try:
+            self.db.flush()
+        except Exception as e:
+            # ord repetido: outro arquivo do mesmo período (ver ConvHelpers.insert_buffered)
+            self.erro = e
+            print(f"##ERRO## Falha ao gravar as linhas de {self.filename}", e)
+        # se o arquivo já foi (total ou parcialmente) convertido antes, refaz a contagem
+        self.db.cursor.execute("DELETE FROM conta_reg WHERE arq = ?", [self.filename])
+        for indice, valor in self.a_conta_reg.items():
+            sql = f"INSERT INTO conta_reg VALUES (?, ?, ?, ?)"
+            fields = [self.filename, self.aaaamm, indice, valor]
+            self.db.cursor.execute(sql, fields)
+        self.db.conn.commit()
+
+        elapsed = max(time.time() - self.start_time, 1e-6)
+        print(f"Parte 1 - Leitura finalizada: {self.ilidos} linhas do arquivo",
+              f"{self.filename}")
+        print("Tempo decorrido:", elapsed, "segundos", f"({self.taxas(elapsed)})\n")
+
+    def progresso(self):
+        CviJobs.progresso(50000)  # chamado a cada 50000 linhas
+        elapsed = max(time.time() - self.start_time, 1e-6)
+        print("Tempo decorrido:", elapsed, "segundos", f"({self.taxas(elapsed)})")
+
+    def taxas(self, elapsed):
+        """Linhas lidas e linhas gravadas (as que têm layout) por segundo"""
+        return (f"{self.ilidos / elapsed:.0f} linhas/s lidas, "
+                + f"{self.igravados / elapsed:.0f} linhas/s gravadas")
+
+    def mmapOk(self):
+        if self.zipfile_path is not None:
+            print(f"Leitura mmap indisponível para {self.filename} dentro do .zip, usando readline")
+            return False
+        if codecs.lookup(self.encoding).name not in self.MMAP_ENCODINGS:
+            print(f"Leitura mmap indisponível na codificação {self.encoding}, usando readline")
+            return False
+        if os.path.getsize(self.filename) == 0:
+            return False  # não dá para mapear um arquivo vazio
+        return True
+
+    def spedReadMmap(self):
+        # as linhas são decodificadas com encoding (o BOM, se houver, é pulado)
+        self.bytes_encoding = 'utf-8' if self.encoding == 'utf-8-sig' else self.encoding
+        self.regs_bytes = {reg.encode('ascii') for reg in self.LAYOUTS} | {b'0000'}
+        with open(self.filename, 'rb') as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                if mm[:3] == codecs.BOM_UTF8:
+                    mm.seek(3)
+                readline = mm.readline
+                while True:
+                    line = readline()
+                    if not line:
+                        break  # Fim do arquivo
+                    self.spedReadBytes(line)
+                    if self.ilidos % 50000 == 0:
+                        self.progresso()
+                    self.ilidos += 1
+
+    def spedReadLine(self, linha):
+        campos = linha.strip().split('|')
+        if campos[0]:
+            campos.insert(0, '')  # leiautes sem o | no início da linha (Cat42)
+        if len(campos) <= 1:
+            return
+        reg = campos[1]
+        if reg == '0000':
+            self.ianomes, self.aaaamm = self.periodo(campos)
+        self.spedInsert(reg, self.ilidos + self.ianomes * self.ORD_PERIODO, campos)
+
+    def spedReadBytes(self, linha):
+        """Leitura mmap: o registro é lido nos bytes e a linha só é decodificada (e separada
+        em campos por spedReadLine) se tiver layout ou for o 0000. As demais só são contadas
+        """
+        partes = linha.split(b'|', 2)
+        reg = (partes[0] or partes[1] if len(partes) > 1 else partes[0]).strip()
+        if reg in self.regs_bytes:
+            self.spedReadLine(linha.decode(self.bytes_encoding))
+        elif len(reg) == 4:
+            reg = reg.decode(self.bytes_encoding)
+            self.a_conta_reg[reg] = self.a_conta_reg.get(reg, 0) + 1
+
+    def spedInsert(self, reg, iord, campos):
+        """Grava campos na tabela do registro reg, se houver layout para ele"""
+        if len(reg) == 4:
+            self.a_conta_reg[reg] = self.a_conta_reg.get(reg, 0) + 1
+
+        layout = self.LAYOUTS.get(reg)
+        if layout is None:
+            return
+        self.ords[layout.table] = iord
+        self.igravados += 1
+        if layout.pai is None:
+            self.db.insert_buffered(layout.table, layout.row(iord, campos))
+        else:
+            self.db.insert_buffered(layout.table,
+                                    layout.row(iord, campos, self.ords.get(layout.pai)))
+
+    @staticmethod
+    @abc.abstractmethod
+    def periodo(campos):
+        """(ianomes, aaaamm) do registro 0000 já separado em campos"""
+
+    @classmethod
+    def periodo_arquivo(cls, linha):
+        """(ianomes, aaaamm) a partir da primeira linha do arquivo, ou None se não for 0000"""
+        campos = linha.strip().split('|')
+        if campos[0]:
+            campos.insert(0, '')
+        if len(campos) < 3 or campos[1] != '0000':
+            return None
+        try:
+            return cls.periodo(campos)
+        except (ValueError, IndexError):
+            return None
@@ -9,60 +9,308 @@ Não sei se é o melhor método, é mais pra botar pra funcionar
 """
 
 import os
+import time
 import uuid
+import shutil
 import zipfile
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
 # import traceback
 
 from pycvi.Config import Config
+from pycvi.CviJobs import CviCancelado
 from pycvi.conv.ConvHelpers import ConvHelpers
 from pycvi.conv.ConvCookbook import ConvCookbook
 from pycvi.conv.ConvCat42 import ConvCat42
+from pycvi.conv.ConvEfd import ConvEfd
 
 config = Config()
 
+# conversores disponíveis para cada tipo detectado por ConvCookbook.fileDetect
+#   stream = True: lê o arquivo direto do .zip
+#   stream = False: o conversor precisa de um arquivo em disco, então o membro é extraído
+#       numa pasta temporária, apagada ao final da conversão
+CONVERSORES = {
+    'Cat42': {'classe': ConvCat42, 'stream': True},
+    'SpedEfd': {'classe': ConvEfd, 'stream': True},
+}
 
-def conv_action(window, values: str):
-    zipfile_path = ConvHelpers.get_zip_file(window)
+
+def conv_action(window, values: str, zipfile_path=None):
+    # zipfile_path já informado na linha de comando (ver CviCli); senão, pergunta
     if zipfile_path is None:
+        zipfile_path = ConvHelpers.get_zip_file(window)
+    if not zipfile_path:
         print("Conversão cancelada pelo usuário")
-        # return False
-    zipfile_path = 'J:\\sef\\my\\NovaQualityVeiculos\\Fontes\\Testes.zip'
+        return False
     tmppath = os.path.join(config.CVI_VAR, 'tmp', str(uuid.uuid1()))
     print(f"Convertendo {zipfile_path} dentro da pasta temporária {tmppath} Oremos...\n")
     Config.create_dir_if_not_exists(tmppath)
     if not os.path.isdir(tmppath):
         print(f'##ERRO## Cancelando a conversão... não consegui criar a pasta {tmppath}')
-        return
-    srcpath = os.path.join(tmppath, 'source')
-    Config.create_dir_if_not_exists(srcpath)
-    if not os.path.isdir(srcpath):
-        print(f'##ERRO## Cancelando a conversão... não consegui criar a pasta {srcpath}')
-        return
-    respath = os.path.join(tmppath, 'result')
+        return False
+    respath = conv_respath(values, tmppath)
+    try:
+        return conv_zip(window, zipfile_path, tmppath, respath)
+    finally:
+        # sem OSF os bancos ficam em tmppath; senão (ou se nada foi convertido) ela não serve mais
+        if os.path.commonpath([respath, tmppath]) != tmppath or not os.path.isdir(respath) \
+                or len(os.listdir(respath)) == 0:
+            shutil.rmtree(tmppath, ignore_errors=True)
+
+
+def conv_zip(window, zipfile_path, tmppath, respath):
+    """Converte os arquivos de zipfile_path para respath; False se algo falhou"""
     Config.create_dir_if_not_exists(respath)
     if not os.path.isdir(respath):
         print(f'##ERRO## Cancelando a conversão... não consegui criar a pasta {respath}')
-        return
-    print(f"\nExtraindo {zipfile_path} para {srcpath}")
+        return False
     try:
-        with zipfile.ZipFile(zipfile_path, 'r') as zip_ref:
-            zip_ref.extractall(srcpath)
+        zip_ref = zipfile.ZipFile(zipfile_path, 'r')
     except Exception as e:
-        print(f"##ERRO## Cancelando a conversão... Falha ao extrair {zipfile}", e)
-        return
-    print(f"\nExtração concluída... {srcpath} agora contém:")
-    for entry in os.scandir(srcpath):
-        print(entry.path)
-    arqs = ConvHelpers.listdir(srcpath, True)
-    if len(arqs) == 0:
-        print(f"Nada a fazer, não há arquivos na pasta {srcpath}")
-        return
-    for index, entry in enumerate(arqs):
-        fileDetected, encoding = ConvCookbook.fileConv(entry)
-        if fileDetected == 'Cat42':
-            convcat42 = ConvCat42(window, entry, respath, encoding)  # noqa: F401
+        print(f"##ERRO## Cancelando a conversão... Falha ao abrir {zipfile_path}", e)
+        return False
+    with zip_ref, tempfile.TemporaryDirectory(dir=tmppath) as srcpath:
+        membros = [info for info in zip_ref.infolist()
+                   if not info.is_dir() and not info.filename.endswith('.xml')]
+        if len(membros) == 0:
+            print(f"##ERRO## Nada a fazer, não há arquivos em {zipfile_path}")
+            return False
+        print(f"\n{zipfile_path} contém:")
+        for info in membros:
+            print(info.filename)
+        print()
+        tarefas = []
+        for info in membros:
+            fileDetected, encoding = ConvCookbook.fileConvZip(zip_ref, info)
+            conversor = CONVERSORES.get(fileDetected)
+            if conversor is None:
+                continue
+            tarefa = {'classe': conversor['classe'], 'formato': fileDetected,
+                      'nome': info.filename, 'encoding': encoding,
+                      # o CRC-32 gravado no .zip identifica o conteúdo sem precisar lê-lo
+                      'hash': f"crc32:{info.CRC:08x}", 'tamanho': info.file_size}
+            if conversor['stream']:
+                tarefa['arquivo'], tarefa['zipfile_path'] = info.filename, zipfile_path
+            else:
+                print(f"Extraindo {info.filename} para {srcpath}")
+                tarefa['arquivo'], tarefa['zipfile_path'] = zip_ref.extract(info, srcpath), None
+            tarefas.append(tarefa)
+        tarefas, recusados = conv_manifest(window, tarefas, respath)
+        erros = recusados + conv_tarefas(window, tarefas, respath, srcpath)
+    if len(os.listdir(respath)) == 0:
+        print("Nenhum arquivo convertido")
     if ConvHelpers.verifica_arquivo(respath, 'cat42'):
         print('tem Cat42')
     if ConvHelpers.verifica_arquivo(respath, 'efd'):
         print('tem Efd')
+    if erros:
+        print(f"##ERRO## {erros} arquivo(s) com erro na conversão, veja acima")
+        return False
     return
+
+
+def conv_respath(values, tmppath):
+    """Pasta dos bancos convertidos
+
+    Com uma OSF selecionada é a pasta de resultados da OSF, sempre a mesma: assim o manifesto
+    (ver conv_manifest) lembra o que já foi convertido. Sem OSF, uma pasta dentro de tmppath
+    """
+    osf, cnpj = values[:11].strip(), values[18:32]
+    if osf and cnpj.isdigit():
+        return os.path.join(config.CVI_RESULT, cnpj, osf)
+    print("Nenhuma OSF selecionada: a conversão vai para a pasta temporária e os arquivos",
+          "serão todos convertidos, mesmo que já tenham sido antes")
+    return os.path.join(tmppath, 'result')
+
+
+def conv_manifest(window, tarefas, respath):
+    """Compara as tarefas com o manifesto dos bancos de respath e retorna (as que faltam,
+    número de arquivos recusados)
+
+    Dois arquivos do mesmo período no mesmo banco (por exemplo cat42_202301 e
+    cat42difis_202301) gravariam na mesma faixa de ord: os dois são recusados.
+    Arquivo com mesmo hash, tamanho e período de um já convertido é ignorado, a não ser que
+    o seu período seja apagado nesta passada. Os períodos de um arquivo novo ou alterado
+    (o atual e os de uma conversão anterior do arquivo) são apagados pela faixa de ord,
+    junto com os registros do manifesto dos arquivos que os tinham
+    """
+    ignorados, novos, substituidos = [], [], []
+    destinos = dict()  # classe do conversor -> conversor aberto em respath
+    porPeriodo = dict()  # (classe, ianomes) -> tarefas
+    for tarefa in tarefas:
+        classe = tarefa['classe']
+        with ConvHelpers.open_text(tarefa['arquivo'], tarefa['encoding'],
+                                   tarefa['zipfile_path']) as file:
+            periodo = classe.periodo_arquivo(file.readline())
+        if periodo is None:
+            print(f"##ERRO## {tarefa['nome']}: registro 0000 não encontrado na primeira linha")
+            continue
+        tarefa['ianomes'], tarefa['aaaamm'] = periodo
+        porPeriodo.setdefault((classe, tarefa['ianomes']), []).append(tarefa)
+    recusados = 0
+    aceitas = []
+    for (classe, ianomes), doPeriodo in porPeriodo.items():
+        if len(doPeriodo) > 1:
+            print(f"##ERRO## {', '.join(tarefa['nome'] for tarefa in doPeriodo)} são do mesmo",
+                  f"período {doPeriodo[0]['aaaamm']}: nenhum foi convertido, deixe só um no .zip")
+            recusados += len(doPeriodo)
+            continue
+        aceitas += doPeriodo
+    aceitas.sort(key=tarefas.index)  # na ordem do .zip
+    apagar = dict()  # (classe, ianomes) -> aaaamm dos períodos a apagar
+    alteradas = []
+    for tarefa in aceitas:
+        classe = tarefa['classe']
+        conv = destinos.get(classe)
+        if conv is None:
+            conv = destinos[classe] = classe(window, None, respath, None)
+        tarefa['anteriores'] = conv.db.manifest_find(tarefa['nome'])
+        if any(hash == tarefa['hash'] and tamanho == tarefa['tamanho']
+               and ianomes == tarefa['ianomes']
+               for arq, hash, tamanho, aaaamm, ianomes in tarefa['anteriores']):
+            continue
+        alteradas.append(tarefa)
+        for arq, hash, tamanho, aaaamm, ianomes in tarefa['anteriores']:
+            apagar[(classe, ianomes)] = aaaamm
+        # se o período tem linhas sem manifesto (conversão interrompida), apaga também
+        apagar[(classe, tarefa['ianomes'])] = tarefa['aaaamm']
+    donos = dict()  # (classe, ianomes) -> arquivos que tinham o período apagado
+    for (classe, ianomes), aaaamm in apagar.items():
+        conv = destinos[classe]
+        donos[(classe, ianomes)] = conv.db.manifest_delete_periodo(ianomes)
+        for arq in donos[(classe, ianomes)]:
+            print(f"Apagando o período {aaaamm}, convertido antes de {arq}")
+        conv.apaga_periodo(ianomes, aaaamm)
+    pendentes = []
+    for tarefa in aceitas:
+        chave = (tarefa['classe'], tarefa['ianomes'])
+        if tarefa not in alteradas and chave not in apagar:
+            ignorados.append(tarefa['nome'])
+            continue
+        (substituidos if tarefa['anteriores'] or donos.get(chave) else novos).append(
+            tarefa['nome'])
+        pendentes.append(tarefa)
+    for conv in destinos.values():
+        conv.db3_close()
+        conv.db.conn.close()
+    print(f"Manifesto: {len(ignorados)} arquivo(s) sem alteração (ignorados),",
+          f"{len(novos)} novo(s), {len(substituidos)} substituído(s),",
+          f"{recusados} recusado(s)")
+    for titulo, nomes in (('Ignorado', ignorados), ('Novo', novos),
+                          ('Substituído', substituidos)):
+        for nome in nomes:
+            print(f"  {titulo}: {nome}")
+    print()
+    window.refresh()
+    return pendentes, recusados
+
+
+def conv_workers():
+    """Número de processos da conversão: convWorkers de cvi_sys_data, 0 = um por CPU"""
+    cvi_sys_data = config.load_cvi_sys_data()
+    workers = cvi_sys_data.get('convWorkers', 0) if cvi_sys_data else 0
+    if workers > 0:
+        return workers
+    return os.cpu_count() or 1
+
+
+def conv_tarefas(window, tarefas, respath, workpath):
+    """Converte as tarefas, em paralelo se houver mais de uma e mais de um processo
+
+    Cada processo do pool converte um arquivo num banco de staging próprio, em workpath.
+    Depois os bancos de staging são incorporados aos bancos de respath na ordem das tarefas,
+    e não na ordem de conclusão, para que o resultado seja sempre o mesmo.
+    Cada arquivo convertido sem erro é registrado no manifesto (ver conv_manifest).
+    Retorna o número de arquivos com erro
+    """
+    erros = 0
+    workers = min(conv_workers(), len(tarefas))
+    if workers <= 1:
+        for tarefa in tarefas:
+            try:
+                conv = tarefa['classe'](window, tarefa['arquivo'], respath, tarefa['encoding'],
+                                        tarefa['zipfile_path'])
+            except CviCancelado:
+                raise
+            except Exception as e:
+                # por exemplo, ord repetido (IntegrityError) na gravação final
+                print(f"##ERRO## Falha ao converter {tarefa['nome']}", e)
+                erros += 1
+                continue
+            if conv.erro is None:
+                conv_manifest_save(conv, tarefa, conv.ilidos)
+            else:
+                erros += 1
+            conv.db.conn.close()
+        return erros
+    print(f"Convertendo {len(tarefas)} arquivos com {workers} processos em paralelo\n")
+    window.refresh()
+    resultados = [None] * len(tarefas)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futuros = dict()
+        for indice, tarefa in enumerate(tarefas):
+            staging_dir = os.path.join(workpath, 'staging', str(indice))
+            Config.create_dir_if_not_exists(staging_dir)
+            futuro = executor.submit(conv_staging, tarefa['classe'], tarefa['arquivo'],
+                                     staging_dir, tarefa['encoding'], tarefa['zipfile_path'])
+            futuros[futuro] = indice
+        try:
+            for concluidos, futuro in enumerate(as_completed(futuros), 1):
+                indice = futuros[futuro]
+                arquivo = tarefas[indice]['nome']
+                try:
+                    resultados[indice] = futuro.result()
+                    _, linhas, elapsed = resultados[indice]
+                    print(f"[{concluidos}/{len(tarefas)}] {arquivo}: {linhas} linhas em",
+                          f"{elapsed:.1f} segundos")
+                except Exception as e:
+                    print(f"##ERRO## [{concluidos}/{len(tarefas)}] Falha ao converter {arquivo}",
+                          e)
+                    erros += 1
+                window.refresh()
+        except CviCancelado:
+            # os arquivos ainda na fila não começam; os já iniciados terminam o seu staging
+            executor.shutdown(wait=True, cancel_futures=True)
+            raise
+    destinos = dict()  # classe do conversor -> conversor aberto em respath
+    for indice, tarefa in enumerate(tarefas):
+        if resultados[indice] is None:
+            continue
+        classe = tarefa['classe']
+        conv = destinos.get(classe)
+        if conv is None:
+            conv = destinos[classe] = classe(window, None, respath, None)
+        print(f"Incorporando {tarefa['nome']} em {conv.db.name}")
+        window.refresh()
+        try:
+            conv.merge(resultados[indice][0])
+        except Exception as e:
+            # ord repetido: a transação do merge é desfeita e o arquivo fica sem manifesto
+            print(f"##ERRO## Falha ao incorporar {tarefa['nome']} em {conv.db.name}", e)
+            erros += 1
+            continue
+        conv_manifest_save(conv, tarefa, resultados[indice][1])
+    for conv in destinos.values():
+        conv.db3_close()
+        conv.db.conn.close()
+    print()
+    return erros
+
+
+def conv_manifest_save(conv, tarefa, linhas):
+    conv.db.manifest_save(tarefa['nome'], tarefa['hash'], tarefa['tamanho'], tarefa['aaaamm'],
+                          tarefa['ianomes'], tarefa['formato'], linhas)
+
+
+def conv_staging(classe, arquivo, staging_dir, encoding, zipfile_path):
+    """Executada num processo do pool: converte arquivo num banco de staging em staging_dir
+
+    Retorna (caminho do banco de staging, linhas lidas, segundos)
+    """
+    start_time = time.time()
+    conv = classe(None, arquivo, staging_dir, encoding, zipfile_path, staging=True)
+    conv.db.conn.close()
+    if conv.erro is not None:
+        raise conv.erro
+    return os.path.join(conv.db.dir, conv.db.name), conv.ilidos, time.time() - start_time
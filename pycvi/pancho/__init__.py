@@ -13,6 +13,7 @@ import getpass
 from pycvi.Config import Config
 from pycvi.CviPr import CviPr
 from pycvi.CviDb import CviDb
+from pycvi.CviJobs import na_janela
 
 config = Config()
 cviPr = CviPr(config)
@@ -78,7 +79,7 @@ def cadesp_action(window, values: str):
         traceback.print_exc()
         print(e, "\n\nErro de autenticação, cancelando...")
         return
-    ie_pop = sg.popup_get_text(f'Digite a IE desejada:')
+    ie_pop = na_janela(sg.popup_get_text)(f'Digite a IE desejada:')
     if ie_pop is None:
         print("Pesquisa cancelada...")
         return
@@ -112,7 +113,7 @@ def pgsf_action(window, values: str):
     pgsf = Pgsf()
     usuario = getpass.getuser()
     print("Entrando no PGSF com o seguinte usuário:", usuario)
-    senha_pop = sg.popup_get_text(f'Digite a senha para o usuário {usuario}',
+    senha_pop = na_janela(sg.popup_get_text)(f'Digite a senha para o usuário {usuario}',
                                   password_char='*')
     if senha_pop is None:
         print("Login cancelado.")
@@ -148,8 +149,8 @@ def sempapel_action(window, values: str):
         return False
     sempapel = SpSemPapel()
     print("Entrando no SemPapel. Digite usuário SFP1287296 e senha Sqff2986.3 .")
-    user_pop = sg.popup_get_text(f'Digite a nome do usuário')
-    senha_pop = sg.popup_get_text(f'Digite a senha para o usuário {user_pop}',
+    user_pop = na_janela(sg.popup_get_text)(f'Digite a nome do usuário')
+    senha_pop = na_janela(sg.popup_get_text)(f'Digite a senha para o usuário {user_pop}',
                                   password_char='*')
     if senha_pop is None or user_pop is None:
         print("Login cancelado.")
@@ -0,0 +1,21 @@
+import os
+
+from pycvi.conv import ConvGera
+from pycvi.conv.ConvBench import converte, digest
+from pycvi.conv.ConvCat42 import ConvCat42
+
+
+def test_readline_e_mmap_geram_as_mesmas_linhas(tmp_path):
+    """readline e mmap (ver ConvSped.reader) gravam as mesmas linhas, como em ConvBench leitura"""
+    pasta = tmp_path / 'origem'
+    pasta.mkdir()
+    arquivos = ConvGera.gera('cat42', str(pasta), 5000)
+    digests = dict()
+    for reader in ('readline', 'mmap'):
+        result_dir = tmp_path / reader
+        result_dir.mkdir()
+        _, lidas, conv = converte(ConvCat42, arquivos, str(result_dir), reader, True)
+        assert lidas > 0
+        digests[reader] = digest(os.path.join(str(result_dir), conv.db.name),
+                                 conv.tabelas_dados())
+    assert digests['readline'] == digests['mmap']
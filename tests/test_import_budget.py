@@ -0,0 +1,10 @@
+import pytest
+
+pytest.importorskip('PySimpleGUI')  # cvi5 abre a janela com ele; sem, não há o que medir
+
+from pycvi import CviImportBench  # noqa: E402
+
+
+def test_importacao_do_cvi5_no_orcamento():
+    """cvi5 importa em até ORCAMENTO_MS e sem os subsistemas de ADIADOS (ver CviImportBench)"""
+    assert CviImportBench.mede(CviImportBench.ORCAMENTO_MS)